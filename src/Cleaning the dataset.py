@@ -1,167 +1,30 @@
+import sys
 import pandas as pd
+from identities import IdentityTable
+from instrument import Span, script
+from relational import has_scraped, load_scraped
+from room_labels import ROOM_LABELS_FILE, RoomLabels, merge_rooms
+from storage import has_table, load_table, save_table
 
-# Load the dataset
-df = pd.read_csv("faceit_all_matches.csv")
+script("clean")
 
-# Mapping of old nicknames to new nicknames
-name_map = {
-    "IHaveLethal": "Lethal",
-    "WMaimone": "Wmaimone",
-    "cuFFah": "Cuffa",
-    "AdmiralRaptr": "Admiral",
-    "ultraviol3t": "Ultraviolet",
-    "TR33ow": "Tr33",
-    "zeruhh": "Zeruhh",
-    "Infektedow": "Infekted",
-    "VegaOW": "Vega",
-    "rupalzaman": "Rupal",
-    "ReyzrOW": "Rzr",
-    "pdkk_": "Pdk",
-    "BazOdub": "Baz",
-    "FrothyFilly7": "Frothyfilly7",
-    "RedexLCO": "Redex",
-    "xombaow": "Xomba",
-    "nvm1_": "Nvm",
-    "Hitoriow": "Hitori",
-    "scuffedhaha": "Scuffed",
-    "NenWhy": "Nenwhy",
-    "wubxii": "Wub",
-    "JUTSU": "Jutsu",
-    "-Ryyan-": "Ryan",
-    "Astronexz": "Astro",
-    "GrappesOW": "Grapes",
-    "renko_ow": "Renko",
-    "peace7k": "Peace",
-    "xtenOW": "Xten",
-    "CLEAROW": "Clear",
-    "cinnabarr": "Cinnabar",
-    "z_ow": "Zzz",
-    "Rokit600": "Rokit",
-    "KronikFPS": "Kronik",
-    "RhynO_OW": "Rhyno",
-    "Leptx": "Lep",
-    "Lukemino": "Lukemino",
-    "Painkilllr": "Painkiller",
-    "sug2rfree": "Sugarfree",
-    "seekerow": "Seeker",
-    "Kellannn": "Kellan",
-    "bliss05": "Bliss",
-    "cjay4": "Cjay",
-    "squid07": "Squid",
-    "Knife222": "Knife",
-    "Axur3e": "Axure",
-    "Scissorssz": "Scissors",
-    "victoryfps": "V1ctory",
-    "Fal2e": "False",
-    "Quartz03": "Quartz",
-    "Youbi1":   "Youbi",
-    "KSAA0": "Ksaa",
-    "SimpleOW":   "Simple",
-    "FunnyAstro1": "FunnyAstro",
-    "Checkmate2":   "Checkmate",
-    "ZIYAD-OW": "Ziyad",
-    "LandonOW":   "Landon",
-    "kellemanden": "Kellex",
-    "yung_kai":   "Kai",
-    "kevsteer": "Kevster",
-    "heesung":   "Heesung",
-    "twilight0208": "Twilight",
-    "Skairipa00":   "Skai",
-    "KenSoo": "Ken",
-    "cookie084":   "Cookie084",
-    "TRED": "Tred",
-    "FDGod_OW":   "Fdgod",
-    "sHockWaveOW": "Shockwave",
-    "kimjaewoo1":   "Jaewoo",
-    "eisgnom9": "Eisgnom",
-    "Galaavv":   "Galaa",
-    "_FiXa": "Fixa",
-    "Dip_impact":   "Dip",
-    "zydra_ow": "Zydra",
-    "Willys07":   "Willys",
-    "yoham_": "Yoham",
-    "NatsukiOW":   "Natsuki",
-    "vestola": "Vestola",
-    "Kiioo0":   "Kio",
-    "Pak_Oww": "Pak",
-    "MajinOW":   "Majin",
-    "KiWii__": "Kiwii",
-    "GOGOOGOOO":   "Gogo",
-    "Whoru01": "Whoru",
-    "xzodyal":   "Xzodyal",
-    "MAG200": "Mag",
-    "zox1509":   "Zox",
-    "seic0e": "Seicoe",
-    "SoOn":   "Soon",
-    "zzcrispy": "Crispy",
-    "skytorr":   "Skytorr",
-    "china_ow": "China",
-    "Streborman": "Strebor",
-    "ProtaFPS": "Prota",
-    "Kapey774": "Forever774",
-    "Zorrow_ow": "Zorrow",
-    "Xerion_gdh": "Xeriongdh",
-    "zzJuno": "Juno",
-    "Chaseeeeeee_": "Chase",
-    "Faith33": "Faith",
-    "ir0ny": "Irony",
-    "HadiOW2": "Hadi",
-    "m5rbh2": "One",
-    "AOY_": "Aoy",
-    "slowdive0": "Slowdive",
-    "Taejong2": "Taejong",
-    "TOPDRAGONow": "Topdragon",
-    "iMOH97": "Imoh97",
-    "iHAKUi": "Haku",
-    "TheeHawk": "Hawk",
-    "dannyow": "Danny",
-    "Arise_OW": "Arise",
-    "owSolo": "Solo",
-    "GraveyardOW": "Graveyard",
-    "drunkow": "Drunk",
-    "k1ng_ow": "K1ng",
-    "Zeb_ow": "Zeb",
-    "TensaTheSage": "Tensa",
-    "chcpper": "Chopper",
-    "Danny_OW": "Dannyy",
-    "Chickenmm": "Bazrzrrdx",
-    "CrazyCat191": "Crazycat",
-    "Ewan1657": "Ewan",
-    "gap_ow": "Gap",
-    "FoneOW": "Fone",
-    "WinterOW": "Winter",
-    "VisionLIVE": "Vision",
-    "CLEAROW": "Kellan",
-    "Kellannn": "Kellan",
-    "Qlmza": "Qlm",
-    "pela_OW": "Pela",
-    "TVNT_": "Tvnt",
-    "=-EgS": "Egs",
-    "KroxZ": "Kroxz",
-    "sxj_ow": "Sxj",
-    "scraine": "Scraine",
-    "ZIYAD-OW": "Ziyad",
-    "Evil8871": "Evil",
-    "snwdr0p": "Snowdrop",
-    "jonte--": "Jonte",
-    "ZERO_0W": "Zero",
-    "Backboneee": "Backbone",
-    "ChoiSehwan": "Choisehwan",
-    "tamaow": "Tama",
-    "Viol2tOW": "Viol2t",
-    "OneOW-": "One",
-    "Hanbei_": "Hanbei",
-    "karmez7": "Karmez",
-    "albavxz": "Alba",
-    "juiiccee": "Juiiccee",
-    "AdmiralRaptr": "Pela",
-    "xzodyal": "Xzodyal",
-    "Skairipa00": "Skai",
-    "kevsteer": "Kevster",
-    "eisgnom9": "Eisgnom"
-}
+# Nothing scraped yet: the master in the data folder (e.g. the one shipped in data/) is the source as it is
+if not has_scraped():
+    if has_table("master"):
+        print("No scraped rooms (faceit_tables/ or faceit_all_matches.csv); the master is kept as it is")
+        sys.exit(0)
+    sys.exit("No scraped rooms and no master dataset: run the scraper first")
+
+# Load the dataset
+with Span("load") as span:
+    df = load_scraped()
+    span.set(rows_out=len(df))
 
-df["player"] = df["player"].replace(name_map)
+# Canonical player names from the identity table (FaceIT player id or handle -> name, with date ranges);
+# rows scraped with player ids are already resolved, this covers older files and edits to the table
+with Span("resolve players", rows_in=len(df)):
+    identities = IdentityTable.load()
+    df["player"] = identities.resolve(df)
 
 # Map of map names to map types
 map_type = {
@@ -199,7 +62,27 @@ map_type = {
 # Add a new column with map type
 df["map_type"] = df["map_name"].map(map_type)
 
-# Save the cleaned file
-df.to_csv("faceit_all_matches.csv", index=False)
+# OWCS match id, region, stage and phase of every room (see room_labels.py): FaceIT room ids are looked up in
+# room_labels.csv, OWCS ids are parsed; the master's Parquet copy then stores its labels, so loading it never parses ids
+with Span("label rooms", rows_in=len(df)) as span:
+    df, unlabeled = RoomLabels.load().apply(df)
+    span.set(rows_out=len(df))
+if unlabeled:
+    print(f"{len(unlabeled)} rooms have no region/stage/phase and are left out of the master; "
+          f"add them to {ROOM_LABELS_FILE}: {', '.join(unlabeled[:10])}" + (" ..." if len(unlabeled) > 10 else ""))
+
+# Scraped rooms replace their old rows in the master; every other room (e.g. the curated S1-S3 data) is kept
+if has_table("master"):
+    with Span("merge", rows_in=len(df)) as span:
+        master = load_table("master", categories=False)
+        rooms = set(df["match_id"])
+        added = len(rooms - set(master["match_id"]))
+        df = merge_rooms(master, df)
+        span.set(rows_out=len(df))
+    print(f"Merged {len(rooms)} scraped rooms into the master ({added} new)")
+
+# Save the cleaned master dataset (Parquet + the CSV copy) for aggregations.py and the notebook
+with Span("save", rows_in=len(df)):
+    save_table(df, "master", export_csv=True)
 
-print("Clean file saved as faceit_all_matches.csv")
+print("Clean file saved as faceit_all_matches_emea_na_all_stages.csv")
@@ -1,6 +1,15 @@
-import requests
+import argparse
+import os
+import shutil
 import pandas as pd
-from datetime import datetime
+from faceit_cache import ResponseCache
+from faceit_client import FaceitClient, BASE_URL
+from faceit_rooms import room_rows
+from identities import IdentityTable
+from instrument import Span, script
+from relational import TABLE_DIR, MatchTables, TableSink
+from row_sink import CsvRowSink, merge_csv
+from storage import DATA_DIR
 
 API_KEY = "API_KEY" # from faceit
 MATCH_IDS = [
@@ -8,90 +17,88 @@ MATCH_IDS = [
     # add more match IDs here
 ]
 
-headers = {"Authorization": f"Bearer {API_KEY}"}
-all_rows = []
+parser = argparse.ArgumentParser(description="Scrape FaceIT OWCS rooms into normalized match/map/team/player/ban tables")
+parser.add_argument("--tables", default=os.path.join(DATA_DIR, TABLE_DIR),
+                    help="folder of the raw tables to write (or merge into); read by Cleaning the dataset.py")
+parser.add_argument("--out", help="write one flat CSV (the old faceit_all_matches.csv layout) here instead of --tables")
+parser.add_argument("--incremental", action="store_true",
+                    help="only fetch rooms missing from the output or stored there as metadata_only, then merge")
+parser.add_argument("--since", help="incremental, and leave metadata_only rooms played before this date alone (YYYY-MM-DD)")
+parser.add_argument("--cache-dir", default="faceit_cache", help="raw /matches and /stats response cache")
+parser.add_argument("--offline", action="store_true", help="replay from the response cache without any network calls")
+parser.add_argument("--ids", help="text file of room ids to scrape, one per line (default: MATCH_IDS)")
+args = parser.parse_args()
+script("scrape")
+if args.ids:
+    with open(args.ids, encoding="utf-8") as f:
+        MATCH_IDS = [line.strip() for line in f if line.strip()]
 
-for mid in MATCH_IDS:
-    print(f"Processing {mid}")
+output = args.out or args.tables
+rooms = None
+fetch_ids = MATCH_IDS
+if (args.incremental or args.since) and args.out and os.path.exists(args.out):
+    existing = pd.read_csv(args.out, usecols=lambda c: c in {"match_id", "match_date", "player", "data_quality"})
+    if "data_quality" in existing.columns:
+        incomplete = existing["data_quality"].eq("metadata_only")
+    else:
+        incomplete = existing["player"].isna()
+    rooms = existing.assign(incomplete=incomplete).groupby("match_id").agg(
+        incomplete=("incomplete", "any"), match_date=("match_date", "max")
+    )
+elif (args.incremental or args.since) and not args.out and os.path.exists(os.path.join(args.tables, "columns.json")):
+    rooms = MatchTables.load(args.tables, columns=["match_id", "match_date", "data_quality"]).room_status()
+if rooms is not None:
+    stale = rooms["incomplete"]
+    if args.since:
+        played = pd.to_datetime(rooms["match_date"], errors="coerce")
+        stale &= played.isna() | (played >= pd.Timestamp(args.since))
+    done = set(rooms.index[~stale])
+    fetch_ids = [mid for mid in MATCH_IDS if mid not in done]
+    print(f"Incremental: {len(fetch_ids)} of {len(MATCH_IDS)} rooms to fetch")
 
-    m = requests.get(f"https://open.faceit.com/data/v4/matches/{mid}", headers=headers).json()
-    match_date = m.get("started_at")
-    if match_date:
-        match_date = datetime.utcfromtimestamp(match_date).isoformat()
+# FACEIT_BASE_URL points the scraper at a local stub server (faceit_client.serve_recorded)
+client = FaceitClient(
+    API_KEY,
+    base_url=os.environ.get("FACEIT_BASE_URL", BASE_URL),
+    concurrency=int(os.environ.get("FACEIT_CONCURRENCY", 8)),
+    rate=float(os.environ.get("FACEIT_RATE", 8)),
+    cache=ResponseCache(args.cache_dir),
+    offline=args.offline,
+)
 
-    map_entities = {e["guid"]: e["name"] for e in m.get("voting", {}).get("map", {}).get("entities", [])}
-    map_picks = m.get("voting", {}).get("map", {}).get("pick", [])
-    maps_ordered = [map_entities.get(g, g) for g in map_picks]
+# player ids/handles are resolved to canonical names here (see identities.py), so the raw CSV needs no rename pass
+identities = IdentityTable.load()
 
-    hero_entities = {e["guid"]: e["name"] for e in m.get("voting", {}).get("heroes", {}).get("entities", [])}
-    ban_sets = []
-    for game_bans in m.get("voting", {}).get("heroes", {}).get("pick", []):
-        names = []
-        if isinstance(game_bans, list):
-            for guid in game_bans:
-                names.append(hero_entities.get(guid, guid))
-        else:
-            names.append(hero_entities.get(game_bans, game_bans))
-        ban_sets.append(", ".join(names))
+# rows are streamed to disk match by match; an interrupted run picks up after the last written match
+target = f"{output}.delta" if rooms is not None else output
+sink = CsvRowSink(target) if args.out else TableSink(target)
+todo = [mid for mid in fetch_ids if mid not in sink.completed]
+if len(todo) < len(fetch_ids):
+    print(f"Resuming: {len(fetch_ids) - len(todo)} rooms already written to {target}")
 
-    s = requests.get(f"https://open.faceit.com/data/v4/matches/{mid}/stats", headers=headers).json()
+# both requests of every room run concurrently; results come back in MATCH_IDS order
+written = 0
+with Span("fetch", rows_in=len(todo)) as fetch:
+    for mid, m, s in client.fetch_matches(todo):
+        print(f"Processing {mid}")
+        rows = room_rows(mid, m, s, identities.observe)
+        sink.write_match(mid, rows)
+        written += len(rows)
 
-    if not s.get("rounds"):
-        for team in m.get("teams", []):
-            team_name = team.get("name") or team.get("team_id")
-            all_rows.append({
-                "match_id": mid,
-                "match_date": match_date,
-                "round_num": None,
-                "map_name": None,
-                "hero_bans": None,
-                "team": team_name,
-                "player": None,
-                "Result": None,
-                "data_quality": "metadata_only"
-            })
-        continue
+    # rooms in, CSV rows out, plus the client's request/retry/cache totals (per-request events are in the span log)
+    fetch.set(rows_out=written, **client.stats)
+client.close()
+sink.finish()
+if identities.learned:
+    identities.save()
+    print(f"Learned {identities.learned} player ids -> player_identities.csv")
 
-    for r_i, rnd in enumerate(s.get("rounds", []), start=1):
-        raw_guid = rnd.get("round_stats", {}).get("Map", "")
-        map_name = map_entities.get(raw_guid, "") or (maps_ordered[r_i-1] if r_i-1 < len(maps_ordered) else "")
-        hero_bans = ban_sets[r_i-1] if r_i-1 < len(ban_sets) else ""
+if rooms is not None and args.out:
+    # refetched rooms replace their old rows, everything else is kept as-is
+    merge_csv(args.out, target, fetch_ids)
+    os.remove(target)
+elif rooms is not None:
+    MatchTables.load(args.tables).replace(MatchTables.load(target), fetch_ids).save(args.tables)
+    shutil.rmtree(target)
 
-        for team in rnd.get("teams", []):
-            team_name = team.get("team_stats", {}).get("Team") or team.get("team_id")
-            result = 1 if team.get("team_stats", {}).get("Team Win", "0") == "1" else 0
-
-            if not team.get("players"):
-                all_rows.append({
-                    "match_id": mid,
-                    "match_date": match_date,
-                    "round_num": r_i,
-                    "map_name": map_name,
-                    "hero_bans": hero_bans,
-                    "team": team_name,
-                    "player": None,
-                    "Result": result,
-                    "data_quality": "metadata_only"
-                })
-                continue
-
-            for p in team.get("players", []):
-                row = {
-                    "match_id": mid,
-                    "match_date": match_date,
-                    "round_num": r_i,
-                    "map_name": map_name,
-                    "hero_bans": hero_bans,
-                    "team": team_name,
-                    "player": p.get("nickname"),
-                    "Result": result,
-                    "data_quality": "full"
-                }
-                row.update(p.get("player_stats", {})) 
-                all_rows.append(row)
-
-df = pd.DataFrame(all_rows)
-df = df.loc[:, ~df.columns.duplicated()]
-df.to_csv("faceit_matches_stage_.csv", index=False)
-
-print(f"Saved {len(df)} rows across {len(MATCH_IDS)} matches -> faceit_matches_stage_.csv")
+print(f"Saved {len(fetch_ids)} rooms -> {output}")
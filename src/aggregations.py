@@ -1,13 +1,25 @@
+import numpy as np
 import pandas as pd
+from bans import BanMatrix
+from h2h import HeadToHead
+from instrument import Span, script
+from match_keys import ID_PART_COLUMNS, fill_labels, parse_match_ids, sequence_index
+from rollups import aggregate_levels
+from storage import load_compact, save_table
 
-master = pd.read_csv("faceit_all_matches_emea_na_all_stages.csv")
+script("aggregate")
+
+#categorical labels with persisted codes, small ints and float32 rates (see storage.compact)
+with Span("load") as span:
+    master = load_compact("master")
+    span.set(rows_out=len(master))
 print(f"Loaded {len(master)} rows")
+#every match id parsed once into typed parts (see match_keys.parse_match_ids): they fill missing labels
+#here and are stored next to seq in the three tables, so later loads never parse ids again
+match_ids = pd.Index(master["match_id"].dropna().unique())
+id_parts = parse_match_ids(match_ids).set_index(match_ids)
 print("Regions before fix:", master["region"].unique())
-if master["region"].isna().any():
-    master["region"] = master["region"].fillna(
-        master["match_id"].str.split("_").str[0]
-    )
-
+fill_labels(master, id_parts)
 print("Regions after fix:", master["region"].unique())
 print("Sample columns:", master.columns[:15].tolist())
 
@@ -19,84 +31,46 @@ stat_cols = [c for c in master.columns if c not in id_cols]
 
 print(f"Detected {len(stat_cols)} stat columns")
 
-#team_match
-team_match = (
-    master.groupby(["region", "stage", "phase", "match_id", "match_date", "team"])[stat_cols]
-    .sum()
-    .reset_index()
-)
-
-if "Result" in master.columns:
-    result = (
-        master.groupby(["region", "stage", "phase", "match_id", "match_date", "team"])["Result"]
-        .max()
-        .reset_index()
-    )
-    team_match = (
-        team_match.drop(columns="Result", errors="ignore")
-        .merge(result, on=["region", "stage", "phase", "match_id", "match_date", "team"])
-    )
-
-team_match.to_csv("team_match.csv", index=False)
-print(f"Saved team_match -> {len(team_match)} rows")
-
-#player_match
-player_match = (
-    master.groupby(["region", "stage", "phase", "match_id", "match_date", "team", "player"])[stat_cols]
-    .sum()
-    .reset_index()
-)
+#team_match, player_match, team_map in one pass (see rollups.aggregate_levels)
+with Span("aggregate", rows_in=len(master)) as span:
+    team_match, player_match, team_map = aggregate_levels(master, stat_cols)
+    span.set(rows_out=len(team_match) + len(player_match) + len(team_map))
 
-if "Result" in master.columns:
-    result = (
-        master.groupby(["region", "stage", "phase", "match_id", "match_date", "team", "player"])["Result"]
-        .max()
-        .reset_index()
-    )
-    player_match = (
-        player_match.drop(columns="Result", errors="ignore")
-        .merge(result, on=["region", "stage", "phase", "match_id", "match_date", "team", "player"])
-    )
+for table in (team_match, player_match, team_map):
+    pos = id_parts.index.get_indexer(table["match_id"])
+    for c in ID_PART_COLUMNS:
+        table[c] = id_parts[c].take(np.maximum(pos, 0)).where(pos >= 0).array
 
-player_match.to_csv("player_match.csv", index=False)
-print(f"Saved player_match -> {len(player_match)} rows")
+#one chronological int key shared by the three tables (see match_keys.sequence_index);
+#a match sorts just before its first map, so rolling/Elo/split code can sort on seq alone
+maps = team_map[["match_date", "match_id", "round_num", "position", "match_num"]]
+keys = pd.concat([maps, team_match[["match_date", "match_id", "position", "match_num"]].assign(round_num=np.nan)],
+                 ignore_index=True)
+seq = sequence_index(keys)
+team_map["seq"] = seq[:len(maps)]
+team_match["seq"] = seq[len(maps):]
+match_seq = dict(zip(team_match["match_id"], team_match["seq"]))
+player_match["seq"] = player_match["match_id"].map(match_seq).fillna(-1).astype(np.int64)
 
-#team_map
-team_map = (
-    master.groupby([
-        "region", "stage", "phase", "match_id", "match_date", "round_num", "map_name", "map_type", "team"
-    ])[stat_cols]
-    .sum()
-    .reset_index()
-)
-if "hero_bans" in master.columns:
-    bans = (
-        master.groupby([
-            "region", "stage", "phase", "match_id", "match_date", "round_num", "map_name", "map_type", "team"
-        ])["hero_bans"]
-        .apply(lambda x: ", ".join(sorted(set(x.dropna().astype(str)))))
-        .reset_index()
-    )
-    team_map = team_map.merge(
-        bans,
-        on=["region", "stage", "phase", "match_id", "match_date", "round_num", "map_name", "map_type", "team"]
-    )
+for name, table in (("team_match", team_match), ("player_match", player_match), ("team_map", team_map)):
+    with Span(f"save {name}", rows_in=len(table)):
+        save_table(table, name, export_csv=True)
+    print(f"Saved {name} -> {len(table)} rows")
 
-if "Result" in master.columns:
-    result = (
-        master.groupby([
-            "region", "stage", "phase", "match_id", "match_date", "round_num", "map_name", "map_type", "team"
-        ])["Result"]
-        .max()
-        .reset_index()
-    )
-    team_map = (
-        team_map.drop(columns="Result", errors="ignore")
-        .merge(result, on=["region", "stage", "phase", "match_id", "match_date", "round_num", "map_name", "map_type", "team"])
-    )
+#hero bans parsed once into a sparse team-map x hero matrix for the EDA and models (see bans.BanMatrix)
+if "hero_bans" in team_map.columns:
+    with Span("hero bans", rows_in=len(team_map)) as span:
+        ban_matrix = BanMatrix.from_frame(team_map)
+        ban_matrix.save()
+        span.set(rows_out=ban_matrix.matrix.nnz)
+    print(f"Saved hero ban matrix -> {ban_matrix.matrix.shape[0]} rows x {len(ban_matrix.heroes)} heroes")
 
-team_map.to_csv("team_map.csv", index=False)
-print(f"Saved team_map -> {len(team_map)} rows")
+#head-to-head records per pair of teams (all / region / region-stage) for the EDA heatmap (see h2h.HeadToHead)
+with Span("head to head", rows_in=len(team_map)) as span:
+    h2h = HeadToHead().update(team_map.sort_values("seq", kind="stable"))
+    h2h.save()
+    span.set(rows_out=len(h2h.keys))
+print(f"Saved head-to-head store -> {len(h2h.keys)} pair records over {len(h2h.scopes)} scopes")
 
 print("All aggregations done successfully!")
 
@@ -0,0 +1,186 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import brier_score_loss, log_loss
+from sklearn.model_selection import ParameterGrid
+
+from elo import map_type_labels
+from model_registry import fingerprint
+from storage import DATA_DIR
+
+CACHE_DIR = os.environ.get("OWCS_BACKTEST_DIR", os.path.join(DATA_DIR, "backtest_cache"))
+WINDOW_COLUMNS = ["stage", "phase"]
+
+
+class Folds:
+    """Walk-forward folds over time windows (e.g. stage x phase).
+
+    Windows are ordered by their first match date; fold k trains on every
+    window before k and tests on window k. The feature matrix, target and
+    window code per row are stored once as .npy files under the cache folder
+    (keyed by a fingerprint of the inputs) and memory-mapped, so every worker
+    and every later sweep shares them.
+    """
+
+    def __init__(self, frame, feature_cols, target="Result", by=WINDOW_COLUMNS, date="match_date",
+                 min_train_windows=1, cache_dir=None):
+        by = [c for c in by if c in frame.columns]
+        fp = fingerprint(frame[feature_cols + [target] + by + [date]])
+        self.folder = os.path.join(cache_dir or CACHE_DIR, fp[:16])
+        meta_path = os.path.join(self.folder, "folds.json")
+        if not os.path.exists(meta_path):
+            os.makedirs(self.folder, exist_ok=True)
+            first = frame.groupby(by, dropna=False)[date].transform("min")
+            keys = frame[by].astype(str).agg(" / ".join, axis=1)
+            order = pd.DataFrame({"key": keys, "first": first}).drop_duplicates("key").sort_values("first", kind="stable")
+            labels = order["key"].tolist()
+            codes = keys.map({k: i for i, k in enumerate(labels)}).to_numpy(dtype=np.int64)
+            np.save(os.path.join(self.folder, "X.npy"), frame[feature_cols].astype(np.float64).fillna(0).to_numpy())
+            np.save(os.path.join(self.folder, "y.npy"), frame[target].to_numpy(dtype=np.int64))
+            np.save(os.path.join(self.folder, "codes.npy"), codes)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"labels": labels, "feature_cols": list(feature_cols)}, f)
+        with open(meta_path, encoding="utf-8") as f:
+            self.labels = json.load(f)["labels"]
+        self.X = np.load(os.path.join(self.folder, "X.npy"), mmap_mode="r")
+        self.y = np.load(os.path.join(self.folder, "y.npy"), mmap_mode="r")
+        self.codes = np.load(os.path.join(self.folder, "codes.npy"), mmap_mode="r")
+        self.test_windows = list(range(min_train_windows, len(self.labels)))
+
+
+def check_point_in_time(rows, folds, build, outcomes, order="seq"):
+    """Raise ValueError if a feature of some row depends on results at or after it.
+
+    `build(rows)` returns the feature matrix the `folds` were made from,
+    indexed like the rows of `rows` it keeps. At the start and the middle of
+    every test window, the `outcomes` columns of each row at or after that
+    point in `order` are replaced by 1 - value and the features rebuilt; the
+    rows up to and including the cut must keep their values. A map's own
+    stats, later maps or a whole-history aggregate all fail. Returns the
+    number of cuts checked.
+    """
+    base = build(rows)
+    when = rows.loc[base.index, order].to_numpy()
+    codes = np.asarray(folds.codes)
+    cuts = []
+    for k in folds.test_windows:
+        window = np.sort(when[codes == k])
+        if len(window):
+            cuts += [window[0], window[len(window) // 2]]
+    leaks = {}
+    for cut in dict.fromkeys(cuts):
+        changed = rows.copy()
+        later = (changed[order] >= cut).to_numpy()
+        for c in outcomes:
+            changed[c] = changed[c].astype(np.float64)
+            changed.loc[later, c] = 1 - changed.loc[later, c]
+        kept = when <= cut
+        before = base[kept].to_numpy(dtype=np.float64)
+        after = build(changed).loc[base.index[kept], base.columns].to_numpy(dtype=np.float64)
+        moved = ~np.isclose(after, before, rtol=1e-7, atol=1e-9, equal_nan=True)
+        for col, n in zip(base.columns, moved.sum(axis=0)):
+            if n:
+                leaks[col] = leaks.get(col, 0) + int(n)
+    if leaks:
+        raise ValueError("Features that depend on results at or after their row (rows changed over all cuts): "
+                         + ", ".join(f"{c} ({n})" for c, n in leaks.items()))
+    return len(dict.fromkeys(cuts))
+
+
+def candidate_grid(name, estimator, grid):
+    """(label, unfitted estimator) for every combination of `grid`."""
+    configs = []
+    for params in ParameterGrid(grid):
+        label = name + "".join(f" {k.split('__')[-1]}={v}" for k, v in sorted(params.items()))
+        configs.append((label, clone(estimator).set_params(**params)))
+    return configs
+
+
+def calibration_error(y, p, bins=10):
+    """Expected calibration error: |mean prediction - win rate| per probability bin, weighted."""
+    which = np.minimum((p * bins).astype(int), bins - 1)
+    mean_p = np.bincount(which, weights=p, minlength=bins)
+    rate = np.bincount(which, weights=y, minlength=bins)
+    return float(np.abs(mean_p - rate).sum() / max(len(y), 1))
+
+
+def score(y, p):
+    p = np.clip(p, 1e-6, 1 - 1e-6)
+    return {
+        "n": int(len(y)),
+        "log_loss": float(log_loss(y, p, labels=[0, 1])),
+        "brier": float(brier_score_loss(y, p)),
+        "accuracy": float(np.mean((p >= 0.5) == y)),
+        "calibration_error": calibration_error(y, p),
+    }
+
+
+def score_fold(estimator, X, y, codes, k):
+    train, test = codes < k, codes == k
+    model = clone(estimator).fit(X[train], y[train])
+    return score(np.asarray(y[test]), model.predict_proba(X[test])[:, 1])
+
+
+def backtest(folds, configs, n_jobs=-1):
+    """Score every (config, fold) pair, in parallel, caching scores per fold.
+
+    A config's cache key covers its label and full estimator repr, so a result
+    is reused until the data (fold folder) or the estimator settings change.
+    Returns one row per config and test window.
+    """
+    path = os.path.join(folds.folder, "scores.jsonl")
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                done[(entry["key"], entry["window"])] = entry["scores"]
+
+    keys = {label: fingerprint(label, estimator)[:16] for label, estimator in configs}
+    todo = [(label, estimator, k) for label, estimator in configs for k in folds.test_windows
+            if (keys[label], folds.labels[k]) not in done]
+    scored = Parallel(n_jobs=n_jobs)(
+        delayed(score_fold)(estimator, folds.X, folds.y, folds.codes, k) for _, estimator, k in todo
+    )
+    with open(path, "a", encoding="utf-8") as f:
+        for (label, _, k), scores in zip(todo, scored):
+            done[(keys[label], folds.labels[k])] = scores
+            f.write(json.dumps({"key": keys[label], "config": label, "window": folds.labels[k], "scores": scores}) + "\n")
+
+    rows = [{"config": label, "window": folds.labels[k], **done[(keys[label], folds.labels[k])]}
+            for label, _ in configs for k in folds.test_windows]
+    return pd.DataFrame(rows)
+
+
+def elo_backtest(frame, folds, engine, by=WINDOW_COLUMNS, label="elo"):
+    """Walk-forward Elo: the engine is *updated* with each window after it has
+    been scored (no refit), using its per-map-type rating when one exists."""
+    by = [c for c in by if c in frame.columns]
+    keys = frame[by].astype(str).agg(" / ".join, axis=1).to_numpy()
+    maps = map_type_labels(frame)
+    rows = []
+    for k, window in enumerate(folds.labels):
+        part = frame[keys == window]
+        if k in folds.test_windows:
+            p = np.empty(len(part))
+            part_maps = maps[keys == window]
+            for mt in np.unique(part_maps):
+                m = part_maps == mt
+                p[m] = engine.probabilities(part["team"].to_numpy()[m], part["opp_team"].to_numpy()[m], mt)
+            rows.append({"config": label, "window": window, **score(part["Result"].to_numpy(), p)})
+        engine.update(part)
+    return pd.DataFrame(rows)
+
+
+def summarize(results):
+    """Per-config metrics, averaged over windows weighted by test rows (best log-loss first)."""
+    metrics = ["log_loss", "brier", "accuracy", "calibration_error"]
+    weighted = results[metrics].mul(results["n"], axis=0).assign(config=results["config"], n=results["n"])
+    summary = weighted.groupby("config", sort=False).sum()
+    summary[metrics] = summary[metrics].div(summary["n"], axis=0)
+    summary["windows"] = results.groupby("config", sort=False).size()
+    return summary.sort_values("log_loss").reset_index()
@@ -0,0 +1,197 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from storage import DATA_DIR
+
+BAN_FILE = "hero_bans.npz"
+ROW_COLUMNS = ["region", "stage", "phase", "match_id", "match_date", "round_num", "map_type", "team", "Result"]
+
+
+def parse_bans(values):
+    """Sparse (rows x heroes) 0/1 matrix and the sorted hero list for a column
+    of comma-joined ban strings. Each distinct string is split once; rows are
+    then gathered from the per-string matrix by code."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    split = [[h.strip() for h in str(u).split(",") if h.strip()] for u in uniques]
+    heroes = sorted({h for names in split for h in names})
+    col = {h: i for i, h in enumerate(heroes)}
+    rows = np.repeat(np.arange(len(split)), [len(names) for names in split])
+    cols = np.array([col[h] for names in split for h in names], dtype=np.int64)
+    # one extra empty row for missing values (code -1)
+    per_string = sparse.csr_matrix(
+        (np.ones(len(cols), dtype=np.int8), (rows, cols)), shape=(len(split) + 1, len(heroes)))
+    per_string.data[:] = 1  # a hero listed twice in one string still counts once
+    codes = np.where(codes < 0, len(split), codes)
+    return per_string[codes], heroes
+
+
+def ban_counts(values):
+    """Number of heroes in each ban string, without splitting every row."""
+    matrix, _ = parse_bans(values)
+    return np.asarray(matrix.sum(axis=1)).ravel()
+
+
+def _join_keys(frame, keys, other):
+    """`frame[keys]` as merge keys that compare equal to the same keys built
+    from `other`: a key numeric on either side (round_num) as nullable
+    integers, so 1 and 1.0 match, every other key as strings."""
+    out = {}
+    for k in keys:
+        values = frame[k].reset_index(drop=True)
+        if pd.api.types.is_numeric_dtype(frame[k]) or pd.api.types.is_numeric_dtype(other[k]):
+            out[k] = pd.to_numeric(values, errors="coerce").round().astype("Int64")
+        else:
+            out[k] = values.astype(str)
+    return pd.DataFrame(out)
+
+
+def _indicator(keys):
+    """Sparse (groups x rows) membership matrix, the group labels and each row's group."""
+    keys = keys.astype(object)
+    keys = keys.where(keys.notna(), "")
+    if keys.shape[1] > 1:
+        codes, index = pd.MultiIndex.from_frame(keys).factorize()
+        index.names = list(keys.columns)
+    else:
+        codes, labels = pd.factorize(keys.iloc[:, 0])
+        index = pd.Index(labels, name=keys.columns[0])
+    g = sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))), shape=(len(index), len(codes)))
+    return g, index, codes
+
+
+class BanMatrix:
+    """Hero bans of every team-map row as a sparse incidence matrix.
+
+    `matrix[i, h]` is 1 when row i (one team on one map, see `rows`) lists hero
+    h in its bans, i.e. the ban made by that team when FaceIT attributes bans
+    per team. `opponent[i, h]` is the same for the other team of the map, and
+    `map_bans` is the union for the whole map. Built once from `team_map` by
+    aggregations.py and stored in hero_bans.npz; queries are sparse products
+    over group indicator matrices, so no ban string is parsed again.
+    """
+
+    def __init__(self, rows, matrix, heroes):
+        self.rows = rows.reset_index(drop=True)
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.int8)
+        self.heroes = list(heroes)
+        pair, _, member = _indicator(self.rows[["match_id", "round_num"]])
+        per_map = (pair @ self.matrix).tocsr()
+        self.first = np.zeros(len(self.rows), dtype=bool)
+        self.first[np.unique(member, return_index=True)[1]] = True
+        self.map_bans = per_map[member]
+        self.map_bans.data = np.minimum(self.map_bans.data, 1)
+        self.opponent = (per_map[member] - self.matrix).tocsr()
+        self.opponent.data = np.minimum(self.opponent.data, 1)
+        self.opponent.eliminate_zeros()
+        # both teams listing the same multi-hero set means FaceIT gave the map's bans without the banning team
+        same = np.asarray((self.opponent != self.matrix).sum(axis=1)).ravel() == 0
+        self.attributed = ~(same & (np.asarray(self.matrix.sum(axis=1)).ravel() > 1))
+
+    @classmethod
+    def from_frame(cls, frame, column="hero_bans"):
+        matrix, heroes = parse_bans(frame[column])
+        rows = frame[[c for c in ROW_COLUMNS if c in frame.columns]]
+        return cls(rows, matrix, heroes)
+
+    def save(self, root=None):
+        path = os.path.join(root or DATA_DIR, BAN_FILE)
+        arrays = {f"row_{c}": self.rows[c].astype(str).to_numpy(dtype=str) for c in self.rows.columns if c != "match_date"}
+        if "match_date" in self.rows.columns:
+            arrays["row_match_date"] = pd.to_datetime(self.rows["match_date"]).to_numpy("datetime64[s]").astype(np.int64)
+        m = self.matrix.tocsr()
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez_compressed(f, indptr=m.indptr, indices=m.indices, shape=np.array(m.shape),
+                                heroes=np.array(self.heroes, dtype=str), **arrays)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, root=None):
+        with np.load(os.path.join(root or DATA_DIR, BAN_FILE)) as z:
+            shape = tuple(z["shape"])
+            matrix = sparse.csr_matrix((np.ones(len(z["indices"]), dtype=np.int8), z["indices"], z["indptr"]), shape=shape)
+            rows = pd.DataFrame({k[4:]: z[k] for k in z.files if k.startswith("row_")})
+            heroes = z["heroes"].tolist()
+        if "match_date" in rows.columns:
+            rows["match_date"] = pd.to_datetime(rows["match_date"], unit="s")
+        for c in ("round_num", "Result"):
+            if c in rows.columns:
+                rows[c] = pd.to_numeric(rows[c], errors="coerce")
+        rows = rows.replace({"nan": np.nan, "None": np.nan})
+        return cls(rows[[c for c in ROW_COLUMNS if c in rows.columns]], matrix, heroes)
+
+    def _frame(self, values, index):
+        return pd.DataFrame(np.asarray(values.todense() if sparse.issparse(values) else values), index=index, columns=self.heroes)
+
+    def frequency(self, by=("stage",), normalize=True):
+        """Bans per hero for each group of `by` (e.g. ["region", "stage"]):
+        the share of maps on which the hero was banned, or the raw map count."""
+        return self._frequency(self.rows[list(by)], normalize)
+
+    def _frequency(self, keys, normalize=True):
+        # one row per map: map_bans is the union of both teams' bans
+        g, index, _ = _indicator(keys[self.first])
+        counts = g @ self.map_bans[self.first]
+        if not normalize:
+            return self._frame(counts, index).astype(int)
+        maps = np.asarray(g.sum(axis=1)).ravel()
+        return self._frame(counts, index).div(maps, axis=0)
+
+    def win_rates(self, by=None, min_maps=1):
+        """Per hero: maps banned by a team, that team's win rate, and the win
+        rate of teams who had the hero banned against them (attributed maps only)."""
+        ok = self.attributed & self.rows["Result"].notna().to_numpy()
+        keys = self.rows.loc[ok, list(by)] if by else pd.DataFrame({"all": np.zeros(ok.sum(), dtype=int)})
+        g, index, _ = _indicator(keys)
+        win = sparse.diags(self.rows.loc[ok, "Result"].to_numpy(dtype=np.float64))
+        out = []
+        for name, m in (("banned", self.matrix[ok]), ("banned_against", self.opponent[ok])):
+            n = self._frame(g @ m, index).stack().astype(int)
+            wins = self._frame(g @ (win @ m), index).stack()
+            out.append(pd.DataFrame({f"{name}_maps": n, f"{name}_win_rate": wins / n.where(n > 0)}))
+        result = pd.concat(out, axis=1).rename_axis(list(index.names) + ["hero"])
+        result = result[result["banned_maps"] >= min_maps].reset_index()
+        return result if by else result.drop(columns="all")
+
+    def drift(self, by="stage", freq=None, top=None):
+        """Ban share per hero per period (a `by` column, or calendar periods of
+        match_date when `freq` is set, e.g. "W"), with the change from the previous period."""
+        if freq:
+            keys = pd.to_datetime(self.rows["match_date"]).dt.to_period(freq).astype(str).to_frame("period")
+            by = "period"
+        else:
+            keys = self.rows[[by]]
+        share = self._frequency(keys).sort_index()
+        if top:
+            share = share[share.sum().nlargest(top).index]
+        long = share.stack().reset_index()
+        long.columns = [by, "hero", "ban_rate"]
+        long["change"] = long.groupby("hero")["ban_rate"].diff()
+        return long
+
+    def features(self, frame, keys=("match_id", "round_num", "team"), heroes=False, prefix="ban_"):
+        """Model features for the rows of `frame` matched on `keys`: ban counts
+        (own, opponent) and optionally one 0/1 column per hero. A key listed
+        twice in the matrix, or no row of `frame` matching at all (e.g. keys
+        of different types), raises; rows missing from the matrix get 0 with
+        a warning."""
+        keys = list(keys)
+        left = _join_keys(frame, keys, self.rows)
+        right = _join_keys(self.rows, keys, frame).assign(_pos=np.arange(len(self.rows)))
+        pos = left.merge(right, on=keys, how="left", validate="many_to_one")["_pos"]
+        found = pos.notna().to_numpy()
+        if len(frame) and len(self.rows) and not found.any():
+            raise ValueError(f"No row matches the ban matrix on {keys}")
+        if not found.all():
+            warnings.warn(f"{(~found).sum()} of {len(frame)} rows are not in the ban matrix; their ban features are 0")
+        idx = pos.fillna(0).to_numpy(dtype=np.int64)
+        out = pd.DataFrame(index=frame.index)
+        out["ban_count"] = np.where(found, np.asarray(self.matrix[idx].sum(axis=1)).ravel(), 0)
+        out["opp_ban_count"] = np.where(found, np.asarray(self.opponent[idx].sum(axis=1)).ravel(), 0).astype(int)
+        if heroes:
+            dense = self.matrix[idx].toarray() * found[:, None]
+            out = out.join(pd.DataFrame(dense, index=frame.index, columns=[prefix + h for h in self.heroes]))
+        return out
@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from bans import parse_bans
+from elo import EloEngine
+from faceit_rooms import room_rows
+from features import FormFeatures
+from h2h import HeadToHead
+from pairing import Pairing
+from player_ratings import PlayerRatings, team_rosters, with_outcomes
+from pipeline import default_stages, python_stage, stage_env
+from relational import TABLE_DIR, MatchTables
+from rollups import aggregate_levels
+from room_labels import ROOM_LABELS_FILE
+from synthetic import room_labels, rooms, scaled_season, scraped_rows, write_rooms
+from tournament import MatchupTable, Tournament, snake_groups
+
+SCALES = (1, 10, 100)
+MASTER_ID_COLUMNS = [
+    "region", "stage", "phase", "match_id", "match_date",
+    "round_num", "map_name", "map_type", "team", "player", "hero_bans"
+]
+
+
+def synthetic_history(n_teams=48, n_seasons=3, maps_per_season=4000, seed=0):
+    """Team x map rows shaped like the sim's `team_map` (one row per side)."""
+    rng = np.random.default_rng(seed)
+    teams = np.array([f"Team {i:03d}" for i in range(n_teams)], dtype=object)
+    strength = rng.normal(0, 200, n_teams)
+    n = n_seasons * maps_per_season
+    t = rng.integers(0, n_teams, n)
+    o = (t + rng.integers(1, n_teams, n)) % n_teams
+    days = np.sort(rng.integers(0, 365 * n_seasons, n))
+    p = 1 / (1 + 10 ** ((strength[o] - strength[t]) / 400))
+    res = (rng.random(n) < p).astype(int)
+    phase = np.where(rng.random(n) < 0.2, "Playoffs", "Regular Season")
+    map_type = rng.choice(["Control", "Hybrid", "Escort", "Push", "Flashpoint"], n)
+    first = pd.DataFrame({"team": teams[t], "opp_team": teams[o], "Result": res,
+                          "days": days, "phase": phase, "map_type": map_type})
+    second = first.assign(team=first["opp_team"], opp_team=first["team"], Result=1 - res)
+    rows = pd.concat([first, second]).sort_values("days", kind="stable").reset_index(drop=True)
+    return pd.get_dummies(rows, columns=["map_type"], dtype=int)
+
+
+def legacy_initialize_elo(team_map, base_rating=1500, k=32, half_life_days=60):
+    # the row-by-row loop from the original team vs team sim, kept as the reference
+    elo, elo_map = {}, {}
+    games_played = {}
+    max_days = team_map["days"].max()
+
+    for _, row in team_map.iterrows():
+        t, o, res, d = row["team"], row["opp_team"], row["Result"], row["days"]
+
+        map_type = [c.replace("map_type_", "") for c in row.index if c.startswith("map_type_") and row[c] == 1]
+        map_type = map_type[0] if map_type else "General"
+
+        for team in [t, o]:
+            if team not in elo:
+                elo[team] = base_rating
+                games_played[team] = 0
+            if team not in elo_map:
+                elo_map[team] = {}
+            if map_type not in elo_map[team]:
+                elo_map[team][map_type] = base_rating
+
+        age_days = max_days - d
+        decay = 0.5 ** (age_days / half_life_days)
+
+        phase_text = str(row.get("phase", "")).lower()
+        phase_boost = 2.5 if ("playoff" in phase_text or "final" in phase_text) else 1.0
+
+        games_played[t] += 1
+        games_played[o] += 1
+        k_dynamic = k / np.sqrt(games_played[t])
+        if phase_boost > 1:
+            k_dynamic *= 2
+
+        exp_t = 1 / (1 + 10 ** ((elo[o] - elo[t]) / 400))
+        elo[t] += k_dynamic * decay * phase_boost * (res - exp_t)
+        elo[o] += k_dynamic * decay * phase_boost * ((1 - res) - (1 - exp_t))
+
+        exp_t_map = 1 / (1 + 10 ** ((elo_map[o][map_type] - elo_map[t][map_type]) / 400))
+        elo_map[t][map_type] += k_dynamic * decay * phase_boost * (res - exp_t_map)
+        elo_map[o][map_type] += k_dynamic * decay * phase_boost * ((1 - res) - (1 - exp_t_map))
+
+    return elo, elo_map, games_played
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def bench_elo(rows=None):
+    rows = synthetic_history() if rows is None else rows
+    (legacy, legacy_map, _), t_legacy = timed(legacy_initialize_elo, rows)
+    engine, t_engine = timed(EloEngine().fit, rows)
+
+    new = engine.ratings_dict()
+    diff = max(abs(legacy[t] - new[t]) for t in legacy)
+    diff_map = max(
+        abs(r - engine.map_ratings[engine.team_index[t], engine.map_index[m]])
+        for t, by_map in legacy_map.items() for m, r in by_map.items()
+    )
+    print(f"elo: {len(rows)} rows | legacy {t_legacy:.3f}s | engine {t_engine:.3f}s "
+          f"| x{t_legacy / t_engine:.1f} | max diff {max(diff, diff_map):.2e}")
+
+    # incremental: replaying the last 5% on a fitted state vs refitting everything
+    cut = int(len(rows) * 0.95)
+    base = EloEngine().fit(rows.iloc[:cut])
+    _, t_update = timed(base.update, rows.iloc[cut:])
+    print(f"elo: update {len(rows) - cut} new rows {t_update:.4f}s vs full refit {t_engine:.3f}s")
+
+
+def bench_features(rows=None, columns=("Result", "days")):
+    rows = synthetic_history() if rows is None else rows
+    columns = list(columns)
+
+    def legacy():
+        g = rows.groupby("team")
+        return pd.DataFrame({
+            **{f"{c}_roll3": g[c].transform(lambda x: x.shift().rolling(3, min_periods=1).mean()) for c in columns},
+            **{f"{c}_exp": g[c].transform(lambda x: x.shift().expanding().mean()) for c in columns},
+        })
+
+    ref, t_legacy = timed(legacy)
+    form = FormFeatures(columns, by="team", windows=(3,), expanding=True)
+    out, t_form = timed(form.transform, rows)
+    diff = np.nanmax(np.abs(out[ref.columns].to_numpy() - ref.to_numpy()))
+    print(f"features: {len(rows)} rows | lambdas {t_legacy:.3f}s | FormFeatures {t_form:.3f}s "
+          f"| x{t_legacy / t_form:.1f} | max diff {diff:.2e}")
+
+
+def bench_tournament(rows=None, n_sims=100_000):
+    rows = synthetic_history() if rows is None else rows
+    engine = EloEngine().fit(rows)
+    field = sorted(engine.teams, key=engine.rating, reverse=True)[:8]
+    map_types = [c.replace("map_type_", "") for c in rows.columns if c.startswith("map_type_")]
+    table = MatchupTable.from_elo(engine, field, map_types)
+    tournament = Tournament(groups=snake_groups(field), advance=2)
+    for n_jobs in (1, 4):
+        _, t = timed(tournament.simulate, table, n_sims=n_sims, seed=0, n_jobs=n_jobs)
+        print(f"tournament: {n_sims} runs of groups + double elimination, n_jobs={n_jobs}: {t:.2f}s")
+
+
+def measure(fn, *args, memory=True, **kwargs):
+    """(result, seconds, peak MB) of one call. The peak covers Python and numpy
+    allocations (tracemalloc) and comes from a second, traced call, so tracing
+    does not inflate the timing."""
+    out, seconds = timed(fn, *args, **kwargs)
+    if not memory:
+        return out, seconds, None
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+    return out, seconds, peak
+
+
+# Runs one command and prints its exit code, seconds and peak RSS (MB; None where
+# the OS has no wait4). It is a separate small process because a child's ru_maxrss
+# starts from its parent's high-water mark, which here includes the synthetic data.
+_LAUNCHER = """
+import json, os, subprocess, sys, time
+log_path, command = sys.argv[1], sys.argv[2:]
+start = time.perf_counter()
+with open(log_path, "w", encoding="utf-8") as log:
+    proc = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        code = os.waitstatus_to_exitcode(status)
+        peak = usage.ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    else:
+        code, peak = proc.wait(), None
+print(json.dumps({"code": code, "seconds": time.perf_counter() - start, "peak": peak}))
+"""
+
+
+def run_measured(command, root, log_path):
+    """Run a stage command in `root` like pipeline.py does; (exit code, seconds,
+    peak RSS in MB of the stage process or None)."""
+    out = subprocess.run([sys.executable, "-c", _LAUNCHER, log_path, *command], cwd=root,
+                         env=stage_env(root), capture_output=True, text=True, check=True)
+    r = json.loads(out.stdout)
+    return r["code"], r["seconds"], r["peak"]
+
+
+def record(bench, scale, step, rows, seconds, peak, status="ok"):
+    r = {"benchmark": bench, "scale": scale, "step": step, "rows": rows,
+         "seconds": round(seconds, 3), "peak_mb": None if peak is None else round(peak, 1), "status": status}
+    peak = "-" if peak is None else f"{peak:.0f}"
+    print(f"{bench:<9} {scale:>4}x  {step:<14} {rows:>9} rows  {seconds:>8.2f}s  {peak:>6} MB  {status}")
+    return r
+
+
+def bench_hotpaths(scales=SCALES):
+    """In-process hot paths on a synthetic season at each scale: the scraper's
+    parse of the room documents into rows and tables, ban parsing, the
+    three-level aggregation, opponent pairing, rolling form, Elo replay,
+    head-to-head features and store, player ratings and the team features of
+    every five-player lineup of each roster, and a tournament simulation from
+    the fitted ratings."""
+    rows = []
+    for scale in scales:
+        master, seconds, peak = measure(scaled_season, scale)
+        rows.append(record("hotpaths", scale, "generate", len(master), seconds, peak))
+        responses = [(mid, json.dumps(m).encode("utf-8"), json.dumps(s).encode("utf-8")) for mid, m, s in rooms(master)]
+        _, seconds, peak = measure(lambda docs: MatchTables.from_wide(pd.DataFrame(
+            [r for mid, m, s in docs for r in room_rows(mid, json.loads(m), json.loads(s))])), responses)
+        rows.append(record("hotpaths", scale, "scraping parse", len(master), seconds, peak))
+        _, seconds, peak = measure(parse_bans, master["hero_bans"])
+        rows.append(record("hotpaths", scale, "parse bans", len(master), seconds, peak))
+
+        stat_cols = [c for c in master.columns if c not in MASTER_ID_COLUMNS]
+        (_, player_match, team_map), seconds, peak = measure(aggregate_levels, master, stat_cols)
+        rows.append(record("hotpaths", scale, "aggregate", len(master), seconds, peak))
+
+        team_map = team_map.sort_values(["team", "match_id", "round_num"]).reset_index(drop=True)
+        pairs, seconds, peak = measure(Pairing, team_map)
+        rows.append(record("hotpaths", scale, "pairing", len(team_map), seconds, peak))
+
+        form = FormFeatures("Result", by="team", windows=(3,), expanding=True)
+        _, seconds, peak = measure(form.transform, team_map)
+        rows.append(record("hotpaths", scale, "form features", len(team_map), seconds, peak))
+
+        dates = pd.to_datetime(team_map["match_date"])
+        history = team_map.assign(opp_team=pairs.values(team_map["team"], fill=None),
+                                  days=(dates - dates.min()).dt.days)[pairs.has_opponent]
+        history = pd.get_dummies(history.sort_values("days", kind="stable"), columns=["map_type"], dtype=int)
+        engine, seconds, peak = measure(EloEngine().fit, history)
+        rows.append(record("hotpaths", scale, "elo replay", len(history), seconds, peak))
+        _, seconds, peak = measure(lambda h: HeadToHead().features(h), history)
+        rows.append(record("hotpaths", scale, "h2h features", len(history), seconds, peak))
+        _, seconds, peak = measure(lambda h: HeadToHead().update(h), history)
+        rows.append(record("hotpaths", scale, "h2h store", len(history), seconds, peak))
+
+        player_rows = with_outcomes(player_match, team_map)
+        ratings, seconds, peak = measure(lambda r: PlayerRatings(order="match_date").update(r), player_rows)
+        rows.append(record("hotpaths", scale, "player ratings", len(player_rows), seconds, peak))
+        lineups = [c for roster in team_rosters(player_match, order="match_date").values()
+                   for c in combinations(roster, 5)]
+        _, seconds, peak = measure(ratings.lineup_features, lineups)
+        rows.append(record("hotpaths", scale, "lineup features", len(lineups), seconds, peak))
+
+        field = sorted(engine.teams, key=engine.rating, reverse=True)[:8]
+        table = MatchupTable.from_elo(engine, field, [c[len("map_type_"):] for c in history.columns
+                                                      if c.startswith("map_type_")])
+        tournament = Tournament(groups=snake_groups(field), advance=2)
+        _, seconds, peak = measure(tournament.simulate, table, n_sims=20_000, seed=0)
+        rows.append(record("hotpaths", scale, "tournament", 20_000, seconds, peak))
+    return rows
+
+
+def scale_stages(ids_path):
+    """The pipeline stages, with the scraper replaying the synthetic API
+    responses offline into faceit_tables/, which the clean stage then labels
+    and turns into the master."""
+    scrape = python_stage("scrape", "Scraping data from Faceit API.py", outputs=[TABLE_DIR],
+                          args=["--offline", "--cache-dir", "faceit_cache", "--ids", ids_path])
+    return [scrape] + [s for s in default_stages() if s.name != "scrape"]
+
+
+def bench_pipeline(scales=SCALES, stages=None, root=None):
+    """Every pipeline stage as its own process on a synthetic season at each
+    scale: wall time and peak RSS per stage. The data folders are temporary
+    unless `root` is given (then `<root>/x<scale>` is kept for inspection)."""
+    rows = []
+    for scale in scales:
+        folder = os.path.join(root, f"x{scale}") if root else tempfile.mkdtemp(prefix=f"owcs_bench_x{scale}_")
+        os.makedirs(folder, exist_ok=True)
+        try:
+            master = scaled_season(scale)
+            room_labels(master).to_csv(os.path.join(folder, ROOM_LABELS_FILE), index=False)
+            ids_path = os.path.join(folder, "room_ids.txt")
+            if not stages or "scrape" in stages:
+                with open(ids_path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(write_rooms(master, os.path.join(folder, "faceit_cache"))) + "\n")
+            else:
+                # no replay: the tables the scraper would have written
+                MatchTables.from_wide(scraped_rows(master)).save(os.path.join(folder, TABLE_DIR))
+            for stage in scale_stages(ids_path):
+                if stages and stage.name not in stages:
+                    continue
+                if shutil.which(stage.command[0]) is None:
+                    rows.append(record("pipeline", scale, stage.name, len(master), 0.0, None, "unavailable"))
+                    continue
+                code, seconds, peak = run_measured(stage.command, folder, os.path.join(folder, f"{stage.name}.log"))
+                status = "ok" if code == 0 else f"failed ({code}), see {stage.name}.log" if root else f"failed ({code})"
+                rows.append(record("pipeline", scale, stage.name, len(master), seconds, peak, status))
+        finally:
+            if not root:
+                shutil.rmtree(folder, ignore_errors=True)
+    return rows
+
+
+BENCHMARKS = {"elo": bench_elo, "features": bench_features, "tournament": bench_tournament}
+SCALE_BENCHMARKS = {"hotpaths": bench_hotpaths, "pipeline": bench_pipeline}
+
+#python benchmarks.py [name ...] [--scales 1 10 100] [--stages clean aggregate ...] [--root DIR] [--save FILE]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks and scaling runs on synthetic seasons")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="season sizes relative to the bundled data")
+    parser.add_argument("--stages", nargs="+", help="pipeline stages to time (default: all)")
+    parser.add_argument("--root", help="keep the pipeline data folders under this directory")
+    parser.add_argument("--save", help="append the scaling results to this JSONL file")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS) - set(SCALE_BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = []
+    for name in args.names or list(BENCHMARKS) + list(SCALE_BENCHMARKS):
+        if name in BENCHMARKS:
+            BENCHMARKS[name]()
+        elif name == "pipeline":
+            results += bench_pipeline(args.scales, args.stages, args.root)
+        else:
+            results += SCALE_BENCHMARKS[name](args.scales)
+    if args.save and results:
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(args.save, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps({"at": stamp, **r}) + "\n")
@@ -0,0 +1,404 @@
+import hashlib
+import html
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from bans import BAN_FILE, BanMatrix
+from h2h import ALL, H2H_FILE, HeadToHead
+from instrument import Span
+from match_keys import parse_match_ids
+from pipeline import STATE_DIR, Digests
+from storage import DATA_DIR, csv_path, load_table, parquet_path
+
+# only the columns the charts use are read
+COLUMNS = {
+    "team_match": ["region", "stage", "match_id", "team", "Result"],
+    "team_map": ["region", "stage", "phase", "match_id", "match_date", "round_num", "map_type", "team", "hero_bans", "Result"],
+    "player_match": ["region", "match_id", "player", "Role", "Eliminations", "Deaths", "Damage Dealt", "Healing Done"],
+}
+METRICS = ["Eliminations", "Damage Dealt", "Healing Done"]
+CACHE_DIR = ".cache"
+BAN_WIN_RATES_TITLE = "Win rate of the banning team / of the team banned against (heroes banned on 20+ maps)"
+MANIFEST = "manifest.json"
+# stores written by aggregations.py: file, loader, and how to build it from team_map when the file is missing
+STORES = {
+    "bans": (BAN_FILE, BanMatrix.load, BanMatrix.from_frame),
+    "h2h": (H2H_FILE, HeadToHead.load, lambda team_map: HeadToHead().update(team_map)),
+}
+
+
+class Inputs:
+    """The EDA's datasets, loaded on first use (region labels filled from the
+    match id), and the content digest of the files behind each of them."""
+
+    def __init__(self, root=None):
+        self.root = root or DATA_DIR
+        self.frames = {}
+        self.digests = Digests()
+
+    def __getitem__(self, name):
+        if name not in self.frames:
+            if name in STORES:
+                filename, load, build = STORES[name]
+                # built from team_map only if aggregations.py has not written the store
+                exists = os.path.exists(os.path.join(self.root, filename))
+                self.frames[name] = load(self.root) if exists else build(self["team_map"])
+            else:
+                with Span("load", dataset=name) as span:
+                    df = load_table(name, columns=COLUMNS[name], root=self.root, categories=False)
+                    if df["region"].isna().any() or (df["region"] == "").any():
+                        df["region"] = df["region"].fillna(
+                            pd.Series(parse_match_ids(df["match_id"])["region"].to_numpy(), index=df.index))
+                    span.set(rows_out=len(df))
+                self.frames[name] = df
+        return self.frames[name]
+
+    def has_bans(self):
+        return os.path.exists(os.path.join(self.root, BAN_FILE)) or "hero_bans" in self["team_map"].columns
+
+    def digest(self, name):
+        if name in STORES:
+            path = os.path.join(self.root, STORES[name][0])
+            return self.digests.path(path) if os.path.exists(path) else f"team_map:{self.digest('team_map')}"
+        return ":".join(str(self.digests.path(p)) for p in (parquet_path(name, self.root), csv_path(name, self.root)))
+
+
+# aggregates: each reads some inputs and returns the table one or more charts draw (None: no data for them)
+
+def team_winrates(inputs):
+    return (
+        inputs["team_match"].groupby(["region", "stage", "team"])["Result"]
+        .mean()
+        .reset_index()
+        .rename(columns={"Result": "Winrate"})
+    )
+
+
+def map_winrates(inputs):
+    return (
+        inputs["team_map"].groupby(["map_type", "team"])["Result"]
+        .mean()
+        .reset_index()
+        .rename(columns={"Result": "Winrate"})
+    )
+
+
+def ban_totals(inputs):
+    if not inputs.has_bans():
+        return None
+    bans = inputs["bans"]
+    counts = pd.Series(np.asarray(bans.matrix.sum(axis=0)).ravel(), index=bans.heroes)
+    return counts.sort_values(ascending=False, kind="stable").head(15)
+
+
+def ban_stages(inputs):
+    if not inputs.has_bans():
+        return None
+    ban_stage = (
+        inputs["bans"].frequency(by=["stage"], normalize=False)
+        .rename_axis(columns="hero_bans").stack()
+        .reset_index(name="count")
+    )
+    top5 = ban_stage.groupby("hero_bans")["count"].sum().nlargest(5).index
+    return ban_stage[ban_stage["hero_bans"].isin(top5)]
+
+
+def ban_win_rates(inputs):
+    if not inputs.has_bans():
+        return None
+    return inputs["bans"].win_rates(min_maps=20).sort_values("banned_maps", ascending=False)
+
+
+def leaderboards(inputs):
+    """Top 10 players by average of each metric, long form (metric, player, value)."""
+    means = inputs["player_match"].groupby("player")[METRICS].mean()
+    return pd.concat([means[m].sort_values(ascending=False).head(10).rename("value").reset_index().assign(metric=m)
+                      for m in METRICS], ignore_index=True)
+
+
+def head_to_head(inputs):
+    """Map win share of every pair that met (team x team, NaN where they never
+    met), teams grouped by region."""
+    store = inputs["h2h"]
+    regions = [s for s in store.scopes if s != ALL and "/" not in s]
+    teams = dict.fromkeys([t for r in sorted(regions) for t in store.teams_in(r)] + store.teams_in(ALL))
+    return store.heatmap_frame(ALL, list(teams))
+
+
+def kd_ratios(inputs):
+    pm = inputs["player_match"]
+    return pd.DataFrame({"region": pm["region"], "KDR": pm["Eliminations"] / pm["Deaths"].replace(0, 1)})
+
+
+def progression(inputs):
+    return team_winrates(inputs).groupby(["team", "stage"])["Winrate"].mean().reset_index()
+
+
+def role_stats(inputs):
+    if "Role" not in inputs["player_match"].columns:
+        return None
+    return inputs["player_match"][["Role"] + METRICS]
+
+
+# name -> (function, inputs it reads)
+AGGREGATES = {
+    "team_winrates": (team_winrates, ["team_match"]),
+    "map_winrates": (map_winrates, ["team_map"]),
+    "ban_totals": (ban_totals, ["bans"]),
+    "ban_stages": (ban_stages, ["bans"]),
+    "ban_win_rates": (ban_win_rates, ["bans"]),
+    "leaderboards": (leaderboards, ["player_match"]),
+    "head_to_head": (head_to_head, ["h2h"]),
+    "kd_ratios": (kd_ratios, ["player_match"]),
+    "progression": (progression, ["team_match"]),
+    "role_stats": (role_stats, ["player_match"]),
+}
+
+
+# charts: each draws one figure from its aggregate
+
+def top_teams_chart(team_wr):
+    fig = plt.figure(figsize=(14,6))
+    top_teams = team_wr.groupby("team")["Winrate"].mean().sort_values(ascending=False).head(12).index
+    sns.barplot(data=team_wr[team_wr["team"].isin(top_teams)], x="team", y="Winrate", hue="stage")
+    plt.xticks(rotation=45, ha="right")
+    plt.title("Top 12 Teams Winrates by Stage")
+    plt.ylabel("Winrate")
+    plt.tight_layout()
+    return fig
+
+
+def map_type_chart(map_wr):
+    fig = plt.figure(figsize=(12,6))
+    sns.barplot(data=map_wr, x="map_type", y="Winrate", hue="team", dodge=False)
+    plt.xticks(rotation=45)
+    plt.title("Winrate by Map Type (All Teams)")
+    plt.ylabel("Winrate")
+    plt.legend(bbox_to_anchor=(1.05, 1), loc="upper left")
+    plt.tight_layout()
+    return fig
+
+
+def ban_totals_chart(ban_counts):
+    fig = plt.figure(figsize=(8,6))
+    ban_counts.plot(kind="barh", color="red")
+    plt.title("Most Common Hero Bans")
+    plt.xlabel("Count")
+    plt.gca().invert_yaxis()
+    plt.tight_layout()
+    return fig
+
+
+def ban_stages_chart(ban_stage):
+    fig = plt.figure(figsize=(10,6))
+    sns.lineplot(data=ban_stage, x="stage", y="count", hue="hero_bans", marker="o")
+    plt.title("Top 5 Hero Bans Over Stages")
+    return fig
+
+
+def leaderboard_chart(leaders, metric):
+    fig = plt.figure(figsize=(10,6))
+    leaders[leaders["metric"] == metric].set_index("player")["value"].plot(kind="barh")
+    plt.title(f"Top 10 Players by Avg {metric}")
+    plt.xlabel(metric)
+    plt.gca().invert_yaxis()
+    plt.tight_layout()
+    return fig
+
+
+def head_to_head_chart(share):
+    size = min(4 + 0.25 * len(share), 24)
+    fig = plt.figure(figsize=(size + 2, size))
+    sns.heatmap(share, cmap="RdBu", vmin=0, vmax=1, center=0.5, square=True,
+                xticklabels=True, yticklabels=True, cbar_kws={"label": "maps won by row team"})
+    plt.grid(False)
+    plt.title("Head-to-Head Map Win Share (row team vs column team, blank: never met)")
+    plt.tight_layout()
+    return fig
+
+
+def kd_ratio_chart(kdr):
+    fig = plt.figure(figsize=(8,6))
+    sns.boxplot(data=kdr, x="region", y="KDR")
+    plt.ylim(0, kdr["KDR"].quantile(0.95))
+    plt.title("Player K/D Ratio Distribution by Region")
+    return fig
+
+
+def progression_chart(progression):
+    fig = plt.figure(figsize=(12,6))
+    sns.lineplot(data=progression, x="stage", y="Winrate", hue="team", marker="o")
+    plt.title("Team Winrate Progression Across Stages")
+    plt.xticks(rotation=45)
+    return fig
+
+
+def role_chart(roles, metric, title):
+    fig = plt.figure(figsize=(10,6))
+    sns.boxplot(data=roles, x="Role", y=metric)
+    plt.title(title)
+    return fig
+
+
+# name -> (aggregate, draw function, extra arguments), in report order
+CHARTS = {
+    "team_winrates": ("team_winrates", top_teams_chart, ()),
+    "map_winrates": ("map_winrates", map_type_chart, ()),
+    "ban_totals": ("ban_totals", ban_totals_chart, ()),
+    "ban_stages": ("ban_stages", ban_stages_chart, ()),
+    **{f"top_{m.lower().replace(' ', '_')}": ("leaderboards", leaderboard_chart, (m,)) for m in METRICS},
+    "head_to_head": ("head_to_head", head_to_head_chart, ()),
+    "kd_ratios": ("kd_ratios", kd_ratio_chart, ()),
+    "progression": ("progression", progression_chart, ()),
+    "role_eliminations": ("role_stats", role_chart, ("Eliminations", "Eliminations by Role")),
+    "role_damage": ("role_stats", role_chart, ("Damage Dealt", "Damage by Role")),
+    "role_healing": ("role_stats", role_chart, ("Healing Done", "Healing by Role")),
+}
+
+
+def _source_hash(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update((inspect.getsource(part) if callable(part) else str(part)).encode())
+    return h.hexdigest()
+
+
+class AggregateCache:
+    """Aggregate tables pickled under `folder`, keyed on the aggregate's code
+    and the digests of the inputs it reads: a table is recomputed only when
+    one of its input files or its function changed. Older versions of a
+    table are removed when a new one is written."""
+
+    def __init__(self, folder, inputs):
+        self.folder = folder
+        self.inputs = inputs
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, name):
+        function, needs = AGGREGATES[name]
+        return _source_hash(function, *[f"{n}={self.inputs.digest(n)}" for n in needs])
+
+    def path(self, name):
+        return os.path.join(self.folder, f"{name}-{self.key(name)[:16]}.pkl")
+
+    def get(self, name):
+        """(table, path, whether it came from the cache); the inputs are only
+        loaded on a miss."""
+        path = self.path(name)
+        if os.path.exists(path):
+            return pd.read_pickle(path), path, True
+        table = AGGREGATES[name][0](self.inputs)
+        for old in os.listdir(self.folder):
+            if old.startswith(f"{name}-") and old.endswith(".pkl"):
+                os.remove(os.path.join(self.folder, old))
+        pd.to_pickle(table, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        return table, path, False
+
+
+def _style():
+    sns.set(style="whitegrid")
+
+
+def _headless():
+    plt.switch_backend("Agg")
+    _style()
+
+
+def _render(name, table_path, out_path):
+    """Worker: draw one chart from its pickled aggregate and save the PNG."""
+    _, draw, args = CHARTS[name]
+    fig = draw(pd.read_pickle(table_path), *args)
+    fig.savefig(f"{out_path}.tmp.png")
+    plt.close(fig)
+    os.replace(f"{out_path}.tmp.png", out_path)
+    return name
+
+
+def show_all(root=None):
+    """Interactive mode: draw every chart in turn with plt.show()."""
+    _style()
+    inputs = Inputs(root)
+    cache = AggregateCache(os.path.join(inputs.root, STATE_DIR, "eda_cache"), inputs)
+    for aggregate, draw, args in CHARTS.values():
+        table = cache.get(aggregate)[0]
+        if table is not None:
+            draw(table, *args)
+            plt.show()
+    win_rates = cache.get("ban_win_rates")[0]
+    if win_rates is not None:
+        print(f"\n{BAN_WIN_RATES_TITLE}:")
+        print(win_rates.to_string(index=False, float_format="{:.2f}".format))
+
+
+def render_report(out_dir, root=None, jobs=None):
+    """Headless report: every chart as a PNG in `out_dir` plus index.html.
+
+    Aggregates come from `out_dir/.cache` when their inputs are unchanged, and
+    a chart is only redrawn when its aggregate or drawing code changed (or
+    its PNG is missing). Charts are drawn in a process pool of `jobs`
+    workers (default: one per CPU). Returns the per-chart status.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    inputs = Inputs(root)
+    cache = AggregateCache(os.path.join(out_dir, CACHE_DIR), inputs)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+
+    with Span("aggregate") as span:
+        tables = {a: cache.get(a) for a in dict.fromkeys([c[0] for c in CHARTS.values()] + ["ban_win_rates"])}
+        span.set(rows_out=len(tables), cached=sum(hit for _, _, hit in tables.values()))
+    names = [n for n, (aggregate, _, _) in CHARTS.items() if tables[aggregate][0] is not None]
+
+    status, todo = {}, []
+    for name in names:
+        aggregate, draw, args = CHARTS[name]
+        key = _source_hash(tables[aggregate][1], draw, args)
+        png = os.path.join(out_dir, f"{name}.png")
+        if manifest.get(name) == key and os.path.exists(png):
+            status[name] = "unchanged"
+        else:
+            todo.append(name)
+            manifest[name] = key
+
+    with Span("render", rows_in=len(names)) as span:
+        if todo:
+            with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(todo)), initializer=_headless) as pool:
+                futures = [pool.submit(_render, n, tables[CHARTS[n][0]][1], os.path.join(out_dir, f"{n}.png")) for n in todo]
+                for future in futures:
+                    status[future.result()] = "rendered"
+        span.set(rows_out=len(todo))
+
+    for stale in set(manifest) - set(names):
+        if os.path.exists(os.path.join(out_dir, f"{stale}.png")):
+            os.remove(os.path.join(out_dir, f"{stale}.png"))
+    manifest = {n: manifest[n] for n in names}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    _write_index(out_dir, names, tables["ban_win_rates"][0])
+    return status
+
+
+def _write_index(out_dir, names, ban_win_rates):
+    parts = [f"<html><head><meta charset='utf-8'><title>OWCS EDA</title></head><body>",
+             f"<h1>OWCS EDA</h1><p>Generated {time.strftime('%Y-%m-%d %H:%M:%S')}</p>"]
+    for name in names:
+        parts.append(f"<h2>{html.escape(name.replace('_', ' '))}</h2><img src='{name}.png'>")
+    if ban_win_rates is not None:
+        parts.append(f"<h2>{BAN_WIN_RATES_TITLE}</h2>")
+        parts.append(ban_win_rates.to_html(index=False, float_format="{:.2f}".format))
+    parts.append("</body></html>")
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
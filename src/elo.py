@@ -0,0 +1,187 @@
+import json
+
+import numpy as np
+
+GENERAL = "General"
+
+
+def map_type_labels(frame):
+    """Map type per row, from a `map_type` column or the `map_type_*` dummies
+    ("General" when no dummy is set)."""
+    if "map_type" in frame.columns:
+        return frame["map_type"].astype(object).fillna(GENERAL).to_numpy()
+    dummies = [c for c in frame.columns if c.startswith("map_type_")]
+    if not dummies:
+        return np.full(len(frame), GENERAL, dtype=object)
+    values = frame[dummies].to_numpy() == 1
+    labels = np.array([c.replace("map_type_", "") for c in dummies], dtype=object)
+    return np.where(values.any(axis=1), labels[values.argmax(axis=1)], GENERAL)
+
+
+class EloEngine:
+    """Date-aware Elo with playoff boost, dynamic K and per-map-type ratings.
+
+    Teams and map types are integer-encoded and ratings live in flat arrays, so
+    a replay only walks pre-extracted int/float columns (no `iterrows`, no
+    per-row column scans). Rows need `team`, `opp_team`, `Result`, `days` and
+    `phase`, plus `map_type` or `map_type_*` dummies.
+
+    `fit` replays a full history with recency decay measured from its last day,
+    exactly like the original loop. `update` applies only new rows on top of the
+    current state, with decay measured from the end of the new batch; use a
+    monotone day count (e.g. days since epoch) when mixing batches.
+    """
+
+    def __init__(self, base_rating=1500, k=32, half_life_days=60, playoff_boost=2.5):
+        self.base_rating = base_rating
+        self.k = k
+        self.half_life_days = half_life_days
+        self.playoff_boost = playoff_boost
+        self.teams, self.team_index = [], {}
+        self.map_types, self.map_index = [GENERAL], {GENERAL: 0}
+        self.ratings = np.empty(0)
+        self.games = np.empty(0, dtype=np.int64)
+        self.map_ratings = np.empty((0, 1))
+        self.map_seen = np.empty((0, 1), dtype=bool)
+        self.last_day = None
+
+    def _encode(self, names, labels, index, grow):
+        codes = np.empty(len(names), dtype=np.int64)
+        uniques, inverse = np.unique(np.asarray(names, dtype=object).astype(str), return_inverse=True)
+        lookup = np.empty(len(uniques), dtype=np.int64)
+        for i, name in enumerate(uniques):
+            if name not in index:
+                index[name] = len(labels)
+                labels.append(name)
+                grow()
+            lookup[i] = index[name]
+        codes[:] = lookup[inverse.ravel()]
+        return codes
+
+    def _grow_team(self):
+        self.ratings = np.append(self.ratings, float(self.base_rating))
+        self.games = np.append(self.games, 0)
+        self.map_ratings = np.vstack([self.map_ratings, np.full((1, len(self.map_types)), float(self.base_rating))])
+        self.map_seen = np.vstack([self.map_seen, np.zeros((1, len(self.map_types)), dtype=bool)])
+
+    def _grow_map(self):
+        n = len(self.teams)
+        self.map_ratings = np.hstack([self.map_ratings, np.full((n, 1), float(self.base_rating))])
+        self.map_seen = np.hstack([self.map_seen, np.zeros((n, 1), dtype=bool)])
+
+    def fit(self, rows):
+        self.__init__(self.base_rating, self.k, self.half_life_days, self.playoff_boost)
+        return self.update(rows)
+
+    def update(self, rows, reference_day=None):
+        if len(rows) == 0:
+            return self
+        t = self._encode(rows["team"].to_numpy(), self.teams, self.team_index, self._grow_team)
+        o = self._encode(rows["opp_team"].to_numpy(), self.teams, self.team_index, self._grow_team)
+        m = self._encode(map_type_labels(rows), self.map_types, self.map_index, self._grow_map)
+        res = rows["Result"].to_numpy(dtype=np.float64)
+        days = rows["days"].to_numpy(dtype=np.float64)
+
+        ref = days.max() if reference_day is None else reference_day
+        decay = 0.5 ** ((ref - days) / self.half_life_days)
+        if "phase" in rows.columns:
+            phase = rows["phase"].astype(str).str.lower()
+            playoff = (phase.str.contains("playoff") | phase.str.contains("final")).to_numpy()
+        else:
+            playoff = np.zeros(len(rows), dtype=bool)
+        boost = np.where(playoff, self.playoff_boost, 1.0)
+        # playoff games also double the dynamic K
+        weight = (decay * boost * np.where(playoff, 2.0, 1.0)).tolist()
+
+        # the update is sequential by nature: run it over plain Python lists
+        n_maps = len(self.map_types)
+        r = self.ratings.tolist()
+        rm = self.map_ratings.ravel().tolist()
+        games = self.games.tolist()
+        k = self.k
+        for ti, oi, mi, y, w in zip(t.tolist(), o.tolist(), m.tolist(), res.tolist(), weight):
+            games[ti] += 1
+            games[oi] += 1
+            step = k / games[ti] ** 0.5 * w
+
+            exp_t = 1 / (1 + 10 ** ((r[oi] - r[ti]) / 400))
+            r[ti] += step * (y - exp_t)
+            r[oi] += step * ((1 - y) - (1 - exp_t))
+
+            a, b = ti * n_maps + mi, oi * n_maps + mi
+            exp_m = 1 / (1 + 10 ** ((rm[b] - rm[a]) / 400))
+            rm[a] += step * (y - exp_m)
+            rm[b] += step * ((1 - y) - (1 - exp_m))
+
+        self.ratings = np.array(r)
+        self.map_ratings = np.array(rm).reshape(-1, n_maps)
+        self.games = np.array(games, dtype=np.int64)
+        self.map_seen[t, m] = True
+        self.map_seen[o, m] = True
+        self.last_day = float(ref)
+        return self
+
+    def rating(self, team):
+        i = self.team_index.get(team)
+        return self.base_rating if i is None else float(self.ratings[i])
+
+    def ratings_dict(self):
+        return dict(zip(self.teams, self.ratings.tolist()))
+
+    def probability(self, team1, team2, map_type=None):
+        i, j = self.team_index.get(team1), self.team_index.get(team2)
+        m = self.map_index.get(map_type) if map_type else None
+        if m is not None and i is not None and self.map_seen[i, m]:
+            r1 = self.map_ratings[i, m]
+            r2 = self.map_ratings[j, m] if j is not None else self.base_rating
+        else:
+            r1, r2 = self.rating(team1), self.rating(team2)
+        return 1 / (1 + 10 ** ((r2 - r1) / 400))
+
+    def probabilities(self, team1, team2, map_type=None):
+        """Vectorized `probability` over arrays of team names."""
+        i = np.array([self.team_index.get(t, -1) for t in team1], dtype=np.int64)
+        j = np.array([self.team_index.get(t, -1) for t in team2], dtype=np.int64)
+        base = float(self.base_rating)
+        r1 = np.where(i >= 0, self.ratings[i] if len(self.teams) else base, base)
+        r2 = np.where(j >= 0, self.ratings[j] if len(self.teams) else base, base)
+        m = self.map_index.get(map_type) if map_type else None
+        if m is not None and len(self.teams):
+            use_map = (i >= 0) & self.map_seen[i, m]
+            r1 = np.where(use_map, self.map_ratings[i, m], r1)
+            r2 = np.where(use_map, np.where(j >= 0, self.map_ratings[j, m], base), r2)
+        return 1 / (1 + 10 ** ((r2 - r1) / 400))
+
+    def save(self, path):
+        state = {
+            "params": {
+                "base_rating": self.base_rating, "k": self.k,
+                "half_life_days": self.half_life_days, "playoff_boost": self.playoff_boost,
+            },
+            "teams": self.teams,
+            "map_types": self.map_types,
+            "ratings": self.ratings.tolist(),
+            "games": self.games.tolist(),
+            "map_ratings": self.map_ratings.tolist(),
+            "map_seen": self.map_seen.tolist(),
+            "last_day": self.last_day,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        engine = cls(**state["params"])
+        engine.teams = state["teams"]
+        engine.team_index = {t: i for i, t in enumerate(engine.teams)}
+        engine.map_types = state["map_types"]
+        engine.map_index = {m: i for i, m in enumerate(engine.map_types)}
+        n, n_maps = len(engine.teams), len(engine.map_types)
+        engine.ratings = np.array(state["ratings"], dtype=np.float64)
+        engine.games = np.array(state["games"], dtype=np.int64)
+        engine.map_ratings = np.array(state["map_ratings"], dtype=np.float64).reshape(n, n_maps)
+        engine.map_seen = np.array(state["map_seen"], dtype=bool).reshape(n, n_maps)
+        engine.last_day = state["last_day"]
+        return engine
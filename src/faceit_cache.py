@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of raw FaceIT responses.
+
+    Bodies live once under `blobs/<sha[:2]>/<sha>.json`; `index.jsonl` is an
+    append-only log mapping `(kind, match_id)` to the blob hash plus the ETag,
+    Last-Modified and fetch timestamp of the response (last line wins). Appending
+    keeps an interrupted scrape consistent without rewriting the whole index.
+    """
+
+    def __init__(self, root="faceit_cache"):
+        self.root = root
+        self.index_path = os.path.join(root, "index.jsonl")
+        self.lock = threading.Lock()
+        self.index = {}
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        self.index[(entry["kind"], entry["match_id"])] = entry
+
+    def _blob_path(self, sha):
+        return os.path.join(self.root, "blobs", sha[:2], f"{sha}.json")
+
+    def meta(self, kind, mid):
+        return self.index.get((kind, mid))
+
+    def get(self, kind, mid):
+        entry = self.meta(kind, mid)
+        if entry is None:
+            return None
+        with open(self._blob_path(entry["sha256"]), encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, kind, mid, body, etag=None, last_modified=None):
+        """Store the raw response bytes `body` and return the parsed JSON."""
+        sha = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)
+
+        data = json.loads(body)
+        if kind == "matches":
+            final = data.get("status") == "FINISHED"
+        else:
+            final = bool(data.get("rounds"))
+        self._record({
+            "kind": kind,
+            "match_id": mid,
+            "sha256": sha,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "final": final,
+        })
+        return data
+
+    def touch(self, kind, mid):
+        """Refresh the timestamp of an entry after a 304 Not Modified."""
+        entry = dict(self.meta(kind, mid))
+        entry["fetched_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._record(entry)
+
+    def _record(self, entry):
+        with self.lock:
+            self.index[(entry["kind"], entry["match_id"])] = entry
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def is_final(self, kind, mid):
+        """A finished room never changes: its match document is final once FaceIT
+        reports FINISHED, and its stats once they carry rounds for a finished room."""
+        match = self.meta("matches", mid)
+        if not (match and match.get("final")):
+            return False
+        if kind == "matches":
+            return True
+        stats = self.meta("stats", mid)
+        return bool(stats and stats.get("final"))
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrument import event
+
+BASE_URL = "https://open.faceit.com/data/v4"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FaceitClient:
+    """Pooled, rate-limited FaceIT Data API client.
+
+    One keep-alive `requests.Session` is shared by a thread pool of `concurrency`
+    workers, so the `/matches/{id}` and `/matches/{id}/stats` calls of many rooms
+    are in flight at once. Every request takes a token from the bucket first and
+    429/5xx responses are retried with exponential backoff (honouring Retry-After).
+
+    With a `ResponseCache`, finished rooms are served from disk without touching
+    the network, other cached responses are revalidated with If-None-Match, and
+    `offline=True` replays the cache only.
+
+    Every network request is logged as a `faceit.request` event (see
+    instrument.py) with its status, latency and retry count; `stats` keeps the
+    totals of the run.
+    """
+
+    def __init__(self, api_key, base_url=BASE_URL, concurrency=8, rate=8.0, burst=None,
+                 max_retries=5, backoff=0.5, timeout=15, cache=None, offline=False):
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.offline = offline
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, burst)
+        self.stats = {"requests": 0, "retries": 0, "cache_hits": 0}
+        self.stats_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_json(self, path, cache_key=None):
+        entry = self.cache.meta(*cache_key) if self.cache is not None and cache_key else None
+        if entry is not None and (self.offline or self.cache.is_final(*cache_key)):
+            self._count(cache_hits=1)
+            return self.cache.get(*cache_key)
+        if self.offline:
+            return {}
+
+        headers = {"If-None-Match": entry["etag"]} if entry and entry.get("etag") else {}
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                resp = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    self._log(path, type(e).__name__, start, attempt)
+                    raise
+                time.sleep(self._delay(attempt))
+                continue
+
+            if resp.status_code in RETRY_STATUS and attempt < self.max_retries:
+                retry_after = resp.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self._delay(attempt)
+                resp.close()
+                time.sleep(delay)
+                continue
+            self._log(path, resp.status_code, start, attempt)
+            if resp.status_code == 304 and entry is not None:
+                self.cache.touch(*cache_key)
+                return self.cache.get(*cache_key)
+            # rooms without a scoreboard answer 404 on /stats; treat it as "no data"
+            if resp.status_code == 404:
+                return {}
+            resp.raise_for_status()
+            if self.cache is not None and cache_key:
+                return self.cache.put(*cache_key, resp.content,
+                                      etag=resp.headers.get("ETag"),
+                                      last_modified=resp.headers.get("Last-Modified"))
+            return resp.json()
+
+    def _count(self, **counts):
+        with self.stats_lock:
+            for k, v in counts.items():
+                self.stats[k] += v
+
+    def _log(self, path, status, start, retries):
+        self._count(requests=1, retries=retries)
+        event("faceit.request", path=path, status=status,
+              latency_s=round(time.perf_counter() - start, 4), retries=retries)
+
+    def _delay(self, attempt):
+        return self.backoff * (2 ** attempt) * (1 + random.random())
+
+    def fetch_match(self, mid):
+        return (self.get_json(f"matches/{mid}", ("matches", mid)),
+                self.get_json(f"matches/{mid}/stats", ("stats", mid)))
+
+    def fetch_matches(self, match_ids):
+        """Yield `(mid, match_json, stats_json)` in input order with both calls of
+        every room running concurrently. At most `2 * concurrency` rooms are
+        in flight, so results are handed back as soon as the head one is done."""
+        window = max(1, 2 * self.concurrency)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for mid in match_ids:
+                pending.append((
+                    mid,
+                    pool.submit(self.get_json, f"matches/{mid}", ("matches", mid)),
+                    pool.submit(self.get_json, f"matches/{mid}/stats", ("stats", mid)),
+                ))
+                if len(pending) >= window:
+                    mid_done, m, s = pending.popleft()
+                    yield mid_done, m.result(), s.result()
+            while pending:
+                mid_done, m, s = pending.popleft()
+                yield mid_done, m.result(), s.result()
+
+
+#Stub server for offline runs and tests: serves <root>/matches/<mid>.json and
+#<root>/matches/<mid>/stats.json (recorded API responses) under the same paths as the API.
+#Bodies carry an ETag and If-None-Match is answered with 304. `faults` maps a path
+#(e.g. "matches/<mid>") to statuses sent before its recorded body (429 comes with
+#Retry-After: 0), and `delay` holds every request that many seconds. The server keeps
+#`log` (path, status) of every request and `peak`, the most requests in flight at once.
+def serve_recorded(root, host="127.0.0.1", port=0, faults=None, delay=0.0):
+    faults = {k.strip("/"): list(v) for k, v in (faults or {}).items()}
+    lock = threading.Lock()
+    in_flight = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with lock:
+                in_flight[0] += 1
+                server.peak = max(server.peak, in_flight[0])
+            try:
+                time.sleep(delay)
+                self._answer(self.path.split("?")[0].strip("/"))
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        def _answer(self, rel):
+            with lock:
+                fault = faults[rel].pop(0) if faults.get(rel) else None
+            if fault is not None:
+                self._send(rel, fault, {"errors": [{"message": "injected"}]},
+                           {"Retry-After": "0"} if fault == 429 else {})
+                return
+            path = os.path.join(root, *rel.split("/")) + ".json"
+            if not os.path.isfile(path):
+                self._send(rel, 404, {"errors": [{"message": "not found"}]})
+                return
+            with open(path, encoding="utf-8") as f:
+                body = json.load(f)
+            etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(rel, 304, None, {"ETag": etag})
+                return
+            self._send(rel, 200, body, {"ETag": etag})
+
+        def _send(self, rel, status, body, headers=None):
+            with lock:
+                server.log.append((rel, status))
+            data = b"" if body is None else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            if body is not None:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.log, server.peak = [], 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
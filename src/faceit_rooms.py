@@ -0,0 +1,88 @@
+from datetime import datetime
+
+
+def room_rows(mid, m, s, player=lambda player_id, nickname, match_date: nickname):
+    """Rows of one FaceIT room in the scraper's flat layout (row_sink.ROW_COLUMNS),
+    from its /matches document `m` and /matches/{id}/stats document `s`.
+
+    `player(player_id, nickname, match_date)` names each player (the scraper
+    passes IdentityTable.observe). A room without stats gives one
+    metadata_only row per team, a team without players one per map.
+    """
+    rows = []
+
+    match_date = m.get("started_at")
+    if match_date:
+        match_date = datetime.utcfromtimestamp(match_date).isoformat()
+
+    map_entities = {e["guid"]: e["name"] for e in m.get("voting", {}).get("map", {}).get("entities", [])}
+    map_picks = m.get("voting", {}).get("map", {}).get("pick", [])
+    maps_ordered = [map_entities.get(g, g) for g in map_picks]
+
+    hero_entities = {e["guid"]: e["name"] for e in m.get("voting", {}).get("heroes", {}).get("entities", [])}
+    ban_sets = []
+    for game_bans in m.get("voting", {}).get("heroes", {}).get("pick", []):
+        names = []
+        if isinstance(game_bans, list):
+            for guid in game_bans:
+                names.append(hero_entities.get(guid, guid))
+        else:
+            names.append(hero_entities.get(game_bans, game_bans))
+        ban_sets.append(", ".join(names))
+
+    if not s.get("rounds"):
+        for team in m.get("teams", []):
+            team_name = team.get("name") or team.get("team_id")
+            rows.append({
+                "match_id": mid,
+                "match_date": match_date,
+                "round_num": None,
+                "map_name": None,
+                "hero_bans": None,
+                "team": team_name,
+                "player": None,
+                "Result": None,
+                "data_quality": "metadata_only"
+            })
+        return rows
+
+    for r_i, rnd in enumerate(s.get("rounds", []), start=1):
+        raw_guid = rnd.get("round_stats", {}).get("Map", "")
+        map_name = map_entities.get(raw_guid, "") or (maps_ordered[r_i-1] if r_i-1 < len(maps_ordered) else "")
+        hero_bans = ban_sets[r_i-1] if r_i-1 < len(ban_sets) else ""
+
+        for team in rnd.get("teams", []):
+            team_name = team.get("team_stats", {}).get("Team") or team.get("team_id")
+            result = 1 if team.get("team_stats", {}).get("Team Win", "0") == "1" else 0
+
+            if not team.get("players"):
+                rows.append({
+                    "match_id": mid,
+                    "match_date": match_date,
+                    "round_num": r_i,
+                    "map_name": map_name,
+                    "hero_bans": hero_bans,
+                    "team": team_name,
+                    "player": None,
+                    "Result": result,
+                    "data_quality": "metadata_only"
+                })
+                continue
+
+            for p in team.get("players", []):
+                row = {
+                    "match_id": mid,
+                    "match_date": match_date,
+                    "round_num": r_i,
+                    "map_name": map_name,
+                    "hero_bans": hero_bans,
+                    "team": team_name,
+                    "player": player(p.get("player_id"), p.get("nickname"), match_date),
+                    "player_id": p.get("player_id"),
+                    "nickname": p.get("nickname"),
+                    "Result": result,
+                    "data_quality": "full"
+                }
+                row.update(p.get("player_stats", {}))
+                rows.append(row)
+    return rows
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from rollups import Grouping, factorize_keys
+
+
+def _as_list(cols):
+    if cols is None:
+        return []
+    return [cols] if isinstance(cols, str) else list(cols)
+
+
+class FormFeatures:
+    """Shifted rolling / expanding / exponentially-decayed means per group.
+
+    Rows are sorted once by (group, `order`) and every statistic is computed for
+    all groups and all `columns` together from cumulative sums (an IIR filter
+    for the EWM), resetting at group boundaries, so nothing calls back into
+    Python per group.
+
+    With `closed="left"` (the default) a row only sees rows strictly before it
+    in its group, and rows sharing the same `block` value (e.g. every map or
+    player row of one match) all get the value as of the start of their block,
+    so a match never leaks into its own features. `closed="right"` includes the
+    row (or its whole block): the form *after* it, as used for the latest
+    snapshot before an upcoming match.
+
+    NaN values are skipped like pandas does (`min_periods` counts non-NaN
+    values; the EWM matches `ewm(halflife=..., adjust=True)`).
+
+    `transform` computes a full history and keeps, per group, the last rows of
+    the longest window plus the running expanding / EWM sums. `update` then
+    appends new rows (assumed to come after the history) without recomputing
+    it and returns features for the new rows only.
+
+    Outputs are named `<col>_roll<w>`, `<col>_exp` and `<col>_ewm`.
+    """
+
+    def __init__(self, columns, by, order=None, windows=(3,), expanding=True,
+                 halflife=None, block=None, closed="left", min_periods=1):
+        if closed not in ("left", "right"):
+            raise ValueError(f"closed must be 'left' or 'right', got {closed!r}")
+        self.columns = _as_list(columns)
+        self.by = _as_list(by)
+        self.order = _as_list(order)
+        self.windows = tuple(windows)
+        self.expanding = expanding
+        self.halflife = halflife
+        self.block = _as_list(block)
+        self.closed = closed
+        self.min_periods = min_periods
+        self.reset()
+
+    def reset(self):
+        c = len(self.columns)
+        self.keys = pd.DataFrame(columns=self.by)
+        self.tail = pd.DataFrame(columns=self.by + self.columns)
+        self.exp_sum = self.exp_cnt = np.zeros((0, c))
+        self.ewm_num = self.ewm_den = np.zeros((0, c))
+        return self
+
+    @property
+    def output_columns(self):
+        names = []
+        for col in self.columns:
+            names += [f"{col}_roll{w}" for w in self.windows]
+            if self.expanding:
+                names.append(f"{col}_exp")
+            if self.halflife is not None:
+                names.append(f"{col}_ewm")
+        return names
+
+    def transform(self, frame):
+        return self.reset().update(frame)
+
+    def update(self, frame):
+        """Features for the rows of `frame` (aligned to its index), given the
+        history seen so far; the state then includes `frame`."""
+        n_tail = len(self.tail)
+        new = frame[self.by + self.columns].copy()
+        new["_part"] = 1
+        for i, c in enumerate(self.order + self.block):
+            new[f"_k{i}"] = pd.factorize(frame[c], sort=True)[0]
+        tail = self.tail.assign(_part=0)
+        combined = pd.concat([tail, new], ignore_index=True) if n_tail else new.reset_index(drop=True)
+        for c in self.by:
+            combined[c] = combined[c].astype(object)
+
+        # one stable sort: group, then history before new rows, then `order`
+        grouping = Grouping(factorize_keys(combined, self.by), self.by)
+        if (grouping.group < 0).any():
+            raise ValueError(f"NaN in group columns {self.by}")
+        n_order, n_block = len(self.order), len(self.block)
+        sort_keys = [combined[f"_k{i}"].fillna(-1).to_numpy() for i in range(n_order)][::-1]
+        order = np.lexsort(sort_keys + [combined["_part"].to_numpy(), grouping.group])
+        rows = combined.iloc[order].reset_index(drop=True)
+        g = grouping.group[order]
+        n = len(rows)
+        pos = np.arange(n)
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if n else np.zeros(0, dtype=np.int64)
+        first = np.repeat(starts, np.diff(np.r_[starts, n]))
+
+        # blocks: history rows stand alone, new rows share a block per `block` key
+        part = rows["_part"].to_numpy()
+        new_block = (pos == first) | (part == 0) | np.r_[True, part[1:] != part[:-1]] | (n_block == 0)
+        for i in range(n_order, n_order + n_block):
+            k = rows[f"_k{i}"].to_numpy()
+            new_block |= np.r_[True, k[1:] != k[:-1]]
+        block_start = np.flatnonzero(new_block)
+        block_first = np.repeat(block_start, np.diff(np.r_[block_start, n]))
+        block_last = np.repeat(np.r_[block_start[1:], n] - 1, np.diff(np.r_[block_start, n]))
+
+        # seeds: running sums of each group before its first history row
+        keys = rows[self.by].iloc[starts].reset_index(drop=True)
+        known = keys.merge(self.keys.assign(_i=np.arange(len(self.keys))), on=self.by, how="left")["_i"]
+        known = known.fillna(-1).astype(int).to_numpy()
+
+        def seed(arr):
+            out = np.zeros((len(starts), len(self.columns)))
+            out[known >= 0] = arr[known[known >= 0]]
+            return out[np.searchsorted(starts, first, side="right") - 1]
+
+        x = rows[self.columns].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(x)
+        x0 = np.where(valid, x, 0.0)
+        v = valid.astype(np.float64)
+        zero = np.zeros((1, x.shape[1]))
+        cs, cc = np.vstack([zero, np.cumsum(x0, axis=0)]), np.vstack([zero, np.cumsum(v, axis=0)])
+        seed_sum, seed_cnt = seed(self.exp_sum), seed(self.exp_cnt)
+
+        # EWM numerator/denominator, inclusive of each row, restarted per group
+        alpha = 0.5 ** (1 / self.halflife) if self.halflife is not None else 0.0
+        if self.halflife is not None and n:
+            decay = (alpha ** (pos - first + 1))[:, None]
+            y = np.vstack([zero, lfilter([1.0], [1.0, -alpha], x0, axis=0)])
+            d = np.vstack([zero, lfilter([1.0], [1.0, -alpha], v, axis=0)])
+            ewm_num = y[pos + 1] - decay * y[first] + decay * seed(self.ewm_num)
+            ewm_den = d[pos + 1] - decay * d[first] + decay * seed(self.ewm_den)
+            seed_num, seed_den = seed(self.ewm_num), seed(self.ewm_den)
+
+        def before(e):
+            # running sums over the rows of the group before row e
+            out = [cs[e] - cs[first] + seed_sum, cc[e] - cc[first] + seed_cnt]
+            if self.halflife is not None:
+                at_start = (e == first)[:, None]
+                out += [np.where(at_start, seed_num, ewm_num[e - 1]),
+                        np.where(at_start, seed_den, ewm_den[e - 1])]
+            return out
+
+        def mean(total, count, min_periods=1):
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(count >= min_periods, total / count, np.nan)
+
+        # evaluate every row at the start (left) or end (right) of its block
+        e = block_first if self.closed == "left" else block_last + 1
+        result = {}
+        for w in self.windows:
+            lo = np.maximum(e - w, first)
+            result[w] = mean(cs[e] - cs[lo], cc[e] - cc[lo], self.min_periods)
+        sums = before(e)
+        if self.expanding:
+            result["exp"] = mean(sums[0], sums[1], self.min_periods)
+        if self.halflife is not None:
+            result["ewm"] = mean(sums[2], sums[3], 0)
+
+        out = {}
+        for j, col in enumerate(self.columns):
+            for w in self.windows:
+                out[f"{col}_roll{w}"] = result[w][:, j]
+            if self.expanding:
+                out[f"{col}_exp"] = result["exp"][:, j]
+            if self.halflife is not None:
+                out[f"{col}_ewm"] = result["ewm"][:, j]
+        out = pd.DataFrame(out, columns=self.output_columns)
+        is_new = part == 1
+        features = pd.DataFrame(index=frame.index, columns=self.output_columns, dtype=np.float64)
+        features.iloc[order[is_new] - n_tail] = out[is_new].to_numpy()
+
+        # new state: last `max(windows)` rows per group and the sums before them
+        keep = max(self.windows, default=0)
+        tail_start = np.maximum(np.r_[starts[1:], n] - keep, starts)
+        tail_start = np.repeat(tail_start, np.diff(np.r_[starts, n]))
+        state = before(tail_start)
+        in_tail = pos >= tail_start
+        self.keys = keys
+        self.tail = rows.loc[in_tail, self.by + self.columns].reset_index(drop=True)
+        self.exp_sum, self.exp_cnt = state[0][starts], state[1][starts]
+        if self.halflife is not None:
+            self.ewm_num, self.ewm_den = state[2][starts], state[3][starts]
+        return features
@@ -0,0 +1,225 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from pairing import Pairing
+from storage import DATA_DIR
+
+H2H_FILE = "head_to_head.npz"
+ALL = "all"
+# per ordered pair (team, opponent); the recency-weighted sums use weights that double every half-life
+MEASURES = ["maps_won", "maps_lost", "matches_won", "matches_lost", "recent_won", "recent_played"]
+FEATURES = ["h2h_maps", "h2h_map_wr", "h2h_match_wr", "h2h_recent_wr"]
+NEUTRAL = {"h2h_maps": 0.0, "h2h_map_wr": 0.5, "h2h_match_wr": 0.5, "h2h_recent_wr": 0.5}
+
+
+def _days(values):
+    """Days since the epoch for dates, or the values themselves when numeric (e.g. seq)."""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64)
+    when = pd.to_datetime(values, errors="coerce")
+    return (when - pd.Timestamp(0)).dt.total_seconds().to_numpy() / 86400
+
+
+def _rates(m):
+    """FEATURES from a (rows x MEASURES) array; NaN where the pair has no maps."""
+    maps = m[:, 0] + m[:, 1]
+    matches = m[:, 2] + m[:, 3]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "h2h_maps": maps,
+            "h2h_map_wr": np.where(maps > 0, m[:, 0] / maps, np.nan),
+            "h2h_match_wr": np.where(matches > 0, m[:, 2] / matches, np.nan),
+            "h2h_recent_wr": np.where(m[:, 5] > 0, m[:, 4] / m[:, 5], np.nan),
+        })
+
+
+class HeadToHead:
+    """Head-to-head records of every pair of teams that have met, per scope.
+
+    Scopes are "all", each region and each "<region>/<stage>". Records live in
+    a hash table from (scope, team, opponent) codes to a row of a
+    (pairs x MEASURES) array, with both directions of a pair stored: `update`
+    adds a batch of whole matches with one groupby, and `record`/`lookup`
+    answer a pair with dict lookups, whatever the number of matches played.
+    `matrix(measure, scope)` is the scope's team x team sparse matrix, for
+    bulk work and the heatmap; pairs that never met take no space.
+
+    Recency weights are 2 ** ((day - anchor) / half_life_days), with the anchor
+    fixed at the first update, so stored sums never need rescaling: the
+    recency-weighted win rate recent_won / recent_played gives a map played
+    one half-life earlier half the weight of today's.
+    """
+
+    def __init__(self, half_life_days=180, date="match_date"):
+        self.half_life_days = half_life_days
+        self.date = date
+        self.teams, self.team_index = [], {}
+        self.scopes, self.scope_index = [ALL], {ALL: 0}
+        self.slots = {}
+        self.keys = np.empty((0, 3), dtype=np.int64)
+        self.values = np.empty((0, len(MEASURES)))
+        self.anchor = None
+
+    @staticmethod
+    def _encode(names, labels, index):
+        uniques, inverse = np.unique(np.asarray(names, dtype=object).astype(str), return_inverse=True)
+        for name in uniques:
+            if name not in index:
+                index[name] = len(labels)
+                labels.append(str(name))
+        return np.array([index[u] for u in uniques], dtype=np.int64)[inverse.ravel()]
+
+    def _directed(self, rows):
+        """One record per team-map row with a known opponent: team, opponent,
+        match, scope labels and the MEASURES of that map (match results are
+        counted on the match's first map row). Index = the row's index."""
+        if "opp_team" in rows.columns:
+            opp = rows["opp_team"].to_numpy()
+            known = pd.notna(opp)
+        else:
+            pairs = Pairing(rows)
+            opp = pairs.values(rows["team"], fill=None)
+            known = pairs.has_opponent
+        rows = rows[known]
+        opp = opp[known]
+        won = rows["Result"].to_numpy(dtype=np.float64) == 1
+        days = _days(rows[self.date]) if self.date in rows.columns else np.zeros(len(rows))
+        if self.anchor is None:
+            self.anchor = float(np.nanmin(days)) if len(days) and not np.isnan(days).all() else 0.0
+        weight = 2.0 ** ((np.nan_to_num(days, nan=self.anchor) - self.anchor) / self.half_life_days)
+
+        out = pd.DataFrame({"team": rows["team"].to_numpy(), "opp": opp, "match_id": rows["match_id"].to_numpy(),
+                            "maps_won": won * 1.0, "maps_lost": (~won) * 1.0,
+                            "recent_won": weight * won, "recent_played": weight}, index=rows.index)
+        # the match goes to whoever won more of its maps (no result for a level series)
+        per_match = out.groupby(["match_id", "team", "opp"], sort=False)[["maps_won", "maps_lost"]].transform("sum")
+        first = ~out.duplicated(["match_id", "team", "opp"])
+        out["matches_won"] = (first & (per_match["maps_won"] > per_match["maps_lost"])) * 1.0
+        out["matches_lost"] = (first & (per_match["maps_won"] < per_match["maps_lost"])) * 1.0
+        for c in ("region", "stage"):
+            out[c] = rows[c].astype(object).to_numpy() if c in rows.columns else None
+        return out
+
+    def update(self, rows):
+        """Add team-map rows of whole matches (match_id, round_num, team,
+        Result, the date column, optionally region/stage and opp_team).
+        A match must not be split across batches."""
+        records = self._directed(rows)
+        if records.empty:
+            return self
+        scoped = [records.assign(scope=ALL)]
+        regional = records[records["region"].notna()]
+        if len(regional):
+            scoped.append(regional.assign(scope=regional["region"].astype(str)))
+            staged = regional[regional["stage"].notna()]
+            scoped.append(staged.assign(scope=staged["region"].astype(str) + "/" + staged["stage"].astype(str)))
+        records = pd.concat(scoped, ignore_index=True)
+        sums = records.groupby(["scope", "team", "opp"], sort=False)[MEASURES].sum()
+
+        s = self._encode(sums.index.get_level_values(0), self.scopes, self.scope_index)
+        t = self._encode(sums.index.get_level_values(1), self.teams, self.team_index)
+        o = self._encode(sums.index.get_level_values(2), self.teams, self.team_index)
+        slot = np.empty(len(sums), dtype=np.int64)
+        new = []
+        for n, key in enumerate(zip(s.tolist(), t.tolist(), o.tolist())):
+            found = self.slots.get(key)
+            if found is None:
+                found = self.slots[key] = len(self.keys) + len(new)
+                new.append(key)
+            slot[n] = found
+        if new:
+            self.keys = np.vstack([self.keys, np.array(new, dtype=np.int64)])
+            self.values = np.vstack([self.values, np.zeros((len(new), len(MEASURES)))])
+        np.add.at(self.values, slot, sums.to_numpy())
+        return self
+
+    def _lookup_values(self, team1, team2, scope=ALL):
+        s = self.scope_index.get(scope)
+        out = np.zeros((len(team1), len(MEASURES)))
+        for n, (a, b) in enumerate(zip(team1, team2)):
+            slot = self.slots.get((s, self.team_index.get(a), self.team_index.get(b)))
+            if slot is not None:
+                out[n] = self.values[slot]
+        return out
+
+    def record(self, team1, team2, scope=ALL):
+        """MEASURES of team1 against team2 (zeros if they never met in `scope`)."""
+        return dict(zip(MEASURES, self._lookup_values([team1], [team2], scope)[0].tolist()))
+
+    def lookup(self, team1, team2, scope=ALL):
+        """FEATURES of team1[k] against team2[k] for arrays of names."""
+        return _rates(self._lookup_values(list(team1), list(team2), scope))
+
+    def features(self, rows):
+        """FEATURES of every row's team against its opponent as of just before
+        the row's match: the stored record plus the earlier matches of `rows`
+        (which must be in chronological order). Rows without an opponent get
+        NaN. Indexed like `rows`; no records are added to the store."""
+        records = self._directed(rows)
+        out = pd.DataFrame(np.nan, index=rows.index, columns=FEATURES)
+        if records.empty:
+            return out
+        # totals per (pair, match) in match order, summed over the pair's earlier matches only
+        per_match = records.groupby(["team", "opp", "match_id"], sort=False)[MEASURES].sum()
+        earlier = per_match.groupby(level=["team", "opp"], sort=False).cumsum() - per_match
+        stored = self._lookup_values(per_match.index.get_level_values(0), per_match.index.get_level_values(1))
+        rates = _rates(earlier.to_numpy() + stored)
+        rates.index = per_match.index
+        rates = rates.reindex(pd.MultiIndex.from_arrays([records["team"], records["opp"], records["match_id"]]))
+        out.loc[records.index] = rates.to_numpy()
+        return out
+
+    def matrix(self, measure, scope=ALL):
+        """Team x team CSR matrix of one measure in a scope (rows: team, columns: opponent)."""
+        s = self.scope_index.get(scope)
+        mask = self.keys[:, 0] == s
+        n = len(self.teams)
+        return sparse.csr_matrix((self.values[mask, MEASURES.index(measure)], (self.keys[mask, 1], self.keys[mask, 2])),
+                                 shape=(n, n))
+
+    def teams_in(self, scope=ALL):
+        """Teams with a record in `scope`, sorted by name."""
+        codes = np.unique(self.keys[self.keys[:, 0] == self.scope_index.get(scope), 1])
+        return sorted(self.teams[c] for c in codes)
+
+    def heatmap_frame(self, scope=ALL, teams=None):
+        """Share of maps won by the row team against the column team, for the
+        teams that played in `scope` (or `teams`); NaN where they never met."""
+        won, lost = self.matrix("maps_won", scope), self.matrix("maps_lost", scope)
+        played = won + lost
+        teams = self.teams_in(scope) if teams is None else teams
+        codes = np.array([self.team_index[t] for t in teams if t in self.team_index], dtype=np.int64)
+        w = won[codes][:, codes].toarray()
+        p = played[codes][:, codes].toarray()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(p > 0, w / p, np.nan)
+        labels = [self.teams[c] for c in codes]
+        return pd.DataFrame(share, index=pd.Index(labels, name="team"), columns=pd.Index(labels, name="opponent"))
+
+    def save(self, root=None, path=None):
+        path = path or os.path.join(root or DATA_DIR, H2H_FILE)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez_compressed(f, teams=np.array(self.teams, dtype=str), scopes=np.array(self.scopes, dtype=str),
+                                keys=self.keys, values=self.values,
+                                params=np.array([self.half_life_days, np.nan if self.anchor is None else self.anchor]),
+                                date=np.array(self.date))
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, root=None, path=None):
+        with np.load(path or os.path.join(root or DATA_DIR, H2H_FILE)) as z:
+            store = cls(half_life_days=float(z["params"][0]), date=str(z["date"]))
+            anchor = float(z["params"][1])
+            store.anchor = None if np.isnan(anchor) else anchor
+            store.teams = z["teams"].tolist()
+            store.scopes = z["scopes"].tolist()
+            store.keys = z["keys"].astype(np.int64)
+            store.values = z["values"]
+        store.team_index = {t: i for i, t in enumerate(store.teams)}
+        store.scope_index = {s: i for i, s in enumerate(store.scopes)}
+        store.slots = {tuple(k): i for i, k in enumerate(store.keys.tolist())}
+        return store
@@ -0,0 +1,182 @@
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from storage import DATA_DIR
+
+IDENTITY_FILE = "player_identities.csv"
+COLUMNS = ["player_id", "alias", "canonical", "valid_from", "valid_to", "note"]
+REPO_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", IDENTITY_FILE)
+
+
+class IdentityConflict(ValueError):
+    pass
+
+
+def identity_path(root=None):
+    """The table in the data folder, else the copy shipped in the repo's data/."""
+    path = os.path.join(root or DATA_DIR, IDENTITY_FILE)
+    return path if os.path.exists(path) or not os.path.exists(REPO_TABLE) else REPO_TABLE
+
+
+def _overlaps(a, b):
+    lo = np.maximum(a["valid_from"].fillna(pd.Timestamp.min).to_numpy(), b["valid_from"].fillna(pd.Timestamp.min).to_numpy())
+    hi = np.minimum(a["valid_to"].fillna(pd.Timestamp.max).to_numpy(), b["valid_to"].fillna(pd.Timestamp.max).to_numpy())
+    return lo < hi
+
+
+class IdentityTable:
+    """Canonical player names keyed by FaceIT player id or by handle (alias).
+
+    Each row maps a `player_id` and/or an `alias` to a `canonical` name for
+    matches played in [valid_from, valid_to) (blank = open-ended). Id rows win
+    over alias rows, so a player keeps one name across handle changes, and an
+    alias that moved between players is split by date. Two rows for the same
+    key with overlapping dates and different names are a conflict: `load`
+    raises IdentityConflict listing them (or warns and keeps the later row
+    with `strict=False`).
+    """
+
+    def __init__(self, rows=None, strict=True):
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame(rows or [], columns=COLUMNS)
+        rows = rows.reindex(columns=COLUMNS).copy()
+        for c in ("player_id", "alias", "canonical", "note"):
+            rows[c] = rows[c].astype(object).where(rows[c].notna() & (rows[c].astype(str) != ""), None)
+        for c in ("valid_from", "valid_to"):
+            rows[c] = pd.to_datetime(rows[c], errors="coerce")
+        rows = rows[rows["canonical"].notna() & (rows["player_id"].notna() | rows["alias"].notna())]
+        rows = rows.drop_duplicates(["player_id", "alias", "canonical", "valid_from", "valid_to"])
+        self.rows = rows.reset_index(drop=True)
+
+        bad = self.conflicts()
+        if len(bad):
+            msg = "Conflicting player identities:\n" + bad.to_string(index=False)
+            if strict:
+                raise IdentityConflict(msg)
+            warnings.warn(msg + "\nkeeping the later row of each conflict")
+            self.rows = self.rows.drop(index=bad["row_a"].unique()).reset_index(drop=True)
+        self._index()
+
+    def _index(self):
+        self.by_id, self.by_alias = {}, {}
+        for r in self.rows.itertuples(index=False):
+            entry = (r.valid_from, r.valid_to, r.canonical)
+            if r.player_id is not None:
+                self.by_id.setdefault(r.player_id, []).append(entry)
+            elif r.alias is not None:
+                self.by_alias.setdefault(r.alias, []).append(entry)
+        self.learned = 0
+
+    @classmethod
+    def load(cls, path=None, strict=True):
+        path = path or identity_path()
+        if not os.path.exists(path):
+            return cls(strict=strict)
+        return cls(pd.read_csv(path, dtype=str, keep_default_na=False), strict=strict)
+
+    def save(self, path=None):
+        path = path or os.path.join(DATA_DIR, IDENTITY_FILE)
+        out = self.rows.copy()
+        for c in ("valid_from", "valid_to"):
+            out[c] = out[c].dt.strftime("%Y-%m-%d")
+        tmp = f"{path}.tmp"
+        out.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+
+    def conflicts(self):
+        """Pairs of rows with the same key, overlapping dates and different names."""
+        found = []
+        for key in ("player_id", "alias"):
+            keyed = self.rows[self.rows[key].notna()]
+            if key == "alias":
+                keyed = keyed[keyed["player_id"].isna()]
+            keyed = keyed.reset_index().rename(columns={"index": "row"})
+            pairs = keyed.merge(keyed, on=key, suffixes=("_a", "_b"))
+            pairs = pairs[(pairs["row_a"] < pairs["row_b"]) & (pairs["canonical_a"] != pairs["canonical_b"])]
+            a = pairs[["valid_from_a", "valid_to_a"]].set_axis(["valid_from", "valid_to"], axis=1)
+            b = pairs[["valid_from_b", "valid_to_b"]].set_axis(["valid_from", "valid_to"], axis=1)
+            pairs = pairs[_overlaps(a, b)] if len(pairs) else pairs
+            found.append(pairs.assign(key=key, value=pairs[key])[
+                ["key", "value", "row_a", "canonical_a", "row_b", "canonical_b"]])
+        return pd.concat(found, ignore_index=True)
+
+    @staticmethod
+    def _active(entries, date):
+        for start, end, name in entries:
+            if date is None or pd.isna(date) or ((pd.isna(start) or start <= date) and (pd.isna(end) or date < end)):
+                return start, end, name
+        return None
+
+    def name(self, player_id=None, alias=None, date=None):
+        """Canonical name of one player on `date` (the handle itself when unknown)."""
+        date = pd.Timestamp(date) if date is not None else None
+        hit = self._active(self.by_id.get(player_id, ()), date) or self._active(self.by_alias.get(alias, ()), date)
+        return hit[2] if hit else alias
+
+    def observe(self, player_id, alias, date=None):
+        """`name` for a scraped row, remembering the player id so later handle
+        changes keep resolving to the same name. The learned id row copies the
+        date range of the alias row it came from, clipped to the dates not yet
+        covered by other rows of the same id."""
+        date = pd.Timestamp(date) if date is not None else None
+        known = self.by_id.get(player_id, [])
+        if player_id is None or alias is None or self._active(known, date):
+            return self.name(player_id, alias, date)
+        start, end, canonical = self._active(self.by_alias.get(alias, ()), date) or (pd.NaT, pd.NaT, alias)
+        if date is not None:
+            before = [e for _, e, _ in known if pd.notna(e) and e <= date]
+            after = [s for s, _, _ in known if pd.notna(s) and s > date]
+            start = max([start] + before) if before and pd.notna(start) else max(before, default=start)
+            end = min([end] + after) if after and pd.notna(end) else min(after, default=end)
+        elif known:
+            return self.name(player_id, alias, date)
+        hit = (start, end, canonical)
+        self.by_id.setdefault(player_id, []).append(hit)
+        row = {"player_id": player_id, "alias": alias, "canonical": canonical,
+               "valid_from": start, "valid_to": end, "note": "learned"}
+        self.rows = pd.concat([self.rows, pd.DataFrame([row])], ignore_index=True)
+        self.learned += 1
+        return canonical
+
+    def resolve(self, frame, player="player", player_id="player_id", alias=None, date="match_date"):
+        """Canonical names for every row of `frame`, vectorized.
+
+        Rows are matched on `player_id` (when the column exists) and then on
+        `alias` (default: a `nickname` column if present, else `player`); only
+        rows whose key appears in the table are joined and date-checked.
+        """
+        alias = alias or ("nickname" if "nickname" in frame.columns else player)
+        out = frame[player].astype(object).to_numpy(copy=True)
+        dates = pd.to_datetime(frame[date], errors="coerce") if date in frame.columns else pd.Series(pd.NaT, index=frame.index)
+        done = np.zeros(len(frame), dtype=bool)
+        for key, column, table in (("player_id", player_id, self.rows[self.rows["player_id"].notna()]),
+                                   ("alias", alias, self.rows[self.rows["player_id"].isna()])):
+            if column not in frame.columns or table.empty:
+                continue
+            values = frame[column].astype(object).to_numpy()
+            todo = np.flatnonzero(~done & pd.Series(values).isin(table[key].unique()).to_numpy())
+            if not len(todo):
+                continue
+            rows = pd.DataFrame({"pos": todo, key: values[todo], "date": dates.to_numpy()[todo]})
+            hits = rows.merge(table[[key, "canonical", "valid_from", "valid_to"]], on=key)
+            active = (hits["date"].isna()
+                      | ((hits["valid_from"].isna() | (hits["valid_from"] <= hits["date"]))
+                         & (hits["valid_to"].isna() | (hits["date"] < hits["valid_to"]))))
+            hits = hits[active].drop_duplicates("pos")
+            out[hits["pos"].to_numpy()] = hits["canonical"].to_numpy()
+            done[hits["pos"].to_numpy()] = True
+        return pd.Series(out, index=frame.index, name=player)
+
+
+#python identities.py [table.csv]: list conflicts and the number of ids/aliases
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else identity_path()
+    try:
+        table = IdentityTable.load(path)
+    except IdentityConflict as e:
+        sys.exit(str(e))
+    print(f"{path}: {len(table.by_id)} player ids, {len(table.by_alias)} aliases, no conflicts")
@@ -0,0 +1,209 @@
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+from storage import DATA_DIR
+
+# OWCS_SPANS: JSON-lines span log ("off" to disable); OWCS_PROFILE: "cprofile" or "pyinstrument"
+SPAN_LOG = os.environ.get("OWCS_SPANS") or os.path.join(DATA_DIR, ".pipeline", "spans.jsonl")
+PROFILE = os.environ.get("OWCS_PROFILE", "").strip().lower()
+# pipeline.py passes its run id so the spans of every stage of one run share it
+RUN_ID = os.environ.get("OWCS_RUN_ID") or f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+_lock = threading.Lock()
+_local = threading.local()
+_script = None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None on Windows)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def emit(record):
+    """Append one record (tagged with the run id and script) to the span log."""
+    if SPAN_LOG.lower() == "off":
+        return
+    line = json.dumps({"run": RUN_ID, "script": _script, "at": time.strftime("%Y-%m-%dT%H:%M:%S"), **record},
+                      default=str)
+    with _lock:
+        os.makedirs(os.path.dirname(os.path.abspath(SPAN_LOG)), exist_ok=True)
+        with open(SPAN_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def event(name, **fields):
+    """A point record, e.g. one API request with its latency and retries."""
+    emit({"event": name, **fields})
+
+
+class Span:
+    """One timed step of a script: wall and CPU seconds, rows in and out and
+    the process's peak RSS when it ended. Use as a context manager, or call
+    `end()` when a step cannot be one block. Spans opened while another is open on
+    the same thread record it as their parent. CPU time is the whole
+    process's, so it includes any worker threads of the step.
+    """
+
+    def __init__(self, name, rows_in=None, **attrs):
+        self.name = name
+        self.rows_in = rows_in
+        self.attrs = attrs
+        self.stack = _local.__dict__.setdefault("stack", [])
+        self.parent = self.stack[-1].name if self.stack else _script
+        self.stack.append(self)
+        self.start = time.perf_counter()
+        self.cpu = time.process_time()
+        self.ended = False
+
+    def end(self, rows_out=None, status="ok", **attrs):
+        if self.ended:
+            return
+        self.ended = True
+        if self in self.stack:
+            self.stack.remove(self)
+        emit({
+            "span": self.name, "parent": self.parent, "status": status,
+            "wall_s": round(time.perf_counter() - self.start, 4),
+            "cpu_s": round(time.process_time() - self.cpu, 4),
+            "rows_in": self.rows_in, "rows_out": rows_out,
+            "peak_rss_mb": peak_rss_mb(), **self.attrs, **attrs,
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, tb):
+        if kind is None:
+            self.end()
+        else:
+            self.end(status=_exit_status(value.code) if issubclass(kind, SystemExit) else f"error: {kind.__name__}")
+
+    def set(self, **attrs):
+        """Attach fields (rows_out included) to be written when the span ends."""
+        self.attrs.update(attrs)
+
+
+def _start_profiler():
+    if PROFILE == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            warnings.warn("pyinstrument is not installed; profiling with cProfile instead")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    if PROFILE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    return None
+
+
+def _dump_profile(profiler, name):
+    folder = os.path.join(os.path.dirname(os.path.abspath(SPAN_LOG)), "profiles")
+    os.makedirs(folder, exist_ok=True)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = os.path.join(folder, f"{name}-{RUN_ID}.prof")
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = os.path.join(folder, f"{name}-{RUN_ID}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    return path
+
+
+def _exit_status(code):
+    """Span status of a SystemExit code: 0 or None is a normal end, anything
+    else (another number, or a message as in sys.exit("...")) an error."""
+    if code is None or code == 0:
+        return "ok"
+    return f"error: exit {code}" if isinstance(code, int) else f"error: {code}"
+
+
+def script(name):
+    """Open the root span of a script run (closed at exit, with an error status
+    if the script died) and start the profiler when OWCS_PROFILE is set; the
+    dump goes to profiles/<name>-<run>.prof (.html for pyinstrument) next to
+    the span log. Returns the root span.
+
+    An uncaught exception is seen through sys.excepthook. The interpreter
+    handles SystemExit without calling the hook, so sys.exit is wrapped to
+    record its code as well."""
+    global _script
+    _script = name
+    profiler = _start_profiler()
+    root = Span(name)
+    root.parent = None
+    status = {"status": "ok"}
+    excepthook, exit = sys.excepthook, sys.exit
+
+    def on_exception(kind, value, tb):
+        status["status"] = f"error: {kind.__name__}"
+        excepthook(kind, value, tb)
+
+    def on_exit(code=None):
+        status["status"] = _exit_status(code)
+        exit(code)
+
+    def finish():
+        fields = {"profile": _dump_profile(profiler, name)} if profiler is not None else {}
+        root.end(status=status["status"], **fields)
+
+    sys.excepthook, sys.exit = on_exception, on_exit
+    atexit.register(finish)
+    return root
+
+
+def summarize(records, run=None):
+    """Spans of one run (default: the latest) in log order, plus per-event
+    counts with mean/p95 latency and total retries."""
+    frame = pd.DataFrame(records)
+    if frame.empty:
+        return frame, frame
+    frame = frame[frame["run"] == (run or frame["run"].iloc[-1])]
+    spans = frame[frame["span"].notna()] if "span" in frame.columns else frame.iloc[:0]
+    spans = spans.reindex(columns=["script", "span", "parent", "status", "wall_s", "cpu_s",
+                                   "rows_in", "rows_out", "peak_rss_mb"])
+    spans[["rows_in", "rows_out"]] = spans[["rows_in", "rows_out"]].astype("Int64")
+    events = frame[frame["event"].notna()] if "event" in frame.columns else frame.iloc[:0]
+    if events.empty:
+        return spans, events
+    events = events.groupby(["script", "event"]).agg(
+        count=("event", "size"), mean_s=("latency_s", "mean"),
+        p95_s=("latency_s", lambda s: s.quantile(0.95)), retries=("retries", "sum"),
+    ).reset_index()
+    return spans, events
+
+
+#python instrument.py [spans.jsonl] [--run ID]: the spans and request stats of the latest (or given) run
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the span log of a run")
+    parser.add_argument("path", nargs="?", default=SPAN_LOG)
+    parser.add_argument("--run", help="run id (default: the latest)")
+    args = parser.parse_args()
+    with open(args.path, encoding="utf-8") as f:
+        spans, events = summarize([json.loads(line) for line in f if line.strip()], args.run)
+    print(spans.to_string(index=False))
+    if len(events):
+        print()
+        print(events.to_string(index=False, float_format="{:.3f}".format))
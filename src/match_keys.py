@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# <REGION>_S<stage>_RR_W<week>_D<day>_M<n> (round robin) or <REGION>_S<stage>_PO_<bracket round>_M<n> (playoffs)
+MATCH_ID_PATTERN = (r"^(?P<region>[A-Z]+)_S(?P<stage>\d+)_(?P<phase>RR|PO)_"
+                    r"(?:W(?P<week>\d+)_D(?P<day>\d+)|(?P<bracket>[A-Z0-9]+))_M(?P<match_num>\d+)$")
+PHASES = {"RR": "Round Robin", "PO": "Playoffs"}
+# double-elimination rounds in the order they are played; unknown rounds go after these
+BRACKET_ORDER = {"UBQF": 0, "UBSF": 1, "LBR1": 2, "LBQF": 3, "UBF": 4, "LBSF": 5, "LBF": 6, "GF": 7}
+PART_COLUMNS = ["region", "stage", "phase", "week", "day", "bracket", "match_num", "position"]
+LABEL_COLUMNS = ["region", "stage", "phase"]
+# the parts stored as columns of the aggregated tables, next to seq
+ID_PART_COLUMNS = [c for c in PART_COLUMNS if c not in LABEL_COLUMNS]
+
+
+def parse_match_ids(values):
+    """Typed parts of OWCS match ids (e.g. EMEA_S1_RR_W4_D2_M1), one row per value.
+
+    Each distinct id is matched once; rows are gathered by code. `stage` and
+    `phase` use the labels of the data ("S1", "Round Robin" / "Playoffs").
+    `position` orders matches inside a stage: round-robin week and day, then
+    the playoff rounds in bracket order. Ids outside the scheme (raw FaceIT
+    room ids) and missing ids get missing parts.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    parts = pd.Series(uniques, dtype=object).astype(str).str.extract(MATCH_ID_PATTERN)
+    week = pd.to_numeric(parts["week"])
+    day = pd.to_numeric(parts["day"])
+    bracket_rank = parts["bracket"].map(BRACKET_ORDER).fillna(len(BRACKET_ORDER))
+    position = (week * 10 + day).where(parts["phase"] == "RR", 10_000 + bracket_rank)
+    table = pd.DataFrame({
+        "region": parts["region"],
+        "stage": "S" + parts["stage"],
+        "phase": parts["phase"].map(PHASES),
+        "week": week.astype("Int16"),
+        "day": day.astype("Int16"),
+        "bracket": parts["bracket"],
+        "match_num": pd.to_numeric(parts["match_num"]).astype("Int16"),
+        "position": position.where(parts["phase"].notna()).astype("Int32"),
+    })
+    # one extra all-missing row for missing ids (code -1)
+    table = pd.concat([table, table.iloc[:0].reindex([len(table)])])
+    return table.iloc[np.where(codes < 0, len(uniques), codes)].reset_index(drop=True)
+
+
+def fill_labels(frame, parts, match_id="match_id"):
+    """Fill missing region/stage/phase of `frame` from `parts`, a
+    parse_match_ids table indexed by match id. Returns the filled columns."""
+    pos = parts.index.get_indexer(frame[match_id])
+    filled = []
+    for c in LABEL_COLUMNS:
+        if c not in frame.columns or not frame[c].isna().any():
+            continue
+        known = np.where(pos >= 0, parts[c].to_numpy(dtype=object)[pos], None)
+        frame[c] = frame[c].astype(object).fillna(pd.Series(known, index=frame.index))
+        filled.append(c)
+    return filled
+
+
+def sequence_index(frame, date="match_date", match_id="match_id", round_num="round_num"):
+    """Global chronological order of the rows as one int64 key: match date,
+    then bracket position, match number and id within the same date, then
+    round_num. Rows of the same map (both teams, every player) share a value;
+    values are dense from 0. Missing dates sort first. Stored `position` and
+    `match_num` columns are used as they are; otherwise the ids are parsed."""
+    stored = all(c in frame.columns for c in ("position", "match_num"))
+    parts = frame if stored else parse_match_ids(frame[match_id])
+    when = pd.to_datetime(frame[date], errors="coerce").to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    keys = [
+        when,
+        parts["position"].fillna(-1).to_numpy(dtype=np.int64),
+        parts["match_num"].fillna(-1).to_numpy(dtype=np.int64),
+        pd.factorize(frame[match_id].astype(str), sort=True)[0],
+    ]
+    if round_num in frame.columns:
+        keys.append(pd.to_numeric(frame[round_num], errors="coerce").fillna(-1).to_numpy(dtype=np.int64))
+    order = np.lexsort(keys[::-1])
+    change = np.zeros(len(order), dtype=bool)
+    for k in keys:
+        s = k[order]
+        change[1:] |= s[1:] != s[:-1]
+    seq = np.empty(len(order), dtype=np.int64)
+    seq[order] = np.cumsum(change)
+    return seq
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+from h2h import FEATURES as H2H_FEATURES, NEUTRAL as H2H_NEUTRAL
+
+OVERALL = "Overall"
+
+
+def strength_blend(avg_rating):
+    """Weight of the ML probability vs Elo: trust the model more for strong pairs."""
+    return np.select([avg_rating > 1550, avg_rating > 1450], [0.7, 0.5], 0.3)
+
+
+def predict_matchups(pairs, model, index, map_types=(), elo=None, how="profile", region=None,
+                     last_n=None, columns=None, blend=strength_blend, h2h=None):
+    """Score every (team1, team2) pair overall and per map type in one go.
+
+    Each team's feature vector is looked up once in `index` (a TeamIndex:
+    last-N means with how="profile", latest row with how="latest"). The
+    vectors are stacked with one copy per map type (that `map_type_<mt>`
+    dummy set to 1), scored by a single `model.predict_proba` call, and blended
+    with `elo` (an EloEngine, optional) as array operations. Both sides'
+    probabilities are normalized to sum to 1.
+
+    With `h2h` (a HeadToHead), every pair side is scored on its own copy of
+    the team vector whose head-to-head columns (h2h.FEATURES among
+    `columns`) hold that team's record against this opponent.
+
+    Returns one row per pair and map type ("Overall" first), with NaN
+    probabilities and no winner when a team has no history.
+    """
+    pairs = list(pairs)
+    map_types = list(map_types)
+    columns = list(index.columns if columns is None else columns)
+    teams = list(dict.fromkeys(t for pair in pairs for t in pair))
+    if how == "profile":
+        features = index.profile_frame(teams, region, last_n)
+    elif how == "latest":
+        features = index.latest_frame(teams, region)
+    else:
+        raise ValueError(f"how must be 'profile' or 'latest', got {how!r}")
+    features = features[columns]
+    known = features.notna().any(axis=1).to_numpy()
+    base = features.fillna(0).to_numpy(dtype=np.float64)
+
+    pos = {t: i for i, t in enumerate(teams)}
+    i = np.array([pos[a] for a, _ in pairs], dtype=np.int64)
+    j = np.array([pos[b] for _, b in pairs], dtype=np.int64)
+    team1 = np.array([a for a, _ in pairs], dtype=object)
+    team2 = np.array([b for _, b in pairs], dtype=object)
+
+    h2h_cols = [c for c in H2H_FEATURES if c in columns] if h2h is not None else []
+    if h2h_cols:
+        # one row per pair side (team1 sides, then team2 sides) carrying the pair's own record
+        sides = np.concatenate([i, j])
+        base, known = base[sides], known[sides]
+        record = h2h.lookup(np.concatenate([team1, team2]), np.concatenate([team2, team1]))
+        for c in h2h_cols:
+            base[:, columns.index(c)] = record[c].fillna(H2H_NEUTRAL[c]).to_numpy()
+        i, j = np.arange(len(pairs)), len(pairs) + np.arange(len(pairs))
+
+    # variants x sides rows: the vector as-is, then once per map type
+    variants = [base]
+    for mt in map_types:
+        x = base.copy()
+        x[:, columns.index(f"map_type_{mt}")] = 1
+        variants.append(x)
+    ml = np.full((len(variants), len(base)), np.nan)
+    scored = np.flatnonzero(known)
+    if len(scored):
+        stacked = np.concatenate([v[scored] for v in variants])
+        proba = model.predict_proba(pd.DataFrame(stacked, columns=columns))[:, 1]
+        ml[:, scored] = proba.reshape(len(variants), len(scored))
+
+    if elo is not None:
+        avg_rating = (np.array([elo.rating(t) for t in team1]) + np.array([elo.rating(t) for t in team2])) / 2
+        w = blend(avg_rating)
+    else:
+        w = np.ones(len(pairs))
+
+    frames = []
+    for v, mt in enumerate([None] + map_types):
+        p1_ml, p2_ml = ml[v, i], ml[v, j]
+        p1_elo = elo.probabilities(team1, team2, mt) if elo is not None else np.zeros(len(pairs))
+        p1 = w * p1_ml + (1 - w) * p1_elo
+        p2 = w * p2_ml + (1 - w) * (1 - p1_elo)
+        total = p1 + p2
+        p1, p2 = p1 / total, p2 / total
+        frames.append(pd.DataFrame({
+            "pair": np.arange(len(pairs)),
+            "team1": team1,
+            "team2": team2,
+            "map_type": mt or OVERALL,
+            "team1_ml": p1_ml,
+            "team2_ml": p2_ml,
+            "team1_elo": p1_elo if elo is not None else np.nan,
+            "team1_proba": p1,
+            "team2_proba": p2,
+            "predicted_winner": np.where(np.isnan(p1), None, np.where(p1 > p2, team1, team2)),
+        }))
+    return pd.concat(frames, ignore_index=True).sort_values(["pair"], kind="stable").reset_index(drop=True)
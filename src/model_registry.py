@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import pandas as pd
+import sklearn
+
+from elo import EloEngine
+from h2h import HeadToHead
+from storage import DATA_DIR
+
+MODEL_DIR = os.environ.get("OWCS_MODEL_DIR", os.path.join(DATA_DIR, "models"))
+
+
+def fingerprint(*parts):
+    """Stable hash of frames/series (values and column names) and plain values
+    such as an unfitted estimator's repr."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            names = list(part.columns) if isinstance(part, pd.DataFrame) else [part.name]
+            h.update(json.dumps([str(n) for n in names]).encode())
+            h.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+        else:
+            h.update(repr(part).encode())
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """Fitted models on disk, one folder per name.
+
+    Each entry holds `model.joblib`, `meta.json` (feature column order, the
+    fingerprint of the training inputs, versions) and optionally `elo.json`
+    (EloEngine state), `profiles.csv` (one feature row per team for
+    serving) and `h2h.npz` (HeadToHead store). meta.json is written last, so a half-written entry is never
+    loaded.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or MODEL_DIR
+        self._loaded = {}
+
+    def path(self, name, filename=""):
+        return os.path.join(self.root, name, filename)
+
+    def meta(self, name):
+        try:
+            with open(self.path(name, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, name, model, fingerprint, feature_cols, elo=None, profiles=None, **extra):
+        os.makedirs(self.path(name), exist_ok=True)
+        if os.path.exists(self.path(name, "meta.json")):
+            os.remove(self.path(name, "meta.json"))
+        joblib.dump(model, self.path(name, "model.joblib"))
+        if elo is not None:
+            elo.save(self.path(name, "elo.json"))
+        if profiles is not None:
+            profiles.to_csv(self.path(name, "profiles.csv"), index_label="team")
+        meta = {
+            "name": name,
+            "fingerprint": fingerprint,
+            "feature_cols": list(feature_cols),
+            "estimator": repr(model),
+            "sklearn": sklearn.__version__,
+            "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "has_elo": elo is not None,
+            "has_profiles": profiles is not None,
+            **extra,
+        }
+        self._write_meta(name, meta)
+        self._loaded.pop(name, None)
+
+    def attach(self, name, elo=None, profiles=None, h2h=None):
+        """Store Elo state, serving profiles and/or head-to-head records next to an existing model."""
+        meta = self.meta(name)
+        if meta is None:
+            raise KeyError(f"No model named {name!r} in {self.root}")
+        if elo is not None:
+            elo.save(self.path(name, "elo.json"))
+            meta["has_elo"] = True
+        if profiles is not None:
+            profiles.to_csv(self.path(name, "profiles.csv"), index_label="team")
+            meta["has_profiles"] = True
+        if h2h is not None:
+            h2h.save(path=self.path(name, "h2h.npz"))
+            meta["has_h2h"] = True
+        self._write_meta(name, meta)
+
+    def _write_meta(self, name, meta):
+        tmp = self.path(name, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, self.path(name, "meta.json"))
+
+    def load(self, name):
+        """Model of entry `name` (cached after the first load), or None."""
+        meta = self.meta(name)
+        if meta is None:
+            return None
+        cached = self._loaded.get(name)
+        if cached is None or cached[0] != meta["fingerprint"]:
+            cached = (meta["fingerprint"], joblib.load(self.path(name, "model.joblib")))
+            self._loaded[name] = cached
+        return cached[1]
+
+    def load_elo(self, name):
+        path = self.path(name, "elo.json")
+        return EloEngine.load(path) if os.path.exists(path) else None
+
+    def load_h2h(self, name):
+        path = self.path(name, "h2h.npz")
+        return HeadToHead.load(path=path) if os.path.exists(path) else None
+
+    def load_profiles(self, name):
+        path = self.path(name, "profiles.csv")
+        return pd.read_csv(path, index_col="team") if os.path.exists(path) else None
+
+    def fit_or_load(self, name, estimator, X, y, **extra):
+        """`estimator` fitted on (X, y), loaded from disk when the data, columns,
+        hyperparameters and sklearn version match the saved entry."""
+        fp = fingerprint(X, y, estimator, sklearn.__version__)
+        meta = self.meta(name)
+        if meta is not None and meta["fingerprint"] == fp:
+            return self.load(name)
+        model = estimator.fit(X, y)
+        self.save(name, model, fp, X.columns, **extra)
+        return model
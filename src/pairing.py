@@ -0,0 +1,61 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from rollups import Grouping, factorize_keys
+
+MAP_PAIR_KEYS = ["match_id", "round_num"]
+
+
+class Pairing:
+    """The opponent's row of every team-map row, as one index array.
+
+    Rows are grouped by `keys` (one group per map); in a group of exactly two
+    rows for two different teams each row points at the other. Rows whose map
+    has only one team (missing scoreboard side), more than two rows or a
+    repeated team get -1 and `has_opponent` False. The arrays are positional:
+    build the pairing on the frame the features are taken from, before any
+    filtering or reordering.
+    """
+
+    def __init__(self, frame, keys=MAP_PAIR_KEYS, team="team"):
+        keys = list(keys)
+        grouping = Grouping(factorize_keys(frame, keys), keys)
+        size = np.bincount(grouping.group[grouping.group >= 0], minlength=grouping.n_groups)
+        first = grouping.first
+        two = size == 2
+        a = first[two]
+        b = grouping.order[grouping.starts[two] + 1]
+        teams = frame[team].to_numpy()
+        distinct = teams[a] != teams[b]
+        a, b = a[distinct], b[distinct]
+
+        self.opponent = np.full(len(frame), -1, dtype=np.int64)
+        self.opponent[a] = b
+        self.opponent[b] = a
+        self.has_opponent = self.opponent >= 0
+        self.n_unpaired = int((~self.has_opponent).sum())
+        crowded = int((size > 2).sum())
+        if crowded:
+            warnings.warn(f"{crowded} maps have more than two team rows; they are left unpaired")
+
+    def values(self, values, fill=np.nan):
+        """The opponent's value of `values` (an array or Series aligned with the frame) for every row."""
+        values = np.asarray(values)
+        out = values[np.where(self.has_opponent, self.opponent, 0)]
+        if not self.has_opponent.all():
+            if out.dtype.kind in "biu" and not isinstance(fill, (int, np.integer)):
+                out = out.astype(np.float64)
+            out = np.where(self.has_opponent, out, fill)
+        return out
+
+    def opponent_columns(self, frame, columns, prefix="opp_"):
+        """Frame of the opponent's `columns`, named `<prefix><column>`."""
+        return pd.DataFrame({prefix + c: self.values(frame[c], None if frame[c].dtype == object else np.nan)
+                             for c in columns}, index=frame.index)
+
+    def differences(self, frame, columns, suffix="_diff"):
+        """Own minus opponent value of each numeric column, named `<column><suffix>`."""
+        return pd.DataFrame({c + suffix: frame[c].to_numpy(dtype=np.float64) - self.values(frame[c].to_numpy(dtype=np.float64))
+                             for c in columns}, index=frame.index)
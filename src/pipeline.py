@@ -0,0 +1,290 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from bans import BAN_FILE
+from h2h import H2H_FILE
+from player_ratings import RATINGS_FILE
+from relational import TABLE_DIR
+from room_labels import ROOM_LABELS_FILE
+from storage import DATA_DIR, csv_path
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_DIR = ".pipeline"
+
+
+class Stage:
+    """One step of the workflow: a command run in the data folder.
+
+    `inputs` and `outputs` are paths relative to the data folder (files or
+    directories). A stage depends on every stage that outputs one of its
+    inputs. `script` is a file in src/ whose source is part of the stage key,
+    so editing a script re-runs it. `always` stages (the scraper) have no
+    hashable source and run whenever they are selected. `sources` are the
+    inputs the outputs are rebuilt from (default: all of them): when none of
+    them exists and the outputs do, the outputs are source data themselves
+    (the master shipped in data/) and the stage is skipped.
+    """
+
+    def __init__(self, name, command, inputs=(), outputs=(), script=None, always=False, sources=None):
+        self.name = name
+        self.command = list(command)
+        self.inputs = list(inputs)
+        self.sources = list(self.inputs if sources is None else sources)
+        self.outputs = list(outputs)
+        self.script = script
+        self.always = always
+
+
+class Digests:
+    """SHA-256 of files and folders (a folder hashes its relative file names
+    and their contents). File hashes are memoized in `memo` under the file's
+    size and mtime, so unchanged files are not read again; the caller
+    persists the dict."""
+
+    def __init__(self, memo=None):
+        self.memo = {} if memo is None else memo
+
+    def file(self, path):
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        cached = self.memo.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.memo[path] = [stamp, h.hexdigest()]
+        return h.hexdigest()
+
+    def path(self, path):
+        """Digest of a file or folder, None if it does not exist."""
+        if os.path.isdir(path):
+            h = hashlib.sha256()
+            for folder, dirs, files in sorted(os.walk(path)):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(folder, name)
+                    h.update(os.path.relpath(full, path).encode())
+                    h.update(self.file(full).encode())
+            return h.hexdigest()
+        return self.file(path) if os.path.exists(path) else None
+
+
+def python_stage(name, script, inputs=(), outputs=(), args=(), always=False, sources=None):
+    return Stage(name, [sys.executable, os.path.join(SRC_DIR, script), *args], inputs, outputs, script, always, sources)
+
+
+def default_stages():
+    """scrape -> clean -> aggregate -> {eda, sim, notebook}.
+
+    The scraper writes the raw rooms as the normalized tables of
+    faceit_tables/ (see relational.py), which the cleaning script reads (or
+    the older "scraped" dataset CSV); cleaning labels the rooms through
+    room_labels.csv and merges them into the "master" dataset that the
+    aggregations read (see storage.DATASETS). Without scraped rooms the
+    existing master is the source and cleaning is skipped.
+    """
+    scraped, master = (os.path.basename(csv_path(n)) for n in ("scraped", "master"))
+    tables = [os.path.basename(csv_path(n)) for n in ("team_match", "player_match", "team_map")]
+    return [
+        python_stage("scrape", "Scraping data from Faceit API.py", outputs=[TABLE_DIR],
+                     args=["--incremental"], always=True),
+        python_stage("clean", "Cleaning the dataset.py", inputs=[TABLE_DIR, scraped, ROOM_LABELS_FILE], outputs=[master],
+                     sources=[TABLE_DIR, scraped]),
+        python_stage("aggregate", "aggregations.py", inputs=[master], outputs=tables + [BAN_FILE, H2H_FILE]),
+        python_stage("eda", "Python EDA Script.py", inputs=tables + [BAN_FILE, H2H_FILE], outputs=["eda_report/index.html"],
+                     args=["--report", "eda_report"]),
+        python_stage("sim", "team vs team sim.py", inputs=[tables[2], BAN_FILE],
+                     outputs=["models/sim_rf/meta.json", "models/sim_logreg/meta.json"]),
+        Stage("notebook", ["jupyter", "nbconvert", "--to", "notebook", "--execute", "--output-dir", ".",
+                           os.path.join(SRC_DIR, "Prediction Notebook.ipynb")],
+              inputs=[master, tables[1], tables[2]],
+              outputs=["predictions_all.csv", "latest_team_stats.csv", RATINGS_FILE],
+              script="Prediction Notebook.ipynb"),
+    ]
+
+
+def stage_env(root, **extra):
+    """Environment of a stage process: data folder, headless plots, src/ importable
+    (plus `extra` variables such as the run id and profiler for instrument.py)."""
+    return dict(os.environ, OWCS_DATA_DIR=root, MPLBACKEND="Agg",
+                PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get("PYTHONPATH")])), **extra)
+
+
+class Pipeline:
+    """Runs a DAG of stages, skipping the ones whose inputs are unchanged.
+
+    A stage's key hashes its command, its script source and the contents of
+    its inputs. It is skipped when the key matches the last successful run and
+    its outputs still exist. A stage that re-runs but rewrites identical
+    outputs leaves its dependents' keys unchanged, so they are skipped too.
+    Independent stages run in parallel. Keys, timings and file digests (reused
+    while size and mtime match) are kept in `<root>/.pipeline/`, next to the
+    spans the stages log (see instrument.py) under this run's id. `profile`
+    ("cprofile" or "pyinstrument") profiles every stage that runs.
+    """
+
+    def __init__(self, stages, root=None, jobs=4, profile=None):
+        self.stages = {s.name: s for s in stages}
+        self.root = os.path.abspath(root or DATA_DIR)
+        self.jobs = jobs
+        self.profile = profile
+        producer = {out: s.name for s in stages for out in s.outputs}
+        self.deps = {s.name: sorted({producer[i] for i in s.inputs if i in producer} - {s.name}) for s in stages}
+        self.state_path = os.path.join(self.root, STATE_DIR, "state.json")
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {"stages": {}, "digests": {}}
+        self.digests = Digests(self.state["digests"])
+
+    def digest(self, rel):
+        return self.digests.path(os.path.join(self.root, rel))
+
+    def key(self, stage):
+        h = hashlib.sha256(json.dumps(stage.command).encode())
+        if stage.script:
+            with open(os.path.join(SRC_DIR, stage.script), "rb") as f:
+                h.update(f.read())
+        for rel in stage.inputs:
+            h.update(f"{rel}={self.digest(rel)}".encode())
+        return h.hexdigest()
+
+    def order(self, targets=None):
+        """Stage names in dependency order, limited to `targets` and their ancestors."""
+        wanted = set(targets or self.stages)
+        stack = list(wanted)
+        while stack:
+            for dep in self.deps[stack.pop()]:
+                if dep not in wanted:
+                    wanted.add(dep)
+                    stack.append(dep)
+        done, order = set(), []
+        while len(order) < len(wanted):
+            ready = [n for n in self.stages if n in wanted and n not in done and set(self.deps[n]) <= done]
+            if not ready:
+                raise ValueError(f"Dependency cycle among {sorted(wanted - done)}")
+            order += ready
+            done.update(ready)
+        return order
+
+    def _run_stage(self, stage, log_path, run_id):
+        extra = {"OWCS_RUN_ID": run_id, "OWCS_SPANS": os.path.join(self.root, STATE_DIR, "spans.jsonl")}
+        if self.profile:
+            extra["OWCS_PROFILE"] = self.profile
+        start = time.perf_counter()
+        with open(log_path, "w", encoding="utf-8") as log:
+            code = subprocess.call(stage.command, cwd=self.root, env=stage_env(self.root, **extra),
+                                   stdout=log, stderr=subprocess.STDOUT)
+        return code, time.perf_counter() - start
+
+    def run(self, targets=None, force=False):
+        """Run `targets` (default: every stage) and whatever they depend on.
+
+        Returns one record per stage: status ran / skipped / failed / blocked /
+        unavailable, the seconds spent, and the log file of the run.
+        """
+        os.makedirs(os.path.join(self.root, STATE_DIR), exist_ok=True)
+        run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        order = self.order(targets)
+        status, records = {}, {}
+        pending = list(order)
+        running = {}
+
+        def finish(name, outcome, seconds=0.0, log=None):
+            status[name] = outcome
+            records[name] = {"stage": name, "status": outcome, "seconds": round(seconds, 3), "log": log}
+            print(f"[{name}] {outcome}" + (f" in {seconds:.1f}s" if outcome in ("ran", "failed") else ""))
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.deps[name]
+                    if any(status.get(d) in ("failed", "blocked") for d in deps if d in order):
+                        pending.remove(name)
+                        finish(name, "blocked")
+                        continue
+                    if not all(d in status or d not in order for d in deps):
+                        continue
+                    pending.remove(name)
+                    stage = self.stages[name]
+                    if shutil.which(stage.command[0]) is None:
+                        finish(name, "unavailable")
+                        continue
+                    key = self.key(stage)
+                    last = self.state["stages"].get(name, {})
+                    outputs_ok = all(self.digest(o) is not None for o in stage.outputs)
+                    if stage.sources and outputs_ok and all(self.digest(s) is None for s in stage.sources):
+                        finish(name, "skipped")
+                        continue
+                    if not (force or stage.always) and last.get("key") == key and outputs_ok:
+                        finish(name, "skipped")
+                        continue
+                    log = os.path.join(self.root, STATE_DIR, f"{name}.log")
+                    running[pool.submit(self._run_stage, stage, log, run_id)] = (name, key, log)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key, log = running.pop(future)
+                    code, seconds = future.result()
+                    if code == 0:
+                        self.state["stages"][name] = {"key": key, "seconds": round(seconds, 3),
+                                                      "ran_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                        finish(name, "ran", seconds, log)
+                    else:
+                        finish(name, "failed", seconds, log)
+
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, self.state_path)
+        rows = [records[n] for n in order]
+        with open(os.path.join(self.root, STATE_DIR, "runs.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "run": run_id, "stages": rows}) + "\n")
+        return rows
+
+
+#python pipeline.py [stage ...] [--scrape] [--force] [--jobs N] [--root DIR] [--profile cprofile|pyinstrument]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the scrape -> clean -> aggregate -> analysis stages that are out of date")
+    parser.add_argument("stages", nargs="*", help="stages to bring up to date (default: all but scrape)")
+    parser.add_argument("--scrape", action="store_true", help="also run an incremental scrape first")
+    parser.add_argument("--force", action="store_true", help="re-run the selected stages even if up to date")
+    parser.add_argument("--jobs", type=int, default=4, help="stages run in parallel")
+    parser.add_argument("--root", help="data folder (default: $OWCS_DATA_DIR or the current folder)")
+    parser.add_argument("--list", action="store_true", help="print the stages and their dependencies")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"],
+                        help="profile the stages that run (dumps in .pipeline/profiles/)")
+    args = parser.parse_args()
+
+    stages = default_stages()
+    if not args.scrape and "scrape" not in args.stages:
+        stages = [s for s in stages if s.name != "scrape"]
+    pipeline = Pipeline(stages, root=args.root, jobs=args.jobs, profile=args.profile)
+    unknown = set(args.stages) - set(pipeline.stages)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    if args.list:
+        for name in pipeline.order():
+            print(f"{name}: after {', '.join(pipeline.deps[name]) or '-'}")
+        sys.exit(0)
+
+    rows = pipeline.run(args.stages or None, force=args.force)
+    print("\nstage       status       seconds")
+    for r in rows:
+        print(f"{r['stage']:<11} {r['status']:<12} {r['seconds']:>7.1f}")
+    print(f"\nPer-step spans of the stages: python {os.path.join(SRC_DIR, 'instrument.py')} "
+          f"{os.path.join(pipeline.root, STATE_DIR, 'spans.jsonl')}")
+    if any(r["status"] == "failed" for r in rows):
+        print("\nSee the .pipeline/<stage>.log files for failures.")
+        sys.exit(1)
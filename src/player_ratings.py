@@ -0,0 +1,295 @@
+import os
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from pairing import Pairing
+from storage import DATA_DIR
+
+RATINGS_FILE = "player_ratings.npz"
+ROLES = ["Tank", "Damage", "Support"]
+COMPOSITION = {"Tank": 1, "Damage": 2, "Support": 2}
+# per-10-minute rates (comparable across short and long series) plus the share of the match's maps won
+RATING_STATS = [
+    "Eliminations/10m", "Assists/10m", "Deaths/10m", "Final Blows/10m", "Solo Kills/10m",
+    "Damage Dealt/10m", "Damage Mitigated/10m", "Healing Done/10m", "Objective Time/10m", "map_share",
+]
+
+
+def match_outcomes(team_map):
+    """Maps won and lost by every team in every match, the share of the
+    match's maps it won and whether it won the series (NaN for a level series)."""
+    rows = team_map[["match_id", "team"]].assign(won=(team_map["Result"].to_numpy() == 1) * 1.0)
+    out = rows.groupby(["match_id", "team"], sort=False)["won"].agg(maps_won="sum", maps=("size")).reset_index()
+    out["maps_lost"] = out.pop("maps") - out["maps_won"]
+    out["map_share"] = out["maps_won"] / (out["maps_won"] + out["maps_lost"])
+    opp_won = Pairing(out, keys=["match_id"]).values(out["maps_won"])
+    out["won"] = np.where(out["maps_won"] == opp_won, np.nan, (out["maps_won"] > opp_won) * 1.0)
+    return out
+
+
+def with_outcomes(player_match, team_map):
+    """player_match with each row's team `map_share` and series `won` from team_map."""
+    outcomes = match_outcomes(team_map)[["match_id", "team", "map_share", "won"]]
+    return player_match.drop(columns=["map_share", "won"], errors="ignore").merge(
+        outcomes, on=["match_id", "team"], how="left", validate="many_to_one")
+
+
+def _role_means(vectors, roles, group, n_groups):
+    """Per group and role in ROLES the NaN-skipping mean of `vectors` rows:
+    a (n_groups x roles x stats) array, NaN where a group has nobody rated in a role."""
+    k = vectors.shape[1]
+    total = np.zeros((n_groups, len(ROLES), k))
+    count = np.zeros((n_groups, len(ROLES), k))
+    ok = roles >= 0
+    rated = ~np.isnan(vectors[ok])
+    np.add.at(total, (group[ok], roles[ok]), np.where(rated, vectors[ok], 0.0))
+    np.add.at(count, (group[ok], roles[ok]), rated)
+    with np.errstate(invalid="ignore"):
+        return total / count
+
+
+class PlayerRatings:
+    """Rolling rating vector of every (player, role) pair.
+
+    A rating is the exponentially weighted mean (weight 2 / (span + 1) on the
+    newest match, as `ewm(span=..., adjust=False)`) of `stats` over the matches
+    the player played in that role. Vectors are rows of one (slots x stats)
+    array with a dict from (player, role) to its row, so a lineup turns into
+    feature rows with one fancy-index take, however many lineups are scored.
+
+    `update` folds in a batch of player_match rows starting from the stored
+    vectors, so new matches never replay the history; `before` gives each
+    row's ratings as of the start of its match without changing the store.
+    A player's role in a lineup is the one they played most recently.
+    """
+
+    def __init__(self, stats=RATING_STATS, span=5, order="seq"):
+        self.stats = list(stats)
+        self.span = span
+        self.order = order
+        self.keys, self.slots = [], {}
+        self.vectors = np.empty((0, len(self.stats)))
+        self.games = np.zeros(0, dtype=np.int64)
+        self.role_of = {}
+
+    @property
+    def alpha(self):
+        return 2.0 / (self.span + 1)
+
+    @property
+    def feature_columns(self):
+        return [f"{r} {s}" for r in ROLES for s in self.stats]
+
+    def _slot_codes(self, players, roles, add=True):
+        """Slot of every (player, role). Unseen keys get the slots after the
+        stored ones; only with `add` are they put in the store."""
+        new = {}
+        codes = np.empty(len(players), dtype=np.int64)
+        for n, key in enumerate(zip(players, roles)):
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = new.setdefault(key, len(self.keys) + len(new))
+            codes[n] = slot
+        if new and add:
+            self.slots.update(new)
+            self.keys.extend(new)
+            self.vectors = np.vstack([self.vectors, np.full((len(new), len(self.stats)), np.nan)])
+            self.games = np.concatenate([self.games, np.zeros(len(new), dtype=np.int64)])
+        return codes
+
+    def _replay(self, rows, add=True):
+        """(rows in match order, their slots, ratings after each row, ratings
+        before each row); unseen (player, role) slots are stored with `add`."""
+        if self.order in rows.columns:
+            rows = rows.sort_values(self.order, kind="stable")
+        players = rows["player"].astype(str).tolist()
+        roles = rows["Role"].astype(object).where(rows["Role"].notna(), "Unknown").astype(str).tolist()
+        slot = self._slot_codes(players, roles, add)
+        seeds = np.unique(slot)
+        seeds = seeds[seeds < len(self.keys)]
+        seeds = seeds[self.games[seeds] > 0]
+        # each slot's stored vector goes first, so the EWM continues from it
+        frame = pd.DataFrame(np.vstack([self.vectors[seeds], rows[self.stats].to_numpy(dtype=np.float64)]),
+                             columns=self.stats)
+        frame["slot"] = np.concatenate([seeds, slot])
+        ewm = (frame.groupby("slot", sort=False)[self.stats]
+               .ewm(alpha=self.alpha, adjust=False, ignore_na=True).mean()
+               .reset_index(level=0, drop=True).sort_index())
+        after = ewm.to_numpy()
+        before = ewm.groupby(frame["slot"].to_numpy(), sort=False).shift(1).to_numpy()
+        n = len(seeds)
+        return rows, slot, after[n:], before[n:]
+
+    def before(self, rows):
+        """Every row's rating vector as of the start of its match (`stats`
+        columns, NaN for a player's first match in a role); indexed like
+        `rows`. Nothing is added to the store."""
+        if rows.empty:
+            return pd.DataFrame(columns=self.stats, index=rows.index, dtype=np.float64)
+        ordered, _, _, before = self._replay(rows, add=False)
+        return pd.DataFrame(before, index=ordered.index, columns=self.stats).reindex(rows.index)
+
+    def update(self, rows):
+        """Fold player_match rows (player, Role, `stats`, `order`), which must
+        come after everything already stored, into the ratings."""
+        if rows.empty:
+            return self
+        ordered, slot, after, _ = self._replay(rows)
+        last = pd.Series(np.arange(len(slot))).groupby(slot, sort=False).last()
+        self.vectors[last.index.to_numpy()] = after[last.to_numpy()]
+        np.add.at(self.games, slot, 1)
+        latest = ordered.assign(_slot=slot).drop_duplicates("player", keep="last")
+        for player, s in zip(latest["player"].astype(str), latest["_slot"]):
+            self.role_of[player] = self.keys[s][1]
+        return self
+
+    def rated(self):
+        """Frame of every (player, role) rating with its number of matches."""
+        index = pd.MultiIndex.from_tuples(self.keys, names=["player", "role"]) if self.keys else None
+        return pd.DataFrame(self.vectors, index=index, columns=self.stats).assign(games=self.games)
+
+    def lookup(self, players, roles=None):
+        """(rows, role codes) for player names: the vector of each player in
+        `roles` (default: the role they played last). Players never rated in
+        that role get NaN and role code -1 when their role is unknown."""
+        players = [str(p) for p in players]
+        if roles is None:
+            roles = [self.role_of.get(p) for p in players]
+        slot = np.array([self.slots.get((p, r), -1) for p, r in zip(players, roles)], dtype=np.int64)
+        role = np.array([ROLES.index(r) if r in ROLES else -1 for r in roles], dtype=np.int64)
+        vectors = np.vstack([self.vectors, np.full((1, len(self.stats)), np.nan)])[slot]
+        return vectors, role
+
+    def lineup_features(self, lineups, roles=None):
+        """Team features of each lineup (a list of player names, or rows of a
+        2-D array of names): per role in ROLES the mean rating vector of its
+        players, named "<role> <stat>". A role nobody in the lineup is rated
+        in takes the mean of every rated player in that role."""
+        lineups = [list(l) for l in lineups]
+        sizes = np.array([len(l) for l in lineups], dtype=np.int64)
+        flat = [p for l in lineups for p in l]
+        flat_roles = None if roles is None else [r for rs in roles for r in rs]
+        vectors, role = self.lookup(flat, flat_roles)
+        group = np.repeat(np.arange(len(lineups)), sizes)
+        return self._frame(_role_means(vectors, role, group, len(lineups)))
+
+    def _frame(self, means, fill=True):
+        if fill:
+            means = np.where(np.isnan(means), self.role_baseline()[None], means)
+        return pd.DataFrame(means.reshape(len(means), -1), columns=self.feature_columns)
+
+    def role_baseline(self):
+        """(roles x stats) mean rating of every rated (player, role) per role."""
+        role = np.array([ROLES.index(r) if r in ROLES else -1 for _, r in self.keys], dtype=np.int64)
+        rated = self.games > 0
+        return _role_means(self.vectors[rated], role[rated], np.zeros(int(rated.sum()), dtype=np.int64), 1)[0]
+
+    def save(self, root=None, path=None):
+        path = path or os.path.join(root or DATA_DIR, RATINGS_FILE)
+        players = sorted(self.role_of)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez_compressed(f, keys=np.array(self.keys, dtype=str).reshape(-1, 2), vectors=self.vectors,
+                                games=self.games, stats=np.array(self.stats, dtype=str),
+                                players=np.array(players, dtype=str),
+                                player_roles=np.array([self.role_of[p] for p in players], dtype=str),
+                                params=np.array([self.span]), order=np.array(self.order))
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, root=None, path=None):
+        with np.load(path or os.path.join(root or DATA_DIR, RATINGS_FILE)) as z:
+            ratings = cls(stats=z["stats"].tolist(), span=float(z["params"][0]), order=str(z["order"]))
+            ratings.keys = [tuple(k) for k in z["keys"].tolist()]
+            ratings.vectors = z["vectors"]
+            ratings.games = z["games"].astype(np.int64)
+            ratings.role_of = dict(zip(z["players"].tolist(), z["player_roles"].tolist()))
+        ratings.slots = {k: i for i, k in enumerate(ratings.keys)}
+        return ratings
+
+
+def latest_lineups(player_match, size=5, order="seq"):
+    """Each team's lineup in its latest match: the `size` players with the
+    most time played (substitutes who only played a map or two drop out)."""
+    last = player_match[order] == player_match.groupby("team")[order].transform("max")
+    rows = player_match[last].sort_values(["team", "Time Played"], ascending=[True, False], kind="stable")
+    return {team: g["player"].astype(str).head(size).tolist() for team, g in rows.groupby("team", sort=True)}
+
+
+def team_rosters(player_match, last_n=None, order="seq"):
+    """Players who played for each team (in its `last_n` matches, if given)."""
+    rows = player_match
+    if last_n is not None:
+        matches = rows[["team", "match_id", order]].drop_duplicates(["team", "match_id"])
+        recent = matches[matches.groupby("team")[order].rank(method="first", ascending=False) <= last_n]
+        rows = rows.merge(recent[["team", "match_id"]], on=["team", "match_id"])
+    return {team: sorted(g.astype(str).unique()) for team, g in rows.groupby("team", sort=True)["player"]}
+
+
+class LineupModel:
+    """Match winner from the rating vectors of the two lineups.
+
+    The classifier is trained on own-minus-opponent lineup features (see
+    `PlayerRatings.lineup_features`) of every played match, each side built
+    from the ratings its players had before that match; a player with no
+    earlier match in the role adds nothing to that side. Predictions score
+    both orientations of a pairing and normalize them, so swapping the
+    teams swaps the probabilities.
+    """
+
+    def __init__(self, ratings, model):
+        self.ratings = ratings
+        self.model = model
+
+    def training_set(self, player_match, team_map):
+        """(X, y, keys) for every side of every decided match: feature
+        differences, whether the side won the series, and match_id, team and
+        the order column. Also brings the ratings up to date with player_match."""
+        rows = with_outcomes(player_match, team_map)
+        before = self.ratings.before(rows).to_numpy()
+        self.ratings.update(rows)
+        sides = rows.groupby(["match_id", "team"], sort=False)
+        group = sides.ngroup().to_numpy()
+        role = np.array([ROLES.index(r) if r in ROLES else -1 for r in rows["Role"]], dtype=np.int64)
+        features = self.ratings._frame(_role_means(before, role, group, sides.ngroups), fill=False)
+        order = [self.ratings.order] if self.ratings.order in rows.columns else []
+        keys = sides[order + ["won"]].first().reset_index()
+        pairing = Pairing(keys, keys=["match_id"])
+        own = features.to_numpy()
+        diff = self._difference(own, own[np.where(pairing.has_opponent, pairing.opponent, 0)])
+        keep = pairing.has_opponent & keys["won"].notna().to_numpy()
+        X = pd.DataFrame(diff[keep], columns=[f"{c}_diff" for c in self.ratings.feature_columns])
+        return X, keys.loc[keep, "won"].astype(int).reset_index(drop=True), keys[keep].reset_index(drop=True)
+
+    @staticmethod
+    def _difference(own, opp):
+        return np.nan_to_num(own - opp, nan=0.0)
+
+    def predict(self, lineups1, lineups2):
+        """Normalized win probabilities of lineups1[k] against lineups2[k],
+        every pairing scored in one predict_proba call."""
+        f1 = self.ratings.lineup_features(lineups1).to_numpy()
+        f2 = self.ratings.lineup_features(lineups2).to_numpy()
+        n = len(f1)
+        X = pd.DataFrame(np.vstack([self._difference(f1, f2), self._difference(f2, f1)]),
+                         columns=[f"{c}_diff" for c in self.ratings.feature_columns])
+        proba = self.model.predict_proba(X)[:, 1]
+        total = proba[:n] + proba[n:]
+        p1 = np.divide(proba[:n], total, out=np.full(n, 0.5), where=total > 0)
+        return pd.DataFrame({"team1_proba": p1, "team2_proba": 1 - p1})
+
+    def what_if(self, roster, opponent, size=5, composition=COMPOSITION):
+        """Every `size`-player lineup from `roster` (that fills `composition`,
+        by each player's latest role; None allows any) scored against the
+        `opponent` lineup, best first."""
+        lineups = list(combinations([str(p) for p in roster], size))
+        if composition is not None:
+            wanted = Counter(composition)
+            lineups = [l for l in lineups if Counter(self.ratings.role_of.get(p) for p in l) == wanted]
+        if not lineups:
+            return pd.DataFrame(columns=["lineup", "win_proba"])
+        scored = self.predict(lineups, [list(opponent)] * len(lineups))
+        return (pd.DataFrame({"lineup": [", ".join(l) for l in lineups], "win_proba": scored["team1_proba"]})
+                .sort_values("win_proba", ascending=False, kind="stable").reset_index(drop=True))
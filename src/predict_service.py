@@ -0,0 +1,178 @@
+import argparse
+import json
+import threading
+import time
+from itertools import permutations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+
+class Predictor:
+    """Matchup predictions from a saved registry entry (model, Elo, profiles, head-to-head records).
+
+    Nothing is read until the first query. Loading scores every ordered pair of
+    known teams once, so later queries on known teams are row lookups; other
+    queries fall back to a single `predict_matchups` call.
+    """
+
+    def __init__(self, name="sim_rf", root=None):
+        self.name = name
+        self.root = root
+        self._state = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._state is None:
+                from matchups import predict_matchups
+                from model_registry import ModelRegistry
+                from team_index import TeamIndex
+
+                registry = ModelRegistry(self.root)
+                meta = registry.meta(self.name)
+                if meta is None or not meta.get("has_profiles"):
+                    raise LookupError(f"No servable model {self.name!r} in {registry.root}; run the sim first")
+                features = meta["feature_cols"]
+                profiles = registry.load_profiles(self.name).reset_index().assign(match_date=pd.NaT)
+                state = {
+                    "meta": meta,
+                    "model": registry.load(self.name),
+                    "elo": registry.load_elo(self.name),
+                    "h2h": registry.load_h2h(self.name),
+                    "index": TeamIndex(profiles, features, last_n=1),
+                    "map_types": [c.replace("map_type_", "") for c in features if c.startswith("map_type_")],
+                    "predict": predict_matchups,
+                }
+                grid = predict_matchups(list(permutations(sorted(state["index"].slices), 2)), state["model"],
+                                        state["index"], state["map_types"], elo=state["elo"], h2h=state["h2h"])
+                state["grid"] = {pair: rows.drop(columns="pair") for pair, rows in grid.groupby(["team1", "team2"], sort=False)}
+                self._state = state
+        return self._state
+
+    def teams(self):
+        return sorted(self._load()["index"].slices)
+
+    def predict(self, pairs, map_types=None):
+        state = self._load()
+        pairs = [tuple(p) for p in pairs]
+        grid = state["grid"]
+        if map_types is None and pairs and all(p in grid for p in pairs):
+            rows = [grid[p].assign(pair=i) for i, p in enumerate(pairs)]
+            return pd.concat(rows, ignore_index=True)[["pair"] + list(rows[0].columns[:-1])]
+        map_types = state["map_types"] if map_types is None else map_types
+        unknown = sorted(set(map_types) - set(state["map_types"]))
+        if unknown:
+            raise ValueError(f"unknown map types {unknown}; known: {state['map_types']}")
+        return state["predict"](pairs, state["model"], state["index"], map_types, elo=state["elo"], h2h=state["h2h"])
+
+
+def parse_pairs(raw):
+    """[(team1, team2), ...] from a list of two-name lists, or ValueError saying what is wrong."""
+    if not isinstance(raw, (list, tuple)) or not raw:
+        raise ValueError("give at least one pair of teams")
+    pairs = []
+    for pair in raw:
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2 or not all(isinstance(t, str) and t for t in pair):
+            raise ValueError(f"each pair must be two team names, got {pair!r}")
+        pairs.append(tuple(pair))
+    return pairs
+
+
+def records(frame):
+    return json.loads(frame.replace({np.nan: None}).to_json(orient="records"))
+
+
+def serve(predictor, host="127.0.0.1", port=8765):
+    """GET /predict?team1=A&team2=B[&map_types=0], POST /predict {"pairs": [[A, B], ...]},
+    GET /teams, GET /health."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/health":
+                self._send(200, {"ok": True, "loaded": predictor._state is not None})
+            elif url.path == "/teams":
+                self._answer(lambda: predictor.teams())
+            elif url.path == "/predict":
+                self._answer(lambda: self._predict_query(query))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/predict":
+                self._send(404, {"error": "not found"})
+                return
+            self._answer(self._predict_body)
+
+        def _predict_query(self, query):
+            team1, team2 = query.get("team1", []), query.get("team2", [])
+            if len(team1) != len(team2):
+                raise ValueError("give one team2 for every team1")
+            with_maps = query.get("map_types", ["1"])[0] not in ("0", "false")
+            return records(predictor.predict(parse_pairs(list(zip(team1, team2))), None if with_maps else []))
+
+        def _predict_body(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+            map_types = body.get("map_types")
+            if map_types is not None and not (isinstance(map_types, list) and all(isinstance(m, str) for m in map_types)):
+                raise ValueError("map_types must be a list of map type names")
+            return records(predictor.predict(parse_pairs(body.get("pairs")), map_types))
+
+        def _answer(self, fn):
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except LookupError as e:
+                self._send(503, {"error": str(e)})
+                return
+            except (ValueError, json.JSONDecodeError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self._send(200, {"result": result, "ms": round((time.perf_counter() - start) * 1000, 2)})
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+#python predict_service.py "Team Liquid" "NTMR"   |   python predict_service.py --serve --port 8765
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer matchup queries from saved models")
+    parser.add_argument("teams", nargs="*", help="team1 team2 [team1 team2 ...]")
+    parser.add_argument("--model", default="sim_rf", help="registry entry to serve")
+    parser.add_argument("--registry", help="registry folder (default: $OWCS_MODEL_DIR or <data dir>/models)")
+    parser.add_argument("--serve", action="store_true", help="run the HTTP endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    predictor = Predictor(args.model, args.registry)
+    if args.serve:
+        server = serve(predictor, args.host, args.port)
+        print(f"Serving {args.model} on http://{args.host}:{server.server_address[1]}")
+        server.serve_forever()
+    elif len(args.teams) >= 2 and len(args.teams) % 2 == 0:
+        pairs = list(zip(args.teams[::2], args.teams[1::2]))
+        print(predictor.predict(pairs).to_string(index=False, float_format="{:.3f}".format))
+    else:
+        parser.error("give team pairs or --serve")
@@ -0,0 +1,323 @@
+import argparse
+import csv
+import json
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from row_sink import ID_COLUMNS, PLAYER_STAT_COLUMNS, ROW_COLUMNS
+from storage import DATA_DIR, apply_schema, csv_path, has_table, load_table, parquet_path
+
+TABLE_DIR = "faceit_tables"
+TABLES = ["matches", "maps", "team_rounds", "player_rounds", "bans"]
+KEYS = {"matches": "match_key", "maps": "map_key", "team_rounds": "team_round_key"}
+# wide columns stored once per match / map / team-round; everything else is per player
+MATCH_COLUMNS = ["match_id", "match_date", "region", "stage", "phase"]
+MAP_COLUMNS = ["round_num", "map_name", "map_type"]
+TEAM_COLUMNS = ["team", "Result", "data_quality"]
+PLAYER_COLUMNS = ["player", "player_id", "nickname"]
+BAN_SEPARATOR = ", "
+SCRAPER_COLUMNS = {
+    "matches": ["match_key", "match_id", "match_date"],
+    "maps": ["map_key", "match_key", "round_num", "map_name"],
+    "team_rounds": ["team_round_key", "map_key", "team", "Result", "data_quality"],
+    "player_rounds": ["team_round_key"] + PLAYER_COLUMNS + PLAYER_STAT_COLUMNS,
+    "bans": ["team_round_key", "ban_order", "hero"],
+}
+
+
+def _split_bans(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return [h.strip() for h in str(value).split(",") if h.strip()]
+
+
+class MatchTables:
+    """Scraped rooms as five narrow tables keyed by integer surrogate ids.
+
+    matches (match_key) <- maps (map_key) <- team_rounds (team_round_key) <-
+    player_rounds and bans (one row per banned hero, in ban order). Match,
+    map and team strings are stored once instead of on every player row.
+    `wide()` joins them back into the flat layout of faceit_all_matches.csv
+    (same columns, same row order) by positional key lookups; a team round
+    without players (metadata_only rooms) comes back as one row with empty
+    player fields, as the scraper writes it.
+    """
+
+    def __init__(self, tables, columns):
+        self.tables = tables
+        self.columns = list(columns)
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    @classmethod
+    def from_wide(cls, wide):
+        """Split flat rows (one per player and map) into the tables. Match-,
+        map- and team-level columns must be constant within their group."""
+        wide = wide.reset_index(drop=True)
+        present = lambda cols: [c for c in cols if c in wide.columns]
+        match_cols, map_cols, team_cols = present(MATCH_COLUMNS), present(MAP_COLUMNS), present(TEAM_COLUMNS)
+        level = set(match_cols + map_cols + team_cols + ["hero_bans"])
+        player_cols = [c for c in wide.columns if c not in level]
+
+        match_key = wide.groupby("match_id", sort=False, dropna=False).ngroup().to_numpy()
+        map_key = wide.assign(_m=match_key).groupby(["_m"] + present(["round_num"]), sort=False, dropna=False).ngroup().to_numpy()
+        team_key = wide.assign(_p=map_key).groupby(["_p", "team"], sort=False, dropna=False).ngroup().to_numpy()
+        for key, cols, name in ((match_key, match_cols, "match"), (map_key, map_cols, "map"),
+                                (team_key, team_cols + present(["hero_bans"]), "team round")):
+            varying = [c for c in cols if wide[c].groupby(key).nunique(dropna=False).max() > 1]
+            if varying:
+                raise ValueError(f"{varying} differ within a {name}; they cannot be stored once per {name}")
+
+        first = lambda key: np.unique(key, return_index=True)[1]
+        m, p, t = first(match_key), first(map_key), first(team_key)
+        tables = {
+            "matches": wide.loc[m, match_cols].assign(match_key=match_key[m])[["match_key"] + match_cols],
+            "maps": wide.loc[p, map_cols].assign(map_key=map_key[p], match_key=match_key[p])[["map_key", "match_key"] + map_cols],
+            "team_rounds": wide.loc[t, team_cols].assign(team_round_key=team_key[t], map_key=map_key[t])[
+                ["team_round_key", "map_key"] + team_cols],
+        }
+        has_player = wide[player_cols].notna().any(axis=1).to_numpy()
+        tables["player_rounds"] = wide.loc[has_player, player_cols].assign(team_round_key=team_key[has_player])[
+            ["team_round_key"] + player_cols]
+        bans = [(k, i, h) for k, value in zip(team_key[t], wide["hero_bans"].to_numpy()[t] if "hero_bans" in wide else [])
+                for i, h in enumerate(_split_bans(value))]
+        tables["bans"] = pd.DataFrame(bans, columns=SCRAPER_COLUMNS["bans"])
+        return cls({k: v.reset_index(drop=True) for k, v in tables.items()}, wide.columns)
+
+    def wide(self, columns=None):
+        """The flat rows, optionally only `columns` (only the tables holding
+        them are read)."""
+        columns = [c for c in (columns or self.columns) if c in self.columns]
+        matches, maps, teams, players = (self.tables[n] for n in ("matches", "maps", "team_rounds", "player_rounds"))
+        map_pos = pd.Index(maps["map_key"]).get_indexer(teams["map_key"])
+        match_pos = pd.Index(matches["match_key"]).get_indexer(maps["match_key"].to_numpy()[map_pos])
+
+        # player rows plus one empty row per team round without players, in team-round order
+        owner = pd.Index(teams["team_round_key"]).get_indexer(players["team_round_key"])
+        lonely = np.setdiff1d(np.arange(len(teams)), owner)
+        pos = np.concatenate([owner, lonely])
+        src = np.concatenate([np.arange(len(players)), np.full(len(lonely), -1)])
+        order = np.argsort(pos, kind="stable")
+        pos, src = pos[order], src[order]
+
+        player_cols = [c for c in columns if c in players.columns and c != "team_round_key"]
+        block = players[player_cols].reset_index(drop=True)
+        block = block.reindex(src) if (src < 0).any() else block.iloc[src]
+        out = {}
+        for c in columns:
+            if c in matches.columns and c != "match_key":
+                out[c] = matches[c].to_numpy()[match_pos[pos]]
+            elif c in maps.columns and c not in KEYS.values():
+                out[c] = maps[c].to_numpy()[map_pos[pos]]
+            elif c in teams.columns and c not in KEYS.values():
+                out[c] = teams[c].to_numpy()[pos]
+            elif c == "hero_bans":
+                out[c] = self._joined_bans().to_numpy(dtype=object)[pos]
+        return pd.concat([pd.DataFrame(out), block.reset_index(drop=True)], axis=1)[columns]
+
+    def _joined_bans(self):
+        """hero_bans string of every team round (in team_rounds order, NaN without bans)."""
+        bans = self.tables["bans"].sort_values(["team_round_key", "ban_order"], kind="stable")
+        keys = bans["team_round_key"].to_numpy()
+        heroes = bans["hero"].astype(str).to_numpy(dtype=object)
+        first = np.r_[True, keys[1:] != keys[:-1]] if len(keys) else np.zeros(0, dtype=bool)
+        # separator before every hero but a round's first, then one string sum per round
+        pieces = np.where(first, heroes, BAN_SEPARATOR + heroes)
+        starts = np.flatnonzero(first)
+        joined = np.add.reduceat(pieces, starts) if len(starts) else np.zeros(0, dtype=object)
+        return pd.Series(joined, index=keys[starts], dtype=object).reindex(self.tables["team_rounds"]["team_round_key"])
+
+    def room_status(self):
+        """Per match_id: whether any team round is metadata_only, and the match date."""
+        matches, maps, teams = self.tables["matches"], self.tables["maps"], self.tables["team_rounds"]
+        quality = teams["data_quality"] if "data_quality" in teams.columns else pd.Series(np.nan, index=teams.index)
+        has_players = teams["team_round_key"].isin(self.tables["player_rounds"]["team_round_key"])
+        incomplete = quality.eq("metadata_only") | (quality.isna() & ~has_players)
+        match_key = maps.set_index("map_key")["match_key"].reindex(teams["map_key"]).to_numpy()
+        per_match = pd.Series(incomplete.to_numpy()).groupby(match_key).any()
+        status = matches.set_index("match_key")[["match_id", "match_date"]]
+        status["incomplete"] = per_match.reindex(status.index, fill_value=True).astype(bool)
+        return status.set_index("match_id")
+
+    def replace(self, delta, match_ids):
+        """These tables minus the rooms in `match_ids`, plus every room of
+        `delta` (its keys shifted past ours)."""
+        matches = self.tables["matches"]
+        drop = matches.loc[matches["match_id"].isin(set(match_ids)), "match_key"]
+        kept = {"matches": matches[~matches["match_key"].isin(drop)]}
+        kept["maps"] = self.tables["maps"][~self.tables["maps"]["match_key"].isin(drop)]
+        kept["team_rounds"] = self.tables["team_rounds"][self.tables["team_rounds"]["map_key"].isin(kept["maps"]["map_key"])]
+        for name in ("player_rounds", "bans"):
+            kept[name] = self.tables[name][self.tables[name]["team_round_key"].isin(kept["team_rounds"]["team_round_key"])]
+
+        shift = {k: int(self.tables[t][k].max()) + 1 if len(self.tables[t]) else 0 for t, k in KEYS.items()}
+        merged = {}
+        for name in TABLES:
+            part = delta.tables[name].copy()
+            for key, offset in shift.items():
+                if key in part.columns:
+                    part[key] = part[key] + offset
+            merged[name] = pd.concat([kept[name], part], ignore_index=True)
+        columns = self.columns + [c for c in delta.columns if c not in self.columns]
+        return MatchTables(merged, columns)
+
+    def save(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        for name in TABLES:
+            path = os.path.join(folder, f"{name}.csv")
+            self.tables[name].to_csv(f"{path}.tmp", index=False)
+            os.replace(f"{path}.tmp", path)
+        with open(os.path.join(folder, "columns.json"), "w", encoding="utf-8") as f:
+            json.dump(self.columns, f)
+
+    @classmethod
+    def load(cls, folder, columns=None):
+        """Read the tables; with `columns`, only the player stats among them
+        are parsed and the bans only if hero_bans is asked for."""
+        with open(os.path.join(folder, "columns.json"), encoding="utf-8") as f:
+            stored = json.load(f)
+        wanted = set(columns or stored) | set(KEYS.values())
+        path = lambda name: os.path.join(folder, f"{name}.csv")
+        tables = {name: pd.read_csv(path(name)) for name in ("matches", "maps", "team_rounds")}
+        tables["player_rounds"] = pd.read_csv(path("player_rounds"), usecols=lambda c: c in wanted)
+        tables["bans"] = (pd.read_csv(path("bans")) if "hero_bans" in wanted
+                          else pd.DataFrame(columns=SCRAPER_COLUMNS["bans"]))
+        return cls(tables, [c for c in stored if c in wanted])
+
+
+class TableSink:
+    """Streams scraped rooms into the five table CSVs of `folder`.
+
+    Takes the scraper's flat row dicts match by match (the CsvRowSink
+    interface) and splits them as it writes, assigning the next surrogate
+    ids. After every match the file sizes and key counters are recorded in
+    `progress`; on restart every file is truncated back to the last completed
+    match, so an interrupted scrape resumes cleanly.
+    """
+
+    def __init__(self, folder, resume=True):
+        self.folder = folder
+        self.progress_path = os.path.join(folder, "progress")
+        self.completed = set()
+        self.dropped = set()
+        self.known = set(ROW_COLUMNS)
+        os.makedirs(folder, exist_ok=True)
+
+        last = None
+        if resume and os.path.exists(self.progress_path):
+            with open(self.progress_path, encoding="utf-8") as f:
+                for line in f:
+                    mid, _, state = line.rstrip("\n").rpartition("\t")
+                    if mid:
+                        self.completed.add(mid)
+                        last = json.loads(state)
+        paths = {name: os.path.join(folder, f"{name}.csv") for name in TABLES}
+        self.next = last["next"] if last else {key: 0 for key in KEYS.values()}
+        self.files, self.writers = {}, {}
+        for name in TABLES:
+            if last and os.path.exists(paths[name]):
+                f = open(paths[name], "r+", newline="", encoding="utf-8")
+                f.truncate(last["offsets"][name])
+                f.seek(last["offsets"][name])
+            else:
+                f = open(paths[name], "w", newline="", encoding="utf-8")
+                csv.writer(f, lineterminator="\n").writerow(SCRAPER_COLUMNS[name])
+            self.files[name] = f
+            self.writers[name] = csv.DictWriter(f, fieldnames=SCRAPER_COLUMNS[name], extrasaction="ignore",
+                                                lineterminator="\n")
+        if not last:
+            self.completed = set()
+            with open(os.path.join(folder, "columns.json"), "w", encoding="utf-8") as f:
+                json.dump(ID_COLUMNS + PLAYER_STAT_COLUMNS, f)
+        self.progress = open(self.progress_path, "w" if not last else "a", encoding="utf-8")
+
+    def _key(self, name):
+        key = self.next[name]
+        self.next[name] += 1
+        return key
+
+    def write_match(self, mid, rows):
+        first = rows[0] if rows else {"match_id": mid}
+        match_key = self._key("match_key")
+        self.writers["matches"].writerow({"match_key": match_key, "match_id": mid, "match_date": first.get("match_date")})
+        maps, teams = {}, {}
+        for row in rows:
+            extra = row.keys() - self.known
+            if extra - self.dropped:
+                self.dropped |= extra
+                warnings.warn(f"Dropping stat keys not in the schema: {sorted(extra)}")
+            r = row.get("round_num")
+            if r not in maps:
+                maps[r] = self._key("map_key")
+                self.writers["maps"].writerow({"map_key": maps[r], "match_key": match_key,
+                                               "round_num": r, "map_name": row.get("map_name")})
+            if (r, row.get("team")) not in teams:
+                key = teams[(r, row.get("team"))] = self._key("team_round_key")
+                self.writers["team_rounds"].writerow({"team_round_key": key, "map_key": maps[r], **row})
+                self.writers["bans"].writerows({"team_round_key": key, "ban_order": i, "hero": h}
+                                               for i, h in enumerate(_split_bans(row.get("hero_bans"))))
+            if row.get("player") is not None or row.get("player_id") is not None:
+                self.writers["player_rounds"].writerow({**row, "team_round_key": teams[(r, row.get("team"))]})
+        offsets = {}
+        for name, f in self.files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            offsets[name] = f.tell()
+        self.progress.write(f"{mid}\t{json.dumps({'offsets': offsets, 'next': self.next})}\n")
+        self.progress.flush()
+        self.completed.add(mid)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.progress.close()
+
+    def finish(self):
+        self.close()
+        os.remove(self.progress_path)
+
+
+def has_scraped(root=None):
+    """Whether there is anything for `load_scraped` to read."""
+    return os.path.exists(os.path.join(root or DATA_DIR, TABLE_DIR, "matches.csv")) or has_table("scraped", root)
+
+
+def load_scraped(root=None, columns=None):
+    """The scraped rooms in the flat layout: the join view of the tables in
+    `<root>/faceit_tables`, or the legacy scraped dataset when it is newer."""
+    folder = os.path.join(root or DATA_DIR, TABLE_DIR)
+    marker = os.path.join(folder, "matches.csv")
+    legacy = [p for p in (csv_path("scraped", root), parquet_path("scraped", root)) if os.path.exists(p)]
+    if os.path.exists(marker) and all(os.path.getmtime(p) <= os.path.getmtime(marker) for p in legacy):
+        return apply_schema(MatchTables.load(folder).wide(columns), categories=False)
+    return load_table("scraped", columns=columns, root=root, categories=False)
+
+
+#python relational.py [root]: split the scraped CSV into faceit_tables/ and compare size and load time
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the flat scraped CSV into the normalized tables")
+    parser.add_argument("root", nargs="?", default=DATA_DIR)
+    args = parser.parse_args()
+
+    source = csv_path("scraped", args.root)
+    start = time.perf_counter()
+    wide = pd.read_csv(source)
+    t_wide = time.perf_counter() - start
+    folder = os.path.join(args.root, TABLE_DIR)
+    tables = MatchTables.from_wide(wide)
+    tables.save(folder)
+
+    start = time.perf_counter()
+    view = MatchTables.load(folder).wide()
+    t_tables = time.perf_counter() - start
+    pd.testing.assert_frame_equal(view, wide, check_dtype=False)
+    size = sum(os.path.getsize(os.path.join(folder, f"{n}.csv")) for n in TABLES)
+    print(f"{source}: {os.path.getsize(source) / 2**20:.2f} MB, read in {t_wide:.3f}s")
+    print(f"{folder}: {size / 2**20:.2f} MB, read and joined in {t_tables:.3f}s (identical rows)")
+    for name in TABLES:
+        print(f"  {name:<14} {len(tables[name]):>7} rows")
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from stat_columns import (
+    ADDITIVE, CATEGORICAL, PER_10M, RATIO, SHARE, classify, recompute, required_sums,
+)
+
+MATCH_KEYS = ["region", "stage", "phase", "match_id", "match_date"]
+TEAM_MATCH_KEYS = MATCH_KEYS + ["team"]
+PLAYER_MATCH_KEYS = TEAM_MATCH_KEYS + ["player"]
+TEAM_MAP_KEYS = MATCH_KEYS + ["round_num", "map_name", "map_type", "team"]
+MAP_KEYS = ["round_num", "map_name", "map_type"]
+
+
+class Grouping:
+    """Dense, key-sorted group ids for the rows of a frame.
+
+    `group` holds one id per row (-1 for rows dropped because a key is NaN, as
+    `groupby` does); `order`/`starts` describe the rows sorted by group so that
+    ufunc `reduceat` calls can reduce every group in one vectorized sweep.
+    """
+
+    def __init__(self, codes, keys, allow_na=()):
+        n = len(codes[keys[0]])
+        group = np.zeros(n, dtype=np.int64)
+        valid = np.ones(n, dtype=bool)
+        for k in keys:
+            c = codes[k]
+            if k not in allow_na:
+                valid &= c >= 0
+            if n:
+                group = group * (int(c.max()) + 2) + (c + 1)
+                group = pd.factorize(group, sort=True)[0]
+        group[~valid] = -1
+        if valid.any():
+            group[valid] = pd.factorize(group[valid], sort=True)[0]
+
+        self.group = group
+        self.n_groups = int(group.max()) + 1 if n else 0
+        order = np.argsort(group, kind="stable")
+        self.order = order[group[order] >= 0]
+        sorted_group = group[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_group[1:] != sorted_group[:-1]]) if len(sorted_group) else np.array([], dtype=np.int64)
+        self.first = self.order[self.starts]
+
+    def sum(self, values):
+        # NaN counts as 0, like groupby().sum()
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        mask = self.group >= 0
+        return np.bincount(self.group[mask], weights=values[mask], minlength=self.n_groups)
+
+    def max(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not self.n_groups:
+            return values[:0]
+        return np.fmax.reduceat(values[self.order], self.starts)
+
+
+def factorize_keys(frame, columns):
+    """Factorize each key column once (sorted, NaN -> -1)."""
+    return {c: pd.factorize(frame[c], sort=True)[0] for c in columns}
+
+
+def _reduce(frame, grouping, keys, sum_cols):
+    out = frame[keys].iloc[grouping.first].reset_index(drop=True)
+    sums = {}
+    for c in sum_cols:
+        col = grouping.sum(frame[c].to_numpy())
+        if pd.api.types.is_integer_dtype(frame[c]):
+            # sums of compact int8/int16 counts need the full width
+            col = col.astype(np.int64)
+        sums[c] = col
+    return pd.concat([out, pd.DataFrame(sums, columns=sum_cols)], axis=1)
+
+
+def _result_max(frame_result, grouping):
+    col = grouping.max(frame_result.to_numpy())
+    if pd.api.types.is_integer_dtype(frame_result):
+        col = col.astype(frame_result.dtype)
+    return col
+
+
+def _mode(values, grouping):
+    # most frequent label per group (ties -> alphabetical), NaN if the group has none
+    df = pd.DataFrame({"g": grouping.group, "v": values.to_numpy()})
+    counts = df[(df["g"] >= 0) & df["v"].notna()].groupby(["g", "v"], observed=True).size().reset_index(name="n")
+    counts = counts.sort_values(["g", "n", "v"], ascending=[True, False, True]).drop_duplicates("g")
+    out = pd.Series(np.nan, index=range(grouping.n_groups), dtype=object)
+    out.iloc[counts["g"].to_numpy()] = counts["v"].to_numpy()
+    return out.to_numpy()
+
+
+def aggregate_levels(master, stat_cols):
+    """Build team_match, player_match and team_map from the master rows.
+
+    The key columns are factorized once. Raw rows are reduced twice: to
+    team x map groups (NaN map keys kept as their own group so nothing is lost)
+    and to team x player x match groups. team_map is the fine level with its NaN
+    groups dropped, and team_match is rolled up from the fine level instead of
+    re-scanning the raw rows.
+
+    Stats follow the `stat_columns` registry: additive stats are summed, ratio,
+    per-10m and share-of-output stats are recomputed from the summed parts,
+    `Result` takes the max, categorical stats (Role) keep the player's most
+    frequent value at player level and are dropped at team level. team_map's
+    `hero_bans` is the sorted set of bans seen in the group.
+    """
+    kinds = classify(master, stat_cols)
+    derived = kinds[RATIO] + kinds[PER_10M] + kinds[SHARE]
+    sum_cols = list(dict.fromkeys(
+        kinds[ADDITIVE] + [c for c in required_sums(derived) if c in master.columns]
+    ))
+    categorical = kinds[CATEGORICAL]
+    has_result = "Result" in master.columns
+    team_cols = [c for c in stat_cols if c in sum_cols or c in derived]
+    codes = factorize_keys(master, list(dict.fromkeys(TEAM_MAP_KEYS + PLAYER_MATCH_KEYS)))
+
+    # team x map (fine) level, straight from the raw rows
+    fine = Grouping(codes, TEAM_MAP_KEYS, allow_na=MAP_KEYS)
+    fine_frame = _reduce(master, fine, TEAM_MAP_KEYS, sum_cols)
+    if "hero_bans" in master.columns:
+        bans = pd.DataFrame({"g": fine.group, "ban": master["hero_bans"].to_numpy()})
+        bans = bans[(bans["g"] >= 0) & bans["ban"].notna()].astype({"ban": str})
+        bans = bans.drop_duplicates().sort_values(["g", "ban"])
+        # every player row of a map repeats the same bans, so nearly all groups have one
+        # distinct value; only the rare multi-valued groups need a string join
+        joined = np.full(fine.n_groups, "", dtype=object)
+        multi = bans["g"].duplicated(keep=False).to_numpy()
+        joined[bans["g"].to_numpy()[~multi]] = bans["ban"].to_numpy()[~multi]
+        if multi.any():
+            merged = bans[multi].groupby("g")["ban"].agg(", ".join)
+            joined[merged.index.to_numpy()] = merged.to_numpy()
+        fine_frame["hero_bans"] = joined
+    if has_result:
+        fine_frame["Result"] = _result_max(master["Result"], fine)
+
+    # team x match level, rolled up from the fine groups
+    fine_codes = {k: codes[k][fine.first] for k in TEAM_MATCH_KEYS}
+    coarse = Grouping(fine_codes, TEAM_MATCH_KEYS)
+    team_match = recompute(_reduce(fine_frame, coarse, TEAM_MATCH_KEYS, sum_cols), derived)
+    team_match = team_match[TEAM_MATCH_KEYS + team_cols]
+    if has_result:
+        team_match["Result"] = _result_max(fine_frame["Result"], coarse)
+
+    named = np.all([codes[k][fine.first] >= 0 for k in MAP_KEYS], axis=0)
+    team_map = recompute(fine_frame[named].reset_index(drop=True), derived)
+    extra = [c for c in ("hero_bans", "Result") if c in team_map.columns]
+    team_map = team_map[TEAM_MAP_KEYS + team_cols + extra]
+
+    # team x player x match level
+    players = Grouping(codes, PLAYER_MATCH_KEYS)
+    player_match = recompute(_reduce(master, players, PLAYER_MATCH_KEYS, sum_cols), derived)
+    for c in categorical:
+        player_match[c] = _mode(master[c], players)
+    player_cols = [c for c in stat_cols if c in sum_cols or c in derived or c in categorical]
+    player_match = player_match[PLAYER_MATCH_KEYS + player_cols]
+    if has_result:
+        player_match["Result"] = _result_max(master["Result"], players)
+
+    return team_match, player_match, team_map
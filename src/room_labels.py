@@ -0,0 +1,92 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from match_keys import LABEL_COLUMNS, fill_labels, parse_match_ids
+from storage import DATA_DIR
+
+ROOM_LABELS_FILE = "room_labels.csv"
+COLUMNS = ["room_id", "match_id"] + LABEL_COLUMNS
+REPO_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", ROOM_LABELS_FILE)
+
+
+def room_labels_path(root=None):
+    """The table in the data folder, else the copy shipped in the repo's data/."""
+    path = os.path.join(root or DATA_DIR, ROOM_LABELS_FILE)
+    return path if os.path.exists(path) or not os.path.exists(REPO_TABLE) else REPO_TABLE
+
+
+class RoomLabels:
+    """OWCS match id, region, stage and phase of FaceIT rooms.
+
+    The scraper stores rooms under their FaceIT room ids (1-<guid>), which
+    carry none of the labels the master is split by. Each row of
+    room_labels.csv gives a room its OWCS match id (e.g.
+    EMEA_S2_RR_W3_D1_M2); region, stage and phase left blank are read from
+    that id. Rows already keyed by an OWCS id (older scrapes) need no entry.
+    A room listed twice with different labels stops the load.
+    """
+
+    def __init__(self, rows=None):
+        rows = pd.DataFrame(columns=COLUMNS) if rows is None else rows
+        rows = rows.reindex(columns=COLUMNS).replace({"": None})
+        rows = rows[rows["room_id"].notna()].drop_duplicates()
+        clashes = rows[rows["room_id"].duplicated(keep=False)]
+        if len(clashes):
+            raise ValueError(f"Rooms with conflicting labels in {ROOM_LABELS_FILE}:\n{clashes.to_string(index=False)}")
+        ids = pd.Index(rows["match_id"].dropna().unique())
+        fill_labels(rows, parse_match_ids(ids).set_index(ids))
+        self.rows = rows.set_index("room_id")
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or room_labels_path()
+        if not os.path.exists(path):
+            return cls()
+        # "NA" is a region, not a missing value
+        return cls(pd.read_csv(path, dtype=str, keep_default_na=False))
+
+    def apply(self, df):
+        """(rows of `df` with OWCS match ids and region/stage/phase, sorted
+        room ids that got no labels). Rows of unlabeled rooms are dropped:
+        without region and stage they would break the per-region and
+        stage-based splits downstream."""
+        df = df.copy()
+        for c in LABEL_COLUMNS:
+            if c not in df.columns:
+                df[c] = None
+        rooms = df["match_id"].astype(str)
+        pos = self.rows.index.get_indexer(rooms)
+        known = pos >= 0
+        if known.any():
+            found = self.rows.iloc[pos[known]]
+            for c in ["match_id"] + LABEL_COLUMNS:
+                value = found[c].to_numpy(dtype=object)
+                df[c] = df[c].astype(object)
+                df.loc[known, c] = np.where(pd.isna(value), df.loc[known, c].to_numpy(dtype=object), value)
+        ids = pd.Index(df["match_id"].dropna().unique())
+        fill_labels(df, parse_match_ids(ids).set_index(ids))
+        labeled = df[LABEL_COLUMNS].notna().all(axis=1).to_numpy()
+        missing = sorted(df.loc[~labeled, "match_id"].astype(str).unique())
+        return df[labeled].reset_index(drop=True), missing
+
+
+def merge_rooms(master, rooms):
+    """`master` minus the rows of every match in `rooms`, followed by `rooms`.
+    The master keeps its own column order; columns only `rooms` has are appended."""
+    kept = master[~master["match_id"].isin(set(rooms["match_id"]))]
+    columns = list(master.columns) + [c for c in rooms.columns if c not in master.columns]
+    return pd.concat([kept, rooms], ignore_index=True)[columns]
+
+
+#python room_labels.py [file]: check the table and list its rooms
+if __name__ == "__main__":
+    try:
+        labels = RoomLabels.load(sys.argv[1] if len(sys.argv) > 1 else None)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"{len(labels.rows)} rooms labeled")
+    if len(labels.rows):
+        print(labels.rows.to_string())
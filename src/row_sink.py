@@ -0,0 +1,110 @@
+import csv
+import os
+import warnings
+
+ID_COLUMNS = [
+    "match_id", "match_date", "round_num", "map_name", "hero_bans",
+    "team", "player", "player_id", "nickname", "Result", "data_quality",
+]
+
+# FaceIT `player_stats` keys for OW2 rooms, in the order of the master CSV
+PLAYER_STAT_COLUMNS = [
+    "Damage Dealt", "Damage Mitigated/Eliminations", "Environmental Kills/10m",
+    "Damage as percent of total output", "Time Played", "Solo Kills/Deaths Ratio",
+    "Healing Done/Eliminations", "Environmental Kills", "Damage Mitigated/Deaths",
+    "Damage Mitigated as percent of total output", "Healing Done as percent of total output",
+    "Objective Time", "Damage Dealt/(Eliminations + Assists)",
+    "Damage Mitigated/(Eliminations + Assists)", "Damage Dealt/Eliminations",
+    "Damage Dealt/10m", "Final Blows/(Eliminations + Assists)", "Multi Kills/10m",
+    "K/D Ratio", "Solo Kills/Damage Dealt Ratio", "Solo Kills/10m", "Damage Mitigated",
+    "Final Blows/Eliminations", "Deaths/10m", "Solo Kills/(Eliminations + Assists) Ratio",
+    "Eliminations/10m", "Solo Kills/Eliminations Ratio", "Healing Done/Deaths",
+    "Objective Time/10m", "Solo Kills", "Assists/10m", "Assists", "Healing Done",
+    "Multi Kills", "Deaths", "Healing Done/(Eliminations + Assists)", "Final Blows",
+    "(Eliminations + Assists)/Deaths", "Damage Mitigated/10m", "Eliminations",
+    "Solo Kills/Final Blows Ratio", "Final Blows/10m", "Healing Done/10m", "Role",
+]
+
+ROW_COLUMNS = ID_COLUMNS + PLAYER_STAT_COLUMNS
+
+
+class CsvRowSink:
+    """Append-only CSV writer with a fixed column schema.
+
+    Rows are written one match at a time and the match id is then recorded,
+    together with the file size, in `<path>.progress`. On restart the CSV is
+    truncated back to the last completed match, so an interrupted scrape resumes
+    where it stopped instead of starting over. `finish()` drops the progress file.
+    """
+
+    def __init__(self, path, columns=ROW_COLUMNS, resume=True):
+        self.path = path
+        self.columns = list(columns)
+        self.known = set(self.columns)
+        self.progress_path = f"{path}.progress"
+        self.completed = set()
+        self.dropped = set()
+
+        offset = 0
+        if resume and os.path.exists(self.progress_path):
+            with open(self.progress_path, encoding="utf-8") as f:
+                for line in f:
+                    mid, _, pos = line.rstrip("\n").rpartition("\t")
+                    if mid:
+                        self.completed.add(mid)
+                        offset = int(pos)
+        if not self.completed and os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+
+        if self.completed and os.path.exists(path):
+            self.file = open(path, "r+", newline="", encoding="utf-8")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+        else:
+            self.completed = set()
+            self.file = open(path, "w", newline="", encoding="utf-8")
+            csv.writer(self.file, lineterminator="\n").writerow(self.columns)
+        self.writer = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction="ignore", lineterminator="\n")
+        self.progress = open(self.progress_path, "a", encoding="utf-8")
+
+    def write_match(self, mid, rows):
+        for row in rows:
+            extra = row.keys() - self.known
+            if extra - self.dropped:
+                self.dropped |= extra
+                warnings.warn(f"Dropping stat keys not in the schema: {sorted(extra)}")
+        self.writer.writerows(rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.progress.write(f"{mid}\t{self.file.tell()}\n")
+        self.progress.flush()
+        self.completed.add(mid)
+
+    def close(self):
+        self.file.close()
+        self.progress.close()
+
+    def finish(self):
+        self.close()
+        os.remove(self.progress_path)
+
+
+def merge_csv(master_path, delta_path, replaced_ids):
+    """Stream `master_path` minus the rows of `replaced_ids`, followed by every
+    row of `delta_path`, into a new master file (rows are never all in memory).
+    The master keeps its own column order; delta-only columns are appended."""
+    replaced_ids = set(replaced_ids)
+    tmp = f"{master_path}.tmp"
+    with open(master_path, newline="", encoding="utf-8") as master, \
+            open(delta_path, newline="", encoding="utf-8") as delta, \
+            open(tmp, "w", newline="", encoding="utf-8") as out:
+        master_rows, delta_rows = csv.DictReader(master), csv.DictReader(delta)
+        columns = list(master_rows.fieldnames or [])
+        columns += [c for c in delta_rows.fieldnames or [] if c not in columns]
+        writer = csv.DictWriter(out, fieldnames=columns, lineterminator="\n")
+        writer.writeheader()
+        for row in master_rows:
+            if row["match_id"] not in replaced_ids:
+                writer.writerow(row)
+        writer.writerows(delta_rows)
+    os.replace(tmp, master_path)
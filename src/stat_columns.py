@@ -0,0 +1,137 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+ADDITIVE = "additive"        # counts and totals: summed
+RATIO = "ratio"              # sum(numerator) / max(sum(denominator), 1), FaceIT's convention
+PER_10M = "per_10m"          # sum(stat) / sum(Time Played) * 600
+SHARE = "share"              # percent of total output (damage + mitigated + healing)
+CATEGORICAL = "categorical"  # labels such as Role: never summed
+OUTCOME = "outcome"          # Result: max over the group
+
+StatSpec = namedtuple("StatSpec", ["kind", "numerator", "denominator"], defaults=((), ()))
+
+ELIMS_ASSISTS = ("Eliminations", "Assists")
+TOTAL_OUTPUT = ("Damage Dealt", "Damage Mitigated", "Healing Done")
+
+
+def ratio(numerator, denominator):
+    as_tuple = lambda x: (x,) if isinstance(x, str) else tuple(x)
+    return StatSpec(RATIO, as_tuple(numerator), as_tuple(denominator))
+
+
+def per_10m(stat):
+    return StatSpec(PER_10M, (stat,), ("Time Played",))
+
+
+def share(stat):
+    return StatSpec(SHARE, (stat,), TOTAL_OUTPUT)
+
+
+# Every FaceIT OW2 player stat and how it rolls up (formulas checked against the raw rows)
+STAT_SPECS = {
+    "Time Played": StatSpec(ADDITIVE),
+    "Eliminations": StatSpec(ADDITIVE),
+    "Assists": StatSpec(ADDITIVE),
+    "Deaths": StatSpec(ADDITIVE),
+    "Final Blows": StatSpec(ADDITIVE),
+    "Solo Kills": StatSpec(ADDITIVE),
+    "Multi Kills": StatSpec(ADDITIVE),
+    "Environmental Kills": StatSpec(ADDITIVE),
+    "Damage Dealt": StatSpec(ADDITIVE),
+    "Damage Mitigated": StatSpec(ADDITIVE),
+    "Healing Done": StatSpec(ADDITIVE),
+    "Objective Time": StatSpec(ADDITIVE),
+
+    "K/D Ratio": ratio("Eliminations", "Deaths"),
+    "(Eliminations + Assists)/Deaths": ratio(ELIMS_ASSISTS, "Deaths"),
+    "Final Blows/Eliminations": ratio("Final Blows", "Eliminations"),
+    "Final Blows/(Eliminations + Assists)": ratio("Final Blows", ELIMS_ASSISTS),
+    "Solo Kills/Deaths Ratio": ratio("Solo Kills", "Deaths"),
+    "Solo Kills/Eliminations Ratio": ratio("Solo Kills", "Eliminations"),
+    "Solo Kills/(Eliminations + Assists) Ratio": ratio("Solo Kills", ELIMS_ASSISTS),
+    "Solo Kills/Final Blows Ratio": ratio("Solo Kills", "Final Blows"),
+    "Solo Kills/Damage Dealt Ratio": ratio("Solo Kills", "Damage Dealt"),
+    "Damage Dealt/Eliminations": ratio("Damage Dealt", "Eliminations"),
+    "Damage Dealt/(Eliminations + Assists)": ratio("Damage Dealt", ELIMS_ASSISTS),
+    "Damage Mitigated/Eliminations": ratio("Damage Mitigated", "Eliminations"),
+    "Damage Mitigated/(Eliminations + Assists)": ratio("Damage Mitigated", ELIMS_ASSISTS),
+    "Damage Mitigated/Deaths": ratio("Damage Mitigated", "Deaths"),
+    "Healing Done/Eliminations": ratio("Healing Done", "Eliminations"),
+    "Healing Done/(Eliminations + Assists)": ratio("Healing Done", ELIMS_ASSISTS),
+    "Healing Done/Deaths": ratio("Healing Done", "Deaths"),
+
+    "Eliminations/10m": per_10m("Eliminations"),
+    "Assists/10m": per_10m("Assists"),
+    "Deaths/10m": per_10m("Deaths"),
+    "Final Blows/10m": per_10m("Final Blows"),
+    "Solo Kills/10m": per_10m("Solo Kills"),
+    "Multi Kills/10m": per_10m("Multi Kills"),
+    "Environmental Kills/10m": per_10m("Environmental Kills"),
+    "Damage Dealt/10m": per_10m("Damage Dealt"),
+    "Damage Mitigated/10m": per_10m("Damage Mitigated"),
+    "Healing Done/10m": per_10m("Healing Done"),
+    "Objective Time/10m": per_10m("Objective Time"),
+
+    "Damage as percent of total output": share("Damage Dealt"),
+    "Damage Mitigated as percent of total output": share("Damage Mitigated"),
+    "Healing Done as percent of total output": share("Healing Done"),
+
+    "Role": StatSpec(CATEGORICAL),
+    "Result": StatSpec(OUTCOME),
+}
+
+
+def spec_for(column, dtype=None):
+    """Registry entry for `column`; unknown FaceIT keys are inferred from their
+    name (`X/10m`) or dtype so a new stat never gets silently concatenated."""
+    if column in STAT_SPECS:
+        return STAT_SPECS[column]
+    if column.endswith("/10m"):
+        return per_10m(column[:-len("/10m")])
+    if dtype is not None and not pd.api.types.is_numeric_dtype(dtype):
+        return StatSpec(CATEGORICAL)
+    return StatSpec(ADDITIVE)
+
+
+def classify(frame, columns):
+    """Split `columns` of `frame` into {kind: [column, ...]}."""
+    kinds = {k: [] for k in (ADDITIVE, RATIO, PER_10M, SHARE, CATEGORICAL, OUTCOME)}
+    for c in columns:
+        kinds[spec_for(c, frame[c].dtype).kind].append(c)
+    return kinds
+
+
+def required_sums(derived):
+    """Additive columns needed to recompute the `derived` columns."""
+    needed = []
+    for c in derived:
+        spec = spec_for(c)
+        needed += list(spec.numerator) + list(spec.denominator)
+    return list(dict.fromkeys(needed))
+
+
+def recompute(frame, derived):
+    """Fill every derived (ratio / per-10m / share) column of `frame` from the
+    summed additive columns already in it, in place and vectorized."""
+    cache = {}
+
+    def total(cols):
+        if cols not in cache:
+            cache[cols] = np.sum([frame[c].to_numpy(dtype=np.float64) for c in cols], axis=0)
+        return cache[cols]
+
+    for c in derived:
+        spec = spec_for(c)
+        if any(col not in frame.columns for col in spec.numerator + spec.denominator):
+            frame[c] = np.nan
+            continue
+        num, den = total(spec.numerator), total(spec.denominator)
+        if spec.kind == RATIO:
+            frame[c] = num / np.maximum(den, 1)
+        elif spec.kind == PER_10M:
+            frame[c] = np.divide(num * 600, den, out=np.zeros_like(num), where=den > 0)
+        elif spec.kind == SHARE:
+            frame[c] = np.divide(num * 100, den, out=np.zeros_like(num), where=den > 0)
+    return frame
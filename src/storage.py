@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import shutil
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV-only fallback
+    pa = pq = None
+
+from match_keys import LABEL_COLUMNS, fill_labels, parse_match_ids
+
+DATA_DIR = os.environ.get("OWCS_DATA_DIR", ".")
+
+# name -> (legacy CSV file, partition columns)
+# scraper -> "scraped" -> Cleaning the dataset.py -> "master" -> aggregations.py -> team/player tables
+DATASETS = {
+    "scraped": ("faceit_all_matches.csv", ["region", "stage"]),
+    "master": ("faceit_all_matches_emea_na_all_stages.csv", ["region", "stage"]),
+    "team_match": ("team_match.csv", ["region", "stage"]),
+    "team_map": ("team_map.csv", ["region", "stage"]),
+    "player_match": ("player_match.csv", ["region", "stage"]),
+    "predictions": ("predictions_all.csv", []),
+}
+
+CATEGORY_COLUMNS = [
+    "region", "stage", "phase", "team", "player", "map_name", "map_type",
+    "hero_bans", "Role", "data_quality", "opp_team", "team1", "team2", "predicted_winner", "bracket",
+]
+DATE_COLUMNS = ["match_date"]
+TEXT_COLUMNS = ["match_id", "match"]
+SMALL_INT_COLUMNS = {"round_num": "int16", "Result": "int8"}
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+CODEBOOK_FILE = "codebook.json"
+
+
+def csv_path(name, root=None):
+    return os.path.join(root or DATA_DIR, DATASETS[name][0])
+
+
+def parquet_path(name, root=None):
+    return os.path.join(root or DATA_DIR, f"{name}.parquet")
+
+
+def apply_schema(df, categories=True):
+    """Coerce a frame to the shared schema: parsed dates, sorted categoricals
+    for the label columns, everything else left numeric."""
+    if "match_id" in df.columns and any(c in df.columns and df[c].isna().any() for c in LABEL_COLUMNS):
+        # CSV copies read region "NA" back as missing, and older files lack labels: refill them from the match id
+        ids = pd.Index(df["match_id"].dropna().unique())
+        fill_labels(df, parse_match_ids(ids).set_index(ids))
+    for c in DATE_COLUMNS:
+        if c in df.columns and not pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+    for c in CATEGORY_COLUMNS:
+        if c not in df.columns:
+            continue
+        if categories:
+            values = df[c].dropna().unique()
+            df[c] = df[c].astype(object).astype(pd.CategoricalDtype(sorted(map(str, values))))
+        elif isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(object)
+    return df
+
+
+def arrow_schema(df):
+    fields = []
+    for c in df.columns:
+        if c in CATEGORY_COLUMNS:
+            t = pa.dictionary(pa.int32(), pa.string())
+        elif c in DATE_COLUMNS:
+            t = pa.timestamp("s")
+        elif c in TEXT_COLUMNS or not pd.api.types.is_numeric_dtype(df[c]):
+            t = pa.string()
+        elif c in SMALL_INT_COLUMNS:
+            t = pa.from_numpy_dtype(SMALL_INT_COLUMNS[c])
+        elif pd.api.types.is_integer_dtype(df[c]):
+            t = pa.int64()
+        else:
+            t = pa.float64()
+        fields.append(pa.field(c, t))
+    return pa.schema(fields)
+
+
+def save_table(df, name, root=None, export_csv=False):
+    """Write dataset `name` as Parquet partitioned by its partition columns
+    (hive layout, dictionary-encoded labels). `export_csv` also refreshes the
+    legacy CSV that Power BI reads."""
+    df = apply_schema(df.copy())
+    if export_csv or pa is None:
+        out = df.copy()
+        for c in DATE_COLUMNS:
+            if c in out.columns:
+                out[c] = out[c].dt.strftime(DATE_FORMAT)
+        out.to_csv(csv_path(name, root), index=False)
+    if pa is None:
+        warnings.warn("pyarrow is not installed; wrote CSV only")
+        return
+
+    path = parquet_path(name, root)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    for c in SMALL_INT_COLUMNS:
+        # nullable small ints: keep NaN as null instead of failing the cast
+        if c in df.columns and df[c].isna().any():
+            df[c] = df[c].astype(SMALL_INT_COLUMNS[c].capitalize())
+    table = pa.Table.from_pandas(df, schema=arrow_schema(df), preserve_index=False)
+    partitions = [c for c in DATASETS[name][1] if c in df.columns]
+    pq.write_to_dataset(table, path, partition_cols=partitions or None)
+
+
+def has_table(name, root=None):
+    """Whether dataset `name` has a Parquet or CSV copy in the data folder."""
+    return os.path.exists(parquet_path(name, root)) or os.path.exists(csv_path(name, root))
+
+
+def load_table(name, columns=None, filters=None, root=None, categories=True):
+    """Read dataset `name`, projecting `columns` and pushing `filters` (pyarrow
+    DNF, e.g. [("region", "==", "NA"), ("stage", "in", ["S1", "S2"])]) down to
+    the Parquet reader so untouched partitions and columns are never read.
+    Falls back to the legacy CSV (filtered in pandas) if there is no Parquet copy
+    or the CSV was written after it (e.g. by the scraper)."""
+    path = parquet_path(name, root)
+    csv = csv_path(name, root)
+    fresh = os.path.exists(path) and (not os.path.exists(csv) or os.path.getmtime(path) >= os.path.getmtime(csv))
+    if pa is not None and fresh:
+        df = pd.read_parquet(path, columns=columns, filters=filters)
+    else:
+        usecols = None
+        if columns is not None:
+            wanted = set(columns) | {c for c, _, _ in filters or []}
+            if wanted & {"region", "stage", "phase"}:
+                wanted.add("match_id")
+            usecols = lambda c: c in wanted
+        df = apply_schema(pd.read_csv(csv, usecols=usecols), categories=False)
+        if filters:
+            df = df[_mask(df, filters)].reset_index(drop=True)
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+    return apply_schema(df, categories=categories)
+
+
+class Codebook:
+    """Persisted label -> integer code dictionaries for the label columns.
+
+    Codes never change once assigned: labels seen for the first time are
+    appended (sorted within the batch), so `team_code` means the same team
+    across runs, datasets and train/test splits. A fresh codebook numbers the
+    labels in sorted order, matching `astype("category").cat.codes`.
+    """
+
+    def __init__(self, labels=None, path=None):
+        self.labels = {c: list(v) for c, v in (labels or {}).items()}
+        self.path = path
+        self.changed = False
+
+    @classmethod
+    def load(cls, root=None):
+        path = os.path.join(root or DATA_DIR, CODEBOOK_FILE)
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), path=path)
+
+    def save(self):
+        if not self.changed or self.path is None:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.labels, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.changed = False
+
+    def dtype(self, column, values):
+        """CategoricalDtype of `column` whose category order is the code order,
+        extended with any new labels among `values`."""
+        known = self.labels.setdefault(column, [])
+        seen = set(known)
+        new = sorted({str(v) for v in pd.unique(values) if pd.notna(v)} - seen)
+        if new:
+            known += new
+            self.changed = True
+        return pd.CategoricalDtype(known)
+
+    def codes(self, series, column=None):
+        """Stable int32 codes of `series` (-1 for missing)."""
+        column = column or series.name
+        dtype = self.dtype(column, series)
+        return pd.Categorical(series.astype(object).where(series.isna(), series.astype(str)), dtype=dtype).codes.astype(np.int32)
+
+
+def compact(df, codebook=None):
+    """Smallest faithful dtypes: label columns categorical (codes from
+    `codebook` when given), additive counts as the smallest integer type that
+    holds them, ratios/rates/shares and counts with gaps as float32, match_date
+    parsed."""
+    from stat_columns import ADDITIVE, OUTCOME, spec_for
+
+    df = apply_schema(df, categories=codebook is None)
+    for c in df.columns:
+        s = df[c]
+        if c in CATEGORY_COLUMNS:
+            if codebook is not None:
+                df[c] = pd.Categorical(s.astype(object).where(s.isna(), s.astype(str)), dtype=codebook.dtype(c, s))
+        elif c in SMALL_INT_COLUMNS and not s.isna().any():
+            df[c] = s.astype(SMALL_INT_COLUMNS[c])
+        elif pd.api.types.is_float_dtype(s) or pd.api.types.is_integer_dtype(s):
+            whole = spec_for(c).kind in (ADDITIVE, OUTCOME) and not s.isna().any() and bool((s % 1 == 0).all())
+            df[c] = pd.to_numeric(s.astype(np.int64), downcast="integer") if whole else s.astype(np.float32)
+    return df
+
+
+def load_compact(name, columns=None, filters=None, root=None, codebook=True):
+    """`load_table` followed by `compact`, with codes from the persisted
+    codebook of the data folder (new labels are added to it)."""
+    df = load_table(name, columns=columns, filters=filters, root=root, categories=False)
+    book = Codebook.load(root) if codebook else None
+    df = compact(df, book)
+    if book is not None:
+        book.save()
+    return df
+
+
+def memory_report(before, after):
+    """Bytes per column of two versions of the same frame, largest first."""
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.astype(str),
+        "mb_before": before.memory_usage(deep=True, index=False) / 1e6,
+        "mb_after": after.memory_usage(deep=True, index=False) / 1e6,
+    })
+    report = report.sort_values("mb_before", ascending=False)
+    report.loc["TOTAL"] = ["", "", report["mb_before"].sum(), report["mb_after"].sum()]
+    report["ratio"] = report["mb_before"] / report["mb_after"]
+    return report
+
+
+def _mask(df, filters):
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        s = df[col]
+        if op in ("=", "=="):
+            mask &= s == value
+        elif op == "!=":
+            mask &= s != value
+        elif op == "in":
+            mask &= s.isin(value)
+        elif op == "not in":
+            mask &= ~s.isin(value)
+        elif op == "<":
+            mask &= s < value
+        elif op == "<=":
+            mask &= s <= value
+        elif op == ">":
+            mask &= s > value
+        elif op == ">=":
+            mask &= s >= value
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return mask
+
+
+#python storage.py [root]: convert every legacy CSV found in root to Parquet
+#python storage.py --memory master [root]: footprint of the default vs the compact load
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert legacy CSVs to Parquet, or report dataset memory use")
+    parser.add_argument("root", nargs="?", default=DATA_DIR)
+    parser.add_argument("--memory", metavar="NAME", choices=list(DATASETS), help="memory report for one dataset")
+    args = parser.parse_args()
+    root = args.root
+    if args.memory:
+        plain = pd.read_csv(csv_path(args.memory, root))
+        report = memory_report(plain, load_compact(args.memory, root=root))
+        print(report.to_string(float_format="{:.3f}".format))
+        raise SystemExit
+    for name in DATASETS:
+        if os.path.exists(csv_path(name, root)):
+            df = pd.read_csv(csv_path(name, root))
+            save_table(df, name, root=root)
+            print(f"{name}: {len(df)} rows -> {parquet_path(name, root)}")
@@ -0,0 +1,227 @@
+import json
+import math
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from faceit_cache import ResponseCache
+from match_keys import LABEL_COLUMNS
+from row_sink import ID_COLUMNS, PLAYER_STAT_COLUMNS
+from stat_columns import ADDITIVE, spec_for, recompute
+
+STAGES = ("S1", "S2", "S3")
+ROLES = ("Tank", "Damage", "Damage", "Support", "Support")
+HEROES = [
+    "Ana", "Ashe", "Baptiste", "Bastion", "Brigitte", "Cassidy", "Doomfist", "Dva", "Echo", "Freja",
+    "Genji", "Hanzo", "Hazard", "Illari", "Junkerqueen", "Junkrat", "Juno", "Kiriko", "Lifeweaver",
+    "Lucio", "Mauga", "Mei", "Mercy", "Moira", "Orisa", "Pharah", "Ramattra", "Reaper", "Reinhardt",
+    "Roadhog", "Sigma", "Sojourn", "Sombra", "Symmetra", "Torbjorn", "Tracer", "Venture",
+    "Widowmaker", "Winston", "Wrecking Ball", "Wuyang", "Zarya", "Zenyetta",
+]
+# map names as spelled in Cleaning the dataset.py, so the clean stage types them
+MAP_POOL = {
+    "Lijiang Tower": "Control", "Busan": "Control", "Ilios": "Control", "Oasis": "Control", "Samoa": "Control",
+    "Circuit Royal": "Escort", "Havana": "Escort", "Rialto": "Escort", "Shambali Monastery": "Escort",
+    "King's Row": "Hybrid", "Blizzard World": "Hybrid", "Midtown": "Hybrid", "Numbani": "Hybrid",
+    "Colosseo": "Push", "Esperanca": "Push", "New Queen Street": "Push", "Runasapi": "Push",
+    "Aatlis": "Flash", "New Junk City": "Flash", "Suravasa": "Flash",
+}
+# mean per 10 minutes (Tank, Damage, Support), measured on the 2025 EMEA/NA rows
+RATES = {
+    "Eliminations": (17.9, 17.0, 11.8),
+    "Assists": (6.0, 1.1, 14.0),
+    "Deaths": (5.3, 5.9, 5.6),
+    "Final Blows": (6.8, 7.5, 3.2),
+    "Solo Kills": (0.42, 0.68, 0.17),
+    "Multi Kills": (0.23, 0.16, 0.08),
+    "Environmental Kills": (0.07, 0.01, 0.05),
+    "Damage Dealt": (9550, 8430, 4270),
+    "Damage Mitigated": (9890, 660, 1110),
+    "Healing Done": (550, 110, 8600),
+    "Objective Time": (102, 46, 48),
+}
+# the master CSV's column order: FaceIT's player_stats keys with Result after Time Played
+MASTER_COLUMNS = (
+    [c for c in ID_COLUMNS if c not in ("player_id", "nickname", "Result", "data_quality")]
+    + PLAYER_STAT_COLUMNS[:5] + ["Result"] + PLAYER_STAT_COLUMNS[5:]
+    + ["map_type", "region", "phase", "stage"]
+)
+
+
+def synthetic_season(regions=("EMEA", "NA"), teams=12, matches=86, maps=5, players=6, stages=STAGES,
+                     start="2025-02-01", playoff_share=0.2, seed=0):
+    """Player x map rows of a made-up season in the schema of the master CSV
+    (faceit_all_matches_emea_na_all_stages.csv).
+
+    Every region has `teams` teams with `players` players each (five play a
+    map, the rest are substitutes) and plays `matches` best-of-`maps` matches,
+    spread over `stages` with the last `playoff_share` of each stage as
+    playoffs. Map winners follow hidden team strengths, so Elo and the models
+    have signal to find; stats are drawn around per-role rates and the
+    derived columns are computed from them as FaceIT does. The defaults give
+    about the size of the bundled 2025 data (~6k rows).
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start)
+    frames = []
+    for region in regions:
+        names = np.array([f"{region} Team {i:03d}" for i in range(teams)], dtype=object)
+        strength = rng.normal(0, 150, teams)
+
+        # matches: stage, phase, date and the two teams
+        stage = np.sort(rng.integers(0, len(stages), matches))
+        rank = pd.Series(stage).groupby(stage).cumcount().to_numpy()
+        per_stage = np.bincount(stage, minlength=len(stages))[stage]
+        playoffs = rank >= np.ceil(per_stage * (1 - playoff_share))
+        local = np.where(playoffs, rng.integers(35, 38, matches), rng.integers(0, 28, matches))
+        day = stage * 56 + local
+        a = rng.integers(0, teams, matches)
+        b = (a + rng.integers(1, teams, matches)) % teams
+        meta = pd.DataFrame({"stage": np.array(stages, dtype=object)[stage], "playoffs": playoffs, "day": day})
+        slot = meta.groupby(["stage", "day"]).cumcount().to_numpy()
+        tag = np.where(playoffs, "PO", "RR")
+        meta["match_id"] = [f"{region}_{s}_{t}_W{d // 7 + 1}_D{d % 7 + 1}_M{m + 1}"
+                            for s, t, d, m in zip(meta["stage"], tag, local, slot)]
+        meta["match_date"] = (start + pd.to_timedelta(day, unit="D") + pd.to_timedelta(18 + 2 * slot, unit="h")
+                              + pd.to_timedelta(rng.integers(0, 3600, matches), unit="s")).strftime("%Y-%m-%dT%H:%M:%S")
+
+        # maps: played until one side has won a majority of `maps`
+        p = 1 / (1 + 10 ** ((strength[b] - strength[a]) / 400))
+        a_wins = rng.random((matches, maps)) < p[:, None]
+        need = maps // 2 + 1
+        over = (np.cumsum(a_wins, axis=1) >= need) | (np.cumsum(~a_wins, axis=1) >= need)
+        played = over.argmax(axis=1) + 1
+        m = np.repeat(np.arange(matches), played)
+        round_num = np.arange(len(m)) - np.repeat(np.cumsum(played) - played, played) + 1
+        a_won = a_wins[m, round_num - 1]
+        map_names = np.array(list(MAP_POOL), dtype=object)[rng.integers(0, len(MAP_POOL), len(m))]
+        duration = np.clip(rng.gamma(11, 58, len(m)), 180, 1500).round()
+
+        # team x map rows (each team bans one hero per map), then five players per row
+        side = np.tile([0, 1], len(m))
+        tm = np.repeat(np.arange(len(m)), 2)
+        team = np.where(side == 0, a[m[tm]], b[m[tm]])
+        result = np.where(side == 0, a_won[tm], ~a_won[tm]).astype(int)
+        bans = np.array(HEROES, dtype=object)[rng.integers(0, len(HEROES), len(tm))]
+
+        row = np.repeat(np.arange(len(tm)), 5)
+        seat = np.tile(np.arange(5), len(tm))
+        roster = seat.copy()
+        if players > 5:
+            sub = rng.random(len(row)) < 0.04
+            roster[sub] = rng.integers(5, players, sub.sum())
+        frame = pd.DataFrame({
+            "match_id": meta["match_id"].to_numpy()[m[tm[row]]],
+            "match_date": meta["match_date"].to_numpy()[m[tm[row]]],
+            "round_num": round_num[tm[row]],
+            "map_name": map_names[tm[row]],
+            "hero_bans": bans[row],
+            "team": names[team[row]],
+            "player": [f"{region.lower()}{t:03d}p{k}" for t, k in zip(team[row], roster)],
+            "Result": result[row],
+            "Time Played": duration[tm[row]],
+            "Role": np.array(ROLES, dtype=object)[seat],
+            "map_type": pd.Series(map_names[tm[row]]).map(MAP_POOL).to_numpy(),
+            "region": region,
+            "phase": np.where(meta["playoffs"].to_numpy()[m[tm[row]]], "Playoffs", "Round Robin"),
+            "stage": meta["stage"].to_numpy()[m[tm[row]]],
+        })
+        role = np.array([0, 1, 1, 2, 2])[seat]
+        form = np.exp(rng.normal(0, 0.25, len(row))) * np.where(frame["Result"].to_numpy() == 1, 1.1, 0.9)
+        for stat, rates in RATES.items():
+            mean = np.array(rates)[role] * form * frame["Time Played"].to_numpy() / 600
+            frame[stat] = rng.poisson(mean).astype(np.int64)
+        frame["Final Blows"] = np.minimum(frame["Final Blows"], frame["Eliminations"])
+        frame["Solo Kills"] = np.minimum(frame["Solo Kills"], frame["Final Blows"])
+        frames.append(frame)
+
+    master = pd.concat(frames, ignore_index=True)
+    derived = [c for c in PLAYER_STAT_COLUMNS if c != "Role" and spec_for(c).kind != ADDITIVE]
+    recompute(master, derived)
+    master[derived] = master[derived].round(2)
+    shares = [c for c in derived if c.endswith("percent of total output")]
+    master[shares] = master[shares].round().astype(np.int64)
+    master["Solo Kills/Damage Dealt Ratio"] = master["Solo Kills/Damage Dealt Ratio"].round().astype(np.int64)
+    return master[MASTER_COLUMNS].sort_values(["match_date", "match_id", "round_num"], kind="stable").reset_index(drop=True)
+
+
+def scaled_season(scale=1, seed=0, **kwargs):
+    """`synthetic_season` at `scale` x the default size: matches grow with the
+    scale and the number of teams with its square root (longer histories of a
+    growing field, not just more games between the same teams)."""
+    kwargs.setdefault("teams", 12 * math.ceil(math.sqrt(scale)))
+    kwargs.setdefault("matches", 86 * scale)
+    return synthetic_season(seed=seed, **kwargs)
+
+
+def room_id(match_id):
+    """A FaceIT-style room id (1-<guid>) for an OWCS match id, the same on every run."""
+    return f"1-{uuid.uuid5(uuid.NAMESPACE_URL, str(match_id))}"
+
+
+def room_labels(master):
+    """The room_labels.csv rows of the master's matches: room id -> OWCS match
+    id, with region, stage and phase left for room_labels.py to parse."""
+    ids = pd.Index(master["match_id"].unique())
+    return pd.DataFrame({"room_id": ids.map(room_id), "match_id": ids}).reindex(
+        columns=["room_id", "match_id"] + LABEL_COLUMNS)
+
+
+def scraped_rows(master):
+    """The master rows as the scraper writes them: keyed by FaceIT room id,
+    with player ids and data_quality, no region, stage, phase or map_type
+    (the clean stage adds them)."""
+    ids = pd.Index(master["match_id"].unique())
+    out = master.assign(match_id=master["match_id"].map(dict(zip(ids, ids.map(room_id)))),
+                        player_id="synthetic-" + master["player"], nickname=master["player"], data_quality="full")
+    return out[[c for c in ID_COLUMNS + PLAYER_STAT_COLUMNS if c in out.columns]]
+
+
+def rooms(master):
+    """(room id, /matches document, /matches/{id}/stats document) per match,
+    shaped like the FaceIT Data API responses the scraper parses."""
+    stats_cols = [c for c in PLAYER_STAT_COLUMNS if c in master.columns]
+    for mid, match in master.groupby("match_id", sort=False):
+        maps = match.drop_duplicates("round_num")
+        guid = {name: f"map-{i}" for i, name in enumerate(MAP_POOL)}
+        hero = {name: f"hero-{i}" for i, name in enumerate(HEROES)}
+        teams = list(dict.fromkeys(match["team"]))
+        match_doc = {
+            "match_id": room_id(mid),
+            "status": "FINISHED",
+            "started_at": int(pd.Timestamp(match["match_date"].iloc[0]).timestamp()),
+            "teams": [{"team_id": t, "name": t} for t in teams],
+            "voting": {
+                "map": {"entities": [{"guid": g, "name": n} for n, g in guid.items()],
+                        "pick": [guid[n] for n in maps["map_name"]]},
+                "heroes": {"entities": [{"guid": g, "name": n} for n, g in hero.items()],
+                           "pick": [[hero[h] for h in dict.fromkeys(g["hero_bans"])]
+                                    for _, g in match.groupby("round_num", sort=True)]},
+            },
+        }
+        rounds = []
+        for (r, map_name), played in match.groupby(["round_num", "map_name"], sort=True):
+            sides = []
+            for t, rows in played.groupby("team", sort=False):
+                sides.append({
+                    "team_id": t,
+                    "team_stats": {"Team": t, "Team Win": str(int(rows["Result"].iloc[0]))},
+                    "players": [{"player_id": f"synthetic-{p}", "nickname": p,
+                                 "player_stats": {k: str(v) for k, v in s.items()}}
+                                for p, s in zip(rows["player"], rows[stats_cols].to_dict("records"))],
+                })
+            rounds.append({"round_stats": {"Map": guid[map_name]}, "teams": sides})
+        yield room_id(mid), match_doc, {"rounds": rounds}
+
+
+def write_rooms(master, cache_dir):
+    """Store the synthetic API responses in a ResponseCache (for the scraper's
+    --offline replay) and return the room ids in order."""
+    cache = ResponseCache(cache_dir)
+    ids = []
+    for mid, match_doc, stats_doc in rooms(master):
+        cache.put("matches", mid, json.dumps(match_doc).encode("utf-8"))
+        cache.put("stats", mid, json.dumps(stats_doc).encode("utf-8"))
+        ids.append(mid)
+    return ids
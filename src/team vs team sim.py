@@ -1,171 +1,175 @@
+import argparse
+import os
 import pandas as pd
 import numpy as np
+from itertools import combinations
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report, accuracy_score
+from storage import DATA_DIR, load_table
+from elo import EloEngine
+from features import FormFeatures
+from team_index import TeamIndex
+from matchups import predict_matchups
+from tournament import MatchupTable, Tournament, snake_groups
+from model_registry import ModelRegistry
+from bans import BAN_FILE, BanMatrix
+from pairing import Pairing
+from h2h import FEATURES as H2H_FEATURES, NEUTRAL as H2H_NEUTRAL, HeadToHead
+from instrument import Span, script
+from backtest import Folds, backtest, candidate_grid, check_point_in_time, elo_backtest, summarize
+
+parser = argparse.ArgumentParser(description="Team vs team simulation")
+parser.add_argument("--backtest", action="store_true", help="walk-forward backtest of candidate models over stage/phase windows")
+parser.add_argument("--jobs", type=int, default=-1, help="parallel workers for the backtest (-1 = all cores)")
+args = parser.parse_args()
+script("sim")
 
 #1: Load Data
-team_map = pd.read_csv("team_map.csv")
-print(f"Loaded TEAM × MAP: {team_map.shape}")
-
-team_map["Result"] = team_map["Result"].apply(lambda x: 1 if x == 1 else 0)
-team_map = team_map.sort_values(["team", "match_id", "round_num"])
-
-team_map["match_id"] = pd.to_numeric(team_map["match_id"], errors="coerce").fillna(0).astype(int)
-
-if "match_date" in team_map.columns:
-    team_map["match_date"] = pd.to_datetime(team_map["match_date"], errors="coerce")
-    team_map["days"] = (team_map["match_date"] - team_map["match_date"].min()).dt.days.fillna(0).astype(int)
-else:
-    team_map["days"] = team_map["match_id"] - team_map["match_id"].min()
+with Span("load") as span:
+    team_map = load_table("team_map", columns=[
+        "region", "stage", "phase", "match_id", "match_date", "round_num", "seq", "map_type", "team", "hero_bans", "Result",
+        "Eliminations", "Assists", "Final Blows", "Deaths",
+        "Damage Dealt", "Damage Mitigated", "Healing Done", "Objective Time",
+    ], categories=False)
+    print(f"Loaded TEAM × MAP: {team_map.shape}")
+    span.set(rows_out=len(team_map))
 
 #2: Feature Engineering
-team_map["rolling_wr"] = (
-    team_map.groupby("team")["Result"]
-    .transform(lambda x: x.shift().rolling(3, min_periods=1).mean())
-)
-team_map["team_past_wr"] = (
-    team_map.groupby("team")["Result"]
-    .transform(lambda x: x.shift().expanding().mean())
-)
-
-opp_wr = (
-    team_map.groupby(["match_id", "round_num", "team"])["team_past_wr"].mean().reset_index()
-)
-opp_wr = opp_wr.rename(columns={"team": "opp_team", "team_past_wr": "opp_wr"})
-team_map = team_map.merge(opp_wr, on=["match_id", "round_num"])
-team_map = team_map[team_map["team"] != team_map["opp_team"]]
-
-if "hero_bans" in team_map.columns:
-    team_map["ban_count"] = team_map["hero_bans"].fillna("").apply(
-        lambda x: len(x.split(",")) if isinstance(x, str) and x else 0
-    )
-else:
-    team_map["ban_count"] = 0
-
-team_map["kd_ratio"] = team_map["Eliminations"] / team_map["Deaths"].replace(0, 1)
-team_map["dmg_eff"] = team_map["Damage Dealt"] / (team_map["Damage Mitigated"] + 1)
-team_map["heal_eff"] = team_map["Healing Done"] / team_map["Deaths"].replace(0, 1)
-
-team_map["schedule_strength"] = team_map.groupby("team")["opp_wr"].transform("mean")
+#every feature that reads results is built from earlier maps only (FormFeatures shifts by seq, h2h counts earlier
+#matches), so the walk-forward backtest can rebuild them from perturbed results and check that (see backtest.py)
+stat_cols = ["Eliminations","Assists","Final Blows","Deaths",
+             "Damage Dealt","Damage Mitigated","Healing Done","Objective Time"]
+ratio_cols = ["kd_ratio","dmg_eff","heal_eff"]
+outcome_cols = ["Result"] + stat_cols
+
+def pre_match_features(rows):
+    """Feature columns of `rows` (seq-sorted team-map rows, index kept); maps with a single team row are dropped."""
+    #each map's two team rows point at each other (positional, so built before any filtering)
+    pairs = Pairing(rows)
+    rows = rows.copy()
+    #win rate over the team's previous 3 maps and all previous maps (current map excluded)
+    form = FormFeatures("Result", by="team", order="seq", windows=(3,), expanding=True).transform(rows)
+    rows["rolling_wr"] = form["Result_roll3"]
+    rows["team_past_wr"] = form["Result_exp"]
+
+    #opponent columns read through the pairing index
+    rows["opp_team"] = pairs.values(rows["team"], fill=None)
+    rows["opp_wr"] = pairs.values(rows["team_past_wr"])
+    rows = rows[pairs.has_opponent].copy()
+
+    #head-to-head record of each row's team against this opponent before the match (see h2h.HeadToHead)
+    rows[H2H_FEATURES] = HeadToHead().features(rows)
+    rows[["ban_count", "opp_ban_count"]] = ban_matrix.features(rows)[["ban_count", "opp_ban_count"]].to_numpy()
+
+    rows["kd_ratio"] = rows["Eliminations"] / rows["Deaths"].replace(0, 1)
+    rows["dmg_eff"] = rows["Damage Dealt"] / (rows["Damage Mitigated"] + 1)
+    rows["heal_eff"] = rows["Healing Done"] / rows["Deaths"].replace(0, 1)
+
+    #mean past win rate of the opponents faced so far
+    rows["schedule_strength"] = FormFeatures("opp_wr", by="team", order="seq", windows=(), expanding=True).transform(rows)["opp_wr_exp"]
+
+    rows = pd.get_dummies(rows, columns=["map_type"], prefix="map_type")
+    for col in ["rolling_wr", "team_past_wr", "opp_wr", "schedule_strength"]:
+        rows[col] = rows[col].fillna(0.5)
+    return rows.fillna(H2H_NEUTRAL)
+
+def backtest_features(rows):
+    """pre_match_features with each map's own stats (stat_cols, ratio_cols) replaced by the team's mean over its
+    previous 5 maps: what the last-5 profile gives the model before a match, not the result of the map it scores."""
+    rows = pre_match_features(rows)
+    form = FormFeatures(stat_cols + ratio_cols, by="team", order="seq", windows=(5,), expanding=False).transform(rows)
+    for col in stat_cols + ratio_cols:
+        rows[col] = form[f"{col}_roll5"]
+    return rows
+
+with Span("features", rows_in=len(team_map)) as span:
+    team_map["Result"] = team_map["Result"].apply(lambda x: 1 if x == 1 else 0)
+    #chronological order once: seq is the global (date, bracket position, round) key from aggregations.py
+    #(see match_keys.sequence_index); rolling form, Elo, the team index and the split all follow it
+    team_map = team_map.sort_values(["seq", "team"], kind="stable").reset_index(drop=True)
+
+    if "match_date" in team_map.columns:
+        team_map["match_date"] = pd.to_datetime(team_map["match_date"], errors="coerce")
+        team_map["days"] = (team_map["match_date"] - team_map["match_date"].min()).dt.days.fillna(0).astype(int)
+    else:
+        team_map["days"] = team_map["seq"] - team_map["seq"].min()
 
-team_map = pd.get_dummies(team_map, columns=["map_type"], prefix="map_type")
+    #own and opponent ban counts from the ban matrix aggregations.py saved (hero_bans.npz), matched on map and team,
+    #so no ban string is parsed here; without the file the matrix is built once from the hero_bans column
+    if os.path.exists(os.path.join(DATA_DIR, BAN_FILE)):
+        ban_matrix = BanMatrix.load()
+    else:
+        ban_matrix = BanMatrix.from_frame(team_map)
 
-for col in ["rolling_wr", "team_past_wr", "opp_wr", "schedule_strength"]:
-    team_map[col] = team_map[col].fillna(0.5)
+    raw = team_map
+    team_map = pre_match_features(raw).reset_index(drop=True)
+    #the head-to-head store takes every match, so simulated pairs are scored on their full record
+    h2h = HeadToHead()
+    h2h.update(team_map)
 
-#3: Features
-feature_cols = [
-    "Eliminations","Assists","Final Blows","Deaths",
-    "Damage Dealt","Damage Mitigated","Healing Done","Objective Time",
-    "rolling_wr","team_past_wr","opp_wr","ban_count",
-    "kd_ratio","dmg_eff","heal_eff","schedule_strength"
-] + [c for c in team_map.columns if c.startswith("map_type_")]
+    #3: Features
+    feature_cols = stat_cols + [
+        "rolling_wr","team_past_wr","opp_wr","ban_count","opp_ban_count",
+    ] + ratio_cols + ["schedule_strength"] + H2H_FEATURES + [c for c in team_map.columns if c.startswith("map_type_")]
 
-X = team_map[feature_cols].fillna(0)
-y = team_map["Result"]
-print("Using features:", feature_cols)
+    X = team_map[feature_cols].fillna(0)
+    y = team_map["Result"]
+    print("Using features:", feature_cols)
+    span.set(rows_out=len(team_map), features=len(feature_cols))
 
 #4: Train/Test Split
 if "stage" in team_map.columns:
     train_data = team_map[team_map["stage"].isin(["S1", "S2"])]
     test_data = team_map[team_map["stage"] == "S3"]
 else:
-    cutoff = int(team_map["match_id"].quantile(0.7))
-    train_data = team_map[team_map["match_id"] <= cutoff]
-    test_data = team_map[team_map["match_id"] > cutoff]
+    cutoff = int(team_map["seq"].quantile(0.7))
+    train_data = team_map[team_map["seq"] <= cutoff]
+    test_data = team_map[team_map["seq"] > cutoff]
 
 X_train, y_train = train_data[feature_cols], train_data["Result"]
 X_test, y_test = test_data[feature_cols], test_data["Result"]
 
 print("Train shape:", X_train.shape, "Test shape:", X_test.shape)
 
-#5: Models
-logreg = Pipeline([
-    ("scaler", StandardScaler()),
-    ("clf", CalibratedClassifierCV(
-        estimator=LogisticRegression(max_iter=2000, solver="lbfgs"),
+#5: Models (reloaded from the model registry when data, features and settings are unchanged)
+with Span("train", rows_in=len(X_train)) as span:
+    registry = ModelRegistry()
+    logreg = Pipeline([
+        ("scaler", StandardScaler()),
+        ("clf", CalibratedClassifierCV(
+            estimator=LogisticRegression(max_iter=2000, solver="lbfgs"),
+            cv=5
+        ))
+    ])
+    logreg = registry.fit_or_load("sim_logreg", logreg, X_train, y_train)
+
+    print("\nLogistic Regression Results:")
+    print("Accuracy:", accuracy_score(y_test, logreg.predict(X_test)))
+    print(classification_report(y_test, logreg.predict(X_test)))
+
+    rf = CalibratedClassifierCV(
+        estimator=RandomForestClassifier(
+            n_estimators=300, max_depth=6, random_state=42, class_weight="balanced"),
         cv=5
-    ))
-])
-logreg.fit(X_train, y_train)
-
-print("\nLogistic Regression Results:")
-print("Accuracy:", accuracy_score(y_test, logreg.predict(X_test)))
-print(classification_report(y_test, logreg.predict(X_test)))
-
-rf = CalibratedClassifierCV(
-    estimator=RandomForestClassifier(
-        n_estimators=300, max_depth=6, random_state=42, class_weight="balanced"),
-    cv=5
-)
-rf.fit(X_train, y_train)
-
-print("\nRandom Forest Results:")
-print("Accuracy:", accuracy_score(y_test, rf.predict(X_test)))
-print(classification_report(y_test, rf.predict(X_test)))
-
-#6: Elo Rating System (date-aware, playoff boost, dynamic K, clean dicts)
-def initialize_elo(team_map, base_rating=1500, k=32, half_life_days=60):
-    elo, elo_map = {}, {}
-    games_played = {}
-    max_days = team_map["days"].max()
-
-    for _, row in team_map.iterrows():
-        t, o, res, d = row["team"], row["opp_team"], row["Result"], row["days"]
-
-        # detect map type
-        map_type = [c.replace("map_type_", "") for c in row.index if c.startswith("map_type_") and row[c] == 1]
-        map_type = map_type[0] if map_type else "General"
-
-        for team in [t, o]:
-            if team not in elo:
-                elo[team] = base_rating
-                games_played[team] = 0
-            if team not in elo_map:
-                elo_map[team] = {}
-            if map_type not in elo_map[team]:
-                elo_map[team][map_type] = base_rating
-
-        # recency weighting
-        age_days = max_days - d
-        decay = 0.5 ** (age_days / half_life_days)
-
-        # playoff weighting
-        phase_text = str(row.get("phase", "")).lower()
-        phase_boost = 2.5 if ("playoff" in phase_text or "final" in phase_text) else 1.0
-
-        # dynamic K-factor
-        games_played[t] += 1
-        games_played[o] += 1
-        k_dynamic = k / np.sqrt(games_played[t])
-        if phase_boost > 1:
-            k_dynamic *= 2
-
-        # global Elo update
-        exp_t = 1 / (1 + 10 ** ((elo[o] - elo[t]) / 400))
-        elo[t] += k_dynamic * decay * phase_boost * (res - exp_t)
-        elo[o] += k_dynamic * decay * phase_boost * ((1 - res) - (1 - exp_t))
-
-        # map-specific Elo update
-        exp_t_map = 1 / (1 + 10 ** ((elo_map[o][map_type] - elo_map[t][map_type]) / 400))
-        elo_map[t][map_type] += k_dynamic * decay * phase_boost * (res - exp_t_map)
-        elo_map[o][map_type] += k_dynamic * decay * phase_boost * ((1 - res) - (1 - exp_t_map))
-
-    return elo, elo_map, games_played
-
-elo_ratings, elo_map_ratings, games_played = initialize_elo(train_data)
+    )
+    rf = registry.fit_or_load("sim_rf", rf, X_train, y_train)
+
+    print("\nRandom Forest Results:")
+    print("Accuracy:", accuracy_score(y_test, rf.predict(X_test)))
+    print(classification_report(y_test, rf.predict(X_test)))
+    span.set(rows_out=len(X_test))
+
+#6: Elo Rating System (date-aware, playoff boost, dynamic K, per map type; see elo.EloEngine)
+with Span("elo", rows_in=len(train_data)):
+    elo_engine = EloEngine(base_rating=1500, k=32, half_life_days=60).fit(train_data)
+elo_ratings = elo_engine.ratings_dict()
 
 def elo_probability(team1, team2, map_type=None):
-    if map_type and team1 in elo_map_ratings and map_type in elo_map_ratings[team1]:
-        r1 = elo_map_ratings[team1][map_type]
-        r2 = elo_map_ratings.get(team2, {}).get(map_type, 1500)
-    else:
-        r1, r2 = elo_ratings.get(team1, 1500), elo_ratings.get(team2, 1500)
-    return 1 / (1 + 10 ** ((r2 - r1) / 400))
+    return elo_engine.probability(team1, team2, map_type)
 
 print("\nCurrent Elo Ratings (global top 15):")
 for team, rating in sorted(elo_ratings.items(), key=lambda x: -x[1])[:15]:
@@ -173,53 +177,83 @@ for team, rating in sorted(elo_ratings.items(), key=lambda x: -x[1])[:15]:
 
 
 #7: Simulation
+#every team's rows in seq order once, with last-5 feature means precomputed
+with Span("team index", rows_in=len(team_map)):
+    team_index = TeamIndex(team_map, feature_cols, date="seq", last_n=5)
+    #serving bundle for predict_service.py: Elo state, each team's last-5 profile and the H2H store next to the forest
+    registry.attach("sim_rf", elo=elo_engine, profiles=team_index.profile_frame(sorted(team_index.slices)), h2h=h2h)
+
+map_types = [c.replace("map_type_","") for c in feature_cols if c.startswith("map_type_")]
+
+def simulate_matches(pairs, model=rf, last_n=5):
+    # one predict_proba call for every pair side x map type variant, Elo blended vectorized
+    results = predict_matchups(pairs, model, team_index, map_types, elo=elo_engine, last_n=last_n, h2h=h2h)
+    for _, rows in results.groupby("pair", sort=False):
+        team1, team2 = rows["team1"].iloc[0], rows["team2"].iloc[0]
+        overall = rows.iloc[0]
+        print(f"\n⚔️ {team1} vs {team2}")
+        print(f"➡️ {team1} win probability: {overall['team1_proba']:.2f}")
+        print(f"➡️ {team2} win probability: {overall['team2_proba']:.2f}")
+
+        print("\n📊 Per Map Type Predictions (map-specific Elo):")
+        for _, r in rows.iloc[1:].iterrows():
+            print(f"   {r['map_type']}: {team1} {r['team1_proba']:.2f} | {team2} {r['team2_proba']:.2f} -> Favored: {r['predicted_winner']}")
+    return results
+
 def simulate_match(team1, team2, model=rf, last_n=5):
-    def team_profile(team):
-        df = team_map[team_map["team"] == team].sort_values("match_date", ascending=False)
-        if len(df) > last_n: df = df.head(last_n)
-        return df[feature_cols].mean()
-
-    t1_stats, t2_stats = team_profile(team1), team_profile(team2)
-    t1_df, t2_df = pd.DataFrame([t1_stats]), pd.DataFrame([t2_stats])
-
-    # ML prediction
-    p1_ml, p2_ml = model.predict_proba(t1_df)[0][1], model.predict_proba(t2_df)[0][1]
-    # Elo prediction
-    p1_elo = elo_probability(team1, team2)
-    p2_elo = 1 - p1_elo
-
-    # Blend weight by team strength
-    avg_rating = (elo_ratings.get(team1,1500) + elo_ratings.get(team2,1500)) / 2
-    blend = 0.7 if avg_rating > 1550 else 0.5 if avg_rating > 1450 else 0.3
-
-    p1 = blend*p1_ml + (1-blend)*p1_elo
-    p2 = blend*p2_ml + (1-blend)*p2_elo
-    total = p1+p2
-    p1, p2 = p1/total, p2/total
-
-    print(f"\n⚔️ {team1} vs {team2}")
-    print(f"➡️ {team1} win probability: {p1:.2f}")
-    print(f"➡️ {team2} win probability: {p2:.2f}")
-
-    print("\n📊 Per Map Type Predictions (map-specific Elo):")
-    for mt in [c.replace("map_type_","") for c in feature_cols if c.startswith("map_type_")]:
-        pm1_elo = elo_probability(team1, team2, map_type=mt)
-        pm2_elo = 1 - pm1_elo
-        pm1_ml = model.predict_proba(t1_df.assign(**{f"map_type_{mt}":1}))[0][1]
-        pm2_ml = model.predict_proba(t2_df.assign(**{f"map_type_{mt}":1}))[0][1]
-        pm1 = blend*pm1_ml + (1-blend)*pm1_elo
-        pm2 = blend*pm2_ml + (1-blend)*pm2_elo
-        total = pm1+pm2
-        pm1, pm2 = pm1/total, pm2/total
-        favored = team1 if pm1 > pm2 else team2
-        print(f"   {mt}: {team1} {pm1:.2f} | {team2} {pm2:.2f} -> Favored: {favored}")
+    return simulate_matches([(team1, team2)], model, last_n)
 
 #8: Example Sims
-simulate_match("Twisted Minds", "Al qadsiah")
-simulate_match("NTMR", "Geekay Esports")
-simulate_match("Team Liquid", "NTMR")
-simulate_match("Geekay Esports", "Team Liquid")
-simulate_match("Twisted Minds", "Virtuspro")
-simulate_match("Twisted Minds", "Quick Esports")
-simulate_match("Al qadsiah", "Virtuspro")
-simulate_match("Al qadsiah", "Quick Esports")
+with Span("simulate"):
+    simulate_matches([
+        ("Twisted Minds", "Al qadsiah"),
+        ("NTMR", "Geekay Esports"),
+        ("Team Liquid", "NTMR"),
+        ("Geekay Esports", "Team Liquid"),
+        ("Twisted Minds", "Virtuspro"),
+        ("Twisted Minds", "Quick Esports"),
+        ("Al qadsiah", "Virtuspro"),
+        ("Al qadsiah", "Quick Esports"),
+    ])
+
+#9: Tournament Odds (top 8 Elo teams of each region's latest stage: two groups, then double elimination)
+latest_stage = team_map["stage"].max()
+with Span("tournament"):
+    for region, teams in team_map[team_map["stage"] == latest_stage].groupby("region")["team"]:
+        field = sorted(teams.unique(), key=lambda t: -elo_engine.rating(t))[:8]
+        if len(field) < 8:
+            continue
+        grid = predict_matchups(list(combinations(field, 2)), rf, team_index, map_types, elo=elo_engine, h2h=h2h)
+        tournament = Tournament(groups=snake_groups(field), advance=2, group_best_of=3, playoff_best_of=5)
+        odds = tournament.simulate(MatchupTable.from_matchups(grid), n_sims=100_000, seed=0)
+        print(f"\n🏆 {region} {latest_stage} tournament odds (100k runs):")
+        print(odds.to_string(index=False, float_format="{:.3f}".format))
+
+
+#10: Walk-forward Backtest (python "team vs team sim.py" --backtest): every stage/phase window is
+#scored by models trained on all earlier windows, on features known before each map (backtest_features);
+#folds and scores are cached in backtest_cache/
+if args.backtest:
+    with Span("backtest", rows_in=len(team_map)) as span:
+        backtest_map = backtest_features(raw).reset_index(drop=True).reindex(columns=team_map.columns, fill_value=0)
+        folds = Folds(backtest_map, feature_cols, date="seq")
+        check_point_in_time(raw, folds, lambda rows: backtest_features(rows).reindex(columns=feature_cols, fill_value=0),
+                            outcome_cols)
+        configs = [("sim logreg (calibrated)", logreg), ("sim rf (calibrated)", rf)]
+        configs += candidate_grid("rf", RandomForestClassifier(random_state=42, class_weight="balanced", n_jobs=1), {
+            "n_estimators": [300, 610],
+            "max_depth": [6, 12, None],
+            "min_samples_split": [2, 98],
+        })
+        configs += candidate_grid("logreg", Pipeline([
+            ("scaler", StandardScaler()),
+            ("clf", LogisticRegression(max_iter=2000, solver="lbfgs")),
+        ]), {"clf__C": [0.01, 0.1, 1.0, 10.0]})
+        results = backtest(folds, configs, n_jobs=args.jobs)
+        #Elo is not refit per fold: one engine is updated window by window after scoring it
+        elo_results = elo_backtest(backtest_map, folds, EloEngine(base_rating=1500, k=32, half_life_days=60))
+        results = pd.concat([results, elo_results], ignore_index=True)
+        print(f"\n🧪 Walk-forward backtest ({' -> '.join(folds.labels)}), log-loss per test window:")
+        print(results.pivot(index="config", columns="window", values="log_loss")[folds.labels[1:]].round(3).to_string())
+        print(summarize(results).to_string(index=False, float_format="{:.3f}".format))
+        span.set(rows_out=len(results))
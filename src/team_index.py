@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+
+class TeamIndex:
+    """Date-sorted rows of every team (or region x team), stored contiguously.
+
+    The frame is sorted once by (region, team, date) and each key maps to a
+    [start, end) slice, so looking a team up is a dict access instead of a
+    boolean mask over the whole frame plus a sort. Last-`last_n` means of
+    `columns` are computed for every slice at once from cumulative sums and the
+    latest row of each slice is kept as a vector; other `last_n` values are
+    computed on first use and cached.
+
+    `date` is a datetime column or an integer order key such as `seq`
+    (match_keys.sequence_index). With `region` set, `region=None` lookups
+    combine a team's rows from every region (latest by date). `extend` adds newly landed rows and rebuilds,
+    which drops every cached result.
+    """
+
+    def __init__(self, frame, columns, team="team", region=None, date="match_date", last_n=5):
+        self.columns = list(columns)
+        self.team, self.region, self.date = team, region, date
+        self.last_n = last_n
+        self.version = 0
+        self.build(frame)
+
+    def build(self, frame):
+        keys = ([self.region] if self.region else []) + [self.team]
+        # NaN dates sort first, i.e. count as the oldest rows
+        rows = frame.sort_values(keys + [self.date], kind="stable", na_position="first")
+        rows = rows.dropna(subset=keys).reset_index(drop=True)
+        self.rows = rows
+        self.values = rows[self.columns].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(self.values)
+        zero = np.zeros((1, len(self.columns)))
+        self._sum = np.vstack([zero, np.cumsum(np.where(valid, self.values, 0.0), axis=0)])
+        self._cnt = np.vstack([zero, np.cumsum(valid, axis=0)])
+        when = rows[self.date]
+        if pd.api.types.is_integer_dtype(when):
+            self._days = when.to_numpy(dtype=np.int64)
+        else:
+            self._days = when.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+        n = len(rows)
+        codes = [pd.factorize(rows[k])[0] for k in keys]
+        change = np.zeros(n, dtype=bool)
+        if n:
+            change[0] = True
+        for c in codes:
+            change[1:] |= c[1:] != c[:-1]
+        self.starts = np.flatnonzero(change)
+        self.ends = np.r_[self.starts[1:], n].astype(np.int64)
+        labels = rows[keys].iloc[self.starts]
+        index = list(labels.itertuples(index=False, name=None)) if self.region else list(labels[self.team])
+        self.slices = {key: i for i, key in enumerate(index)}
+        self.teams = {}
+        for i, key in enumerate(index):
+            self.teams.setdefault(key[1] if self.region else key, []).append(i)
+        self._profiles = {self.last_n: self._means(self.last_n)}
+        self._merged = {}
+        self.version += 1
+        return self
+
+    def extend(self, new_rows):
+        """Add rows that landed after the index was built; invalidates caches."""
+        return self.build(pd.concat([self.rows, new_rows], ignore_index=True))
+
+    def _means(self, last_n):
+        lo = np.maximum(self.ends - last_n, self.starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (self._sum[self.ends] - self._sum[lo]) / (self._cnt[self.ends] - self._cnt[lo])
+
+    def _positions(self, team, region):
+        """Row positions of a key, oldest first, or None if it has no rows."""
+        if self.region and region is not None:
+            i = self.slices.get((region, team))
+            return None if i is None else np.arange(self.starts[i], self.ends[i])
+        if not self.region:
+            i = self.slices.get(team)
+            return None if i is None else np.arange(self.starts[i], self.ends[i])
+        if team not in self._merged:
+            parts = self.teams.get(team)
+            if parts is None:
+                self._merged[team] = None
+            else:
+                pos = np.concatenate([np.arange(self.starts[i], self.ends[i]) for i in parts])
+                self._merged[team] = pos[np.argsort(self._days[pos], kind="stable")]
+        return self._merged[team]
+
+    def has(self, team, region=None):
+        return self._positions(team, region) is not None
+
+    def history(self, team, region=None):
+        """All rows of a team, oldest first (empty frame if unknown)."""
+        pos = self._positions(team, region)
+        return self.rows.iloc[[] if pos is None else pos]
+
+    def latest(self, team, region=None):
+        """Feature vector of the team's most recent row, or None."""
+        pos = self._positions(team, region)
+        if pos is None:
+            return None
+        return pd.Series(self.values[pos[-1]], index=self.columns, name=team)
+
+    def latest_frame(self, teams, region=None):
+        """`latest` for many teams, one row per team (NaN for unknown teams)."""
+        rows = [self.latest(t, region) for t in teams]
+        values = [np.full(len(self.columns), np.nan) if r is None else r.to_numpy() for r in rows]
+        return pd.DataFrame(np.array(values, dtype=np.float64).reshape(len(teams), len(self.columns)),
+                            index=list(teams), columns=self.columns)
+
+    def profile_frame(self, teams, region=None, last_n=None):
+        """`profile` for many teams, one row per team."""
+        values = [self.profile(t, region, last_n).to_numpy() for t in teams]
+        return pd.DataFrame(np.array(values, dtype=np.float64).reshape(len(teams), len(self.columns)),
+                            index=list(teams), columns=self.columns)
+
+    def profile(self, team, region=None, last_n=None):
+        """Mean of `columns` over the team's last `last_n` rows (NaN if unknown)."""
+        last_n = self.last_n if last_n is None else last_n
+        direct = self.slices.get((region, team) if self.region else team)
+        if direct is not None and (region is not None or not self.region):
+            if last_n not in self._profiles:
+                self._profiles[last_n] = self._means(last_n)
+            values = self._profiles[last_n][direct]
+        else:
+            pos = self._positions(team, region)
+            if pos is None:
+                values = np.full(len(self.columns), np.nan)
+            else:
+                values = np.nanmean(self.values[pos[-last_n:]], axis=0)
+        return pd.Series(values, index=self.columns, name=team)
@@ -0,0 +1,249 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from matchups import OVERALL
+
+
+class MatchupTable:
+    """Map win probabilities for every ordered pair of teams.
+
+    `probs[m, i, j]` is the chance that `teams[i]` beats `teams[j]` on map type
+    `map_types[m]`; index 0 is the overall (any map) probability.
+    """
+
+    def __init__(self, teams, map_types, probs):
+        self.teams = list(teams)
+        self.map_types = list(map_types)
+        self.probs = np.asarray(probs, dtype=np.float64)
+        self.team_index = {t: i for i, t in enumerate(self.teams)}
+
+    @classmethod
+    def from_matchups(cls, results):
+        """Build from `predict_matchups` output (one direction per pair is enough)."""
+        teams = sorted(set(results["team1"]) | set(results["team2"]))
+        map_types = [OVERALL] + [m for m in dict.fromkeys(results["map_type"]) if m != OVERALL]
+        index = {t: i for i, t in enumerate(teams)}
+        probs = np.full((len(map_types), len(teams), len(teams)), 0.5)
+        m = results["map_type"].map({mt: k for k, mt in enumerate(map_types)}).to_numpy()
+        i = results["team1"].map(index).to_numpy()
+        j = results["team2"].map(index).to_numpy()
+        p = results["team1_proba"].to_numpy(dtype=np.float64)
+        ok = ~np.isnan(p)
+        probs[m[ok], i[ok], j[ok]] = p[ok]
+        probs[m[ok], j[ok], i[ok]] = 1 - p[ok]
+        return cls(teams, map_types, probs)
+
+    @classmethod
+    def from_elo(cls, engine, teams, map_types=()):
+        teams, map_types = list(teams), list(map_types)
+        a = np.repeat(np.array(teams, dtype=object), len(teams))
+        b = np.tile(np.array(teams, dtype=object), len(teams))
+        probs = [engine.probabilities(a, b, mt).reshape(len(teams), len(teams)) for mt in [None] + map_types]
+        return cls(teams, [OVERALL] + map_types, probs)
+
+
+def bracket_order(n):
+    """Standard seeding order (1 vs n, 2 vs n-1 kept apart until late rounds)."""
+    order = [0]
+    while len(order) < n:
+        size = len(order) * 2
+        order = [s for seed in order for s in (seed, size - 1 - seed)]
+    return order
+
+
+def single_elimination(n):
+    """Matches as (name, side_a, side_b); sides are ("seed", k), ("W", name) or ("L", name)."""
+    order = bracket_order(n)
+    matches = []
+    prev = [("seed", s) for s in order]
+    r = 1
+    while len(prev) > 1:
+        names = [f"R{r}M{i + 1}" for i in range(len(prev) // 2)]
+        matches += [(name, prev[2 * i], prev[2 * i + 1]) for i, name in enumerate(names)]
+        prev = [("W", name) for name in names]
+        r += 1
+    matches[-1] = ("GF",) + matches[-1][1:]
+    return matches
+
+
+def double_elimination(n, reset=False):
+    """Upper and lower bracket for a power-of-two field, then a grand final
+    (replayed once if the lower-bracket team wins it and `reset` is set)."""
+    order = bracket_order(n)
+    matches, upper = [], []
+    prev = [("seed", s) for s in order]
+    r = 1
+    while len(prev) > 1:
+        names = [f"UB{r}M{i + 1}" for i in range(len(prev) // 2)]
+        matches += [(name, prev[2 * i], prev[2 * i + 1]) for i, name in enumerate(names)]
+        upper.append(names)
+        prev = [("W", name) for name in names]
+        r += 1
+
+    names = [f"LB1M{i + 1}" for i in range(len(upper[0]) // 2)]
+    matches += [(name, ("L", upper[0][2 * i]), ("L", upper[0][2 * i + 1])) for i, name in enumerate(names)]
+    lower, r = [("W", name) for name in names], 2
+    for ub_round in upper[1:]:
+        # upper-bracket losers drop in, in reverse order to delay rematches
+        names = [f"LB{r}M{i + 1}" for i in range(len(ub_round))]
+        dropped = [("L", name) for name in reversed(ub_round)]
+        matches += [(name, lower[i], dropped[i]) for i, name in enumerate(names)]
+        lower, r = [("W", name) for name in names], r + 1
+        if len(lower) > 1:
+            names = [f"LB{r}M{i + 1}" for i in range(len(lower) // 2)]
+            matches += [(name, lower[2 * i], lower[2 * i + 1]) for i, name in enumerate(names)]
+            lower, r = [("W", name) for name in names], r + 1
+    matches.append(("GF", ("W", upper[-1][0]), lower[0]))
+    if reset:
+        matches.append(("GF2", ("W", "GF"), ("L", "GF")))
+    return matches
+
+
+class Tournament:
+    """Group stage (round robin) feeding a single- or double-elimination bracket.
+
+    `groups` maps a group name to its teams; the top `advance` of each group
+    are placed into the bracket following `seeding`, a list of (group, place)
+    in seed order (place 1 = group winner). Without groups, `seeding` is the
+    list of bracket teams in seed order. Series are best-of-N; map k of a
+    series is played on `map_order[k % len]` ("rotation") or on a map type
+    drawn uniformly from the pool ("random"); without map types every map
+    uses the overall probability.
+    """
+
+    def __init__(self, groups=None, seeding=None, advance=2, playoffs="double",
+                 group_best_of=3, playoff_best_of=5, final_best_of=None,
+                 map_order=None, map_pick="rotation", reset=False):
+        if map_pick not in ("rotation", "random"):
+            raise ValueError(f"map_pick must be 'rotation' or 'random', got {map_pick!r}")
+        self.groups = {g: list(teams) for g, teams in (groups or {}).items()}
+        self.advance = advance
+        if seeding is None:
+            if not self.groups:
+                raise ValueError("Need groups or a seeding list")
+            seeding = [(g, place) for place in range(1, advance + 1) for g in self.groups]
+        self.seeding = list(seeding)
+        n = len(self.seeding)
+        if n & (n - 1):
+            raise ValueError(f"Bracket size must be a power of two, got {n}")
+        self.bracket = double_elimination(n, reset) if playoffs == "double" else single_elimination(n)
+        self.group_best_of = group_best_of
+        self.playoff_best_of = playoff_best_of
+        self.final_best_of = final_best_of or playoff_best_of
+        self.map_order = list(map_order) if map_order else None
+        self.map_pick = map_pick
+
+    @property
+    def teams(self):
+        if self.groups:
+            return [t for teams in self.groups.values() for t in teams]
+        return list(self.seeding)
+
+    def _series(self, rng, probs, maps, a, b, best_of):
+        need = best_of // 2 + 1
+        wins_a = np.zeros(len(a), dtype=np.int64)
+        wins_b = np.zeros(len(a), dtype=np.int64)
+        for k in range(best_of):
+            if not maps:
+                m = 0
+            elif self.map_pick == "random":
+                m = np.asarray(maps)[rng.integers(len(maps), size=len(a))]
+            else:
+                m = maps[k % len(maps)]
+            live = (wins_a < need) & (wins_b < need)
+            won = rng.random(len(a)) < probs[m, a, b]
+            wins_a += live & won
+            wins_b += live & ~won
+        a_won = wins_a > wins_b
+        return np.where(a_won, a, b), np.where(a_won, b, a), wins_a, wins_b
+
+    def simulate_chunk(self, table, n_sims, seed):
+        """Counts for one batch of `n_sims` tournaments (all simulated at once)."""
+        rng = np.random.default_rng(seed)
+        probs = table.probs
+        maps = [table.map_types.index(m) for m in self.map_order or table.map_types[1:]]
+        n_teams = len(table.teams)
+        counts = {k: np.zeros(n_teams) for k in ("group_wins", "advance", "final", "title")}
+
+        places = {}
+        for g, teams in self.groups.items():
+            idx = np.array([table.team_index[t] for t in teams])
+            wins = np.zeros((n_sims, len(teams)))
+            diff = np.zeros((n_sims, len(teams)))
+            for i, j in combinations(range(len(teams)), 2):
+                a, b = np.full(n_sims, idx[i]), np.full(n_sims, idx[j])
+                winner, _, maps_a, maps_b = self._series(rng, probs, maps, a, b, self.group_best_of)
+                wins[:, i] += winner == idx[i]
+                wins[:, j] += winner == idx[j]
+                diff[:, i] += maps_a - maps_b
+                diff[:, j] += maps_b - maps_a
+            # series wins, then map differential, then a coin flip
+            score = wins * 1000 + diff + rng.random(wins.shape) * 0.5
+            ranked = idx[np.argsort(-score, axis=1)]
+            for place in range(len(teams)):
+                places[(g, place + 1)] = ranked[:, place]
+            counts["group_wins"] += np.bincount(np.repeat(idx, n_sims), weights=wins.T.ravel(), minlength=n_teams)
+
+        seeds = [places[s] if self.groups else np.full(n_sims, table.team_index[s]) for s in self.seeding]
+        for team in seeds:
+            counts["advance"] += np.bincount(team, minlength=n_teams)
+
+        results = {}
+        for name, side_a, side_b in self.bracket:
+            a, b = (seeds[s[1]] if s[0] == "seed" else results[s[1]][0 if s[0] == "W" else 1] for s in (side_a, side_b))
+            best_of = self.final_best_of if name.startswith("GF") else self.playoff_best_of
+            winner, loser, _, _ = self._series(rng, probs, maps, a, b, best_of)
+            if name == "GF2":
+                # the reset is only played when the lower-bracket team took the first final
+                upper = results["GF"][2]
+                winner = np.where(results["GF"][0] == upper, upper, winner)
+                loser = np.where(results["GF"][0] == upper, results["GF"][1], loser)
+            results[name] = (winner, loser, a)
+        gf = results["GF"]
+        counts["final"] += np.bincount(gf[0], minlength=n_teams) + np.bincount(gf[1], minlength=n_teams)
+        champion = results["GF2"][0] if "GF2" in results else gf[0]
+        counts["title"] += np.bincount(champion, minlength=n_teams)
+        return counts
+
+    def simulate(self, table, n_sims=100_000, seed=0, n_jobs=1, chunk_size=25_000):
+        """Advancement and title odds per team over `n_sims` tournaments.
+
+        Runs are split into fixed-size chunks with independent child seeds, so
+        results depend only on `seed`, not on `n_jobs`; chunks run across a
+        process pool when `n_jobs` > 1.
+        """
+        sizes = [chunk_size] * (n_sims // chunk_size) + ([n_sims % chunk_size] if n_sims % chunk_size else [])
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        if n_jobs == 1:
+            parts = [self.simulate_chunk(table, n, s) for n, s in zip(sizes, seeds)]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                parts = list(pool.map(self.simulate_chunk, [table] * len(sizes), sizes, seeds))
+
+        total = {k: sum(p[k] for p in parts) / n_sims for k in parts[0]}
+        group_of = {t: g for g, teams in self.groups.items() for t in teams}
+        rows = []
+        for t in self.teams:
+            i = table.team_index[t]
+            rows.append({
+                "team": t,
+                "group": group_of.get(t),
+                "expected_group_wins": total["group_wins"][i],
+                "advance_odds": total["advance"][i],
+                "final_odds": total["final"][i],
+                "title_odds": total["title"][i],
+            })
+        return pd.DataFrame(rows).sort_values("title_odds", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def snake_groups(teams, n_groups=2):
+    """Split teams (strongest first) into groups A, B, ... in snake order."""
+    names = [chr(ord("A") + g) for g in range(n_groups)]
+    groups = {name: [] for name in names}
+    for k, team in enumerate(teams):
+        row, col = divmod(k, n_groups)
+        groups[names[col if row % 2 == 0 else n_groups - 1 - col]].append(team)
+    return groups
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the scripts import each other as flat modules from src/; keep test runs out of the span log
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+os.environ.setdefault("OWCS_SPANS", "off")
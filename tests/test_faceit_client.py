@@ -0,0 +1,153 @@
+import json
+import os
+import time
+
+import pytest
+import requests
+
+from faceit_cache import ResponseCache
+from faceit_client import FaceitClient, TokenBucket, serve_recorded
+
+
+def match_doc(mid, status="FINISHED"):
+    return {"match_id": mid, "status": status, "teams": [{"team_id": "a", "name": "A"}, {"team_id": "b", "name": "B"}]}
+
+
+def stats_doc(mid):
+    return {"rounds": [{"round_stats": {"Map": "map-0"}, "match": mid}]}
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    """Recorded responses of rooms r0..r5; r5 has no scoreboard (its /stats is a 404)."""
+    root = tmp_path / "recorded"
+    for i in range(6):
+        mid = f"r{i}"
+        (root / "matches" / mid).mkdir(parents=True)
+        (root / "matches" / f"{mid}.json").write_text(json.dumps(match_doc(mid, "ONGOING" if i == 0 else "FINISHED")))
+        if i < 5:
+            (root / "matches" / mid / "stats.json").write_text(json.dumps(stats_doc(mid)))
+    return str(root)
+
+
+@pytest.fixture
+def serve(recorded):
+    servers = []
+
+    def start(**kwargs):
+        server, url = serve_recorded(recorded, **kwargs)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def client_for(url, **kwargs):
+    kwargs = {"concurrency": 4, "rate": 1000, "backoff": 0.001, "timeout": 5, **kwargs}
+    return FaceitClient("test-key", base_url=url, **kwargs)
+
+
+def test_fetch_matches_in_order_with_missing_stats(serve):
+    server, url = serve()
+    ids = [f"r{i}" for i in range(6)]
+    with client_for(url) as client:
+        out = list(client.fetch_matches(ids))
+    assert [mid for mid, _, _ in out] == ids
+    assert [m["match_id"] for _, m, _ in out] == ids
+    assert out[0][2] == stats_doc("r0")
+    # a room without a scoreboard answers 404 on /stats: no data, not an error
+    assert out[5][2] == {}
+    assert ("matches/r5/stats", 404) in server.log
+    assert client.stats == {"requests": 12, "retries": 0, "cache_hits": 0}
+
+
+def test_retries_429_and_500_then_returns_payload(serve):
+    server, url = serve(faults={"matches/r1": [429, 500]})
+    with client_for(url) as client:
+        payload = client.get_json("matches/r1")
+    assert payload == match_doc("r1")
+    assert [s for p, s in server.log if p == "matches/r1"] == [429, 500, 200]
+    assert client.stats["retries"] == 2
+    assert client.stats["requests"] == 1
+
+
+def test_gives_up_after_max_retries(serve):
+    server, url = serve(faults={"matches/r1": [503, 503, 503]})
+    with client_for(url, max_retries=2) as client:
+        with pytest.raises(requests.HTTPError):
+            client.get_json("matches/r1")
+    assert [s for p, s in server.log if p == "matches/r1"] == [503, 503, 503]
+    assert client.stats["retries"] == 2
+
+
+def test_backoff_grows_between_retries(serve):
+    server, url = serve(faults={"matches/r1": [500, 500, 500]})
+    with client_for(url, backoff=0.05) as client:
+        start = time.perf_counter()
+        assert client.get_json("matches/r1") == match_doc("r1")
+        elapsed = time.perf_counter() - start
+    # 0.05 * (1 + 2 + 4) at least, at most twice that with the jitter
+    assert 0.35 <= elapsed < 1.5
+
+
+def test_etag_revalidation_serves_cached_body_on_304(serve, tmp_path):
+    server, url = serve()
+    cache = ResponseCache(str(tmp_path / "cache"))
+    with client_for(url, cache=cache) as client:
+        first = client.get_json("matches/r0", ("matches", "r0"))
+        # r0 is not finished, so the cached copy is revalidated instead of served as final
+        second = client.get_json("matches/r0", ("matches", "r0"))
+    assert first == second == match_doc("r0", "ONGOING")
+    assert [s for p, s in server.log if p == "matches/r0"] == [200, 304]
+    assert cache.meta("matches", "r0")["etag"]
+
+
+def test_finished_rooms_come_from_the_cache(serve, tmp_path):
+    server, url = serve()
+    cache = ResponseCache(str(tmp_path / "cache"))
+    with client_for(url, cache=cache) as client:
+        list(client.fetch_matches(["r1"]))
+        again = list(client.fetch_matches(["r1"]))
+    assert again == [("r1", match_doc("r1"), stats_doc("r1"))]
+    assert len(server.log) == 2
+    assert client.stats["cache_hits"] == 2
+
+
+def test_offline_never_calls_the_server(serve, tmp_path):
+    server, url = serve()
+    with client_for(url, cache=ResponseCache(str(tmp_path / "cache")), offline=True) as client:
+        assert client.get_json("matches/r1", ("matches", "r1")) == {}
+    assert server.log == []
+
+
+def test_concurrency_cap(serve):
+    server, url = serve(delay=0.05)
+    with client_for(url, concurrency=2) as client:
+        list(client.fetch_matches([f"r{i}" for i in range(5)]))
+    assert server.peak == 2
+
+
+def test_rate_limit_spaces_requests(serve):
+    server, url = serve()
+    with client_for(url, rate=20, burst=1) as client:
+        start = time.perf_counter()
+        list(client.fetch_matches([f"r{i}" for i in range(5)]))
+        elapsed = time.perf_counter() - start
+    # 10 requests, the first from the initial token: 9 more at 20 per second
+    assert len(server.log) == 10
+    assert elapsed >= 9 / 20 * 0.95
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.perf_counter()
+    for _ in range(5):
+        bucket.acquire()
+    burst = time.perf_counter() - start
+    for _ in range(5):
+        bucket.acquire()
+    assert burst < 0.05
+    assert time.perf_counter() - start >= 5 / 50 * 0.95